@@ -18,10 +18,60 @@ class Settings(BaseSettings):
     # JWT settings
     jwt_secret: str
     jwt_expires_in: int = 86400  # 24 hours in seconds
+    principal_cache_ttl_seconds: int = 60  # How long a verified user skips the users lookup
+    principal_cache_max_entries: int = 10000
+    ownership_cache_ttl_seconds: int = 30  # How long a script's owner is trusted without a lookup
+    ownership_cache_max_entries: int = 10000
+    
+    # Password hashing settings (Argon2id; defaults match argon2-cffi)
+    password_hash_workers: int = 2  # Max concurrent hash/verify operations
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 65536  # KiB
+    argon2_parallelism: int = 4
     
     # CORS settings
     cors_origins: str = "http://localhost:5173,http://localhost:3000"
     
+    # Detection executor settings
+    detection_thread_workers: int = 4
+    detection_process_workers: int = 2
+    detection_process_threshold_chars: int = 262144  # Scripts >= 256K characters use the process pool
+    detection_max_queue_depth: int = 32  # Max detection jobs queued or running per worker
+    detection_retry_after_seconds: int = 5
+    live_detection_max_chars: int = 2000000  # Largest document a live detection connection may hold
+    batch_analyze_max_scripts: int = 500  # Max script ids per analyze:batch request
+    batch_analyze_concurrency: int = 4  # Detections one batch may have in flight
+    batch_insert_chunk_size: int = 1000  # Query documents per insert_many call
+    analysis_progress_chunk_chars: int = 65536  # Text scanned between progress events of a streamed analysis
+    term_dictionary_path: str = ""  # Compiled term dictionary artifact to mmap (default: bundled catalogue)
+    term_dictionary_check_seconds: float = 5.0  # How often workers check the artifact for a new version
+    
+    # Script text storage settings
+    script_upload_max_bytes: int = 268435456  # 256 MB cap on a streamed upload
+    script_text_chunk_bytes: int = 261120  # GridFS chunk size (255 KB) used for uploaded script texts
+    
+    # Commercial query storage settings
+    compact_query_storage: bool = True  # Derive script excerpts from the script text on read instead of storing them
+    
+    # Background analysis job settings
+    job_workers_enabled: bool = True  # Run job workers in this process
+    job_worker_concurrency: int = 2  # Jobs one process runs at a time
+    job_lease_seconds: int = 60  # A job whose lease is not renewed within this time is re-claimed
+    job_heartbeat_seconds: float = 15.0
+    job_poll_seconds: float = 2.0  # Idle workers check for due jobs this often
+    job_timeout_seconds: int = 300  # An attempt running longer than this fails and is retried
+    job_max_attempts: int = 3
+    job_retry_base_seconds: float = 5.0  # Backoff doubles per failed attempt from this base
+    job_retry_max_seconds: float = 300.0
+    
+    # Budget settings
+    budget_scenario_max_scenarios: int = 10000  # Max scenarios per budget scenario sweep request
+    
+    # Analysis cache settings
+    analysis_cache_max_bytes: int = 67108864  # 64 MB in-process LRU tier
+    analysis_cache_mongo_enabled: bool = False  # Persist cached results in MongoDB across restarts
+    analysis_cache_mongo_ttl_seconds: int = 604800  # MongoDB tier entries expire 7 days after they were written
+    
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -2,7 +2,8 @@
 MongoDB database connection management using Motor (async driver)
 """
 import logging
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from typing import Awaitable, Callable, Optional, TypeVar
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorClientSession, AsyncIOMotorDatabase
 from .config import settings
 
 # Configure logging
@@ -12,6 +13,9 @@ logger = logging.getLogger(__name__)
 # Global database client
 _client: AsyncIOMotorClient | None = None
 _database: AsyncIOMotorDatabase | None = None
+_supports_transactions = False
+
+T = TypeVar("T")
 
 
 def get_database() -> AsyncIOMotorDatabase:
@@ -35,7 +39,7 @@ async def connect_to_mongo() -> None:
     
     This function should be called during application startup.
     """
-    global _client, _database
+    global _client, _database, _supports_transactions
     
     try:
         logger.info("Connecting to MongoDB...")
@@ -52,6 +56,10 @@ async def connect_to_mongo() -> None:
         # Verify connection with ping
         await _client.admin.command('ping')
         
+        # Multi-document transactions need a replica set (Atlas) or mongos
+        hello = await _client.admin.command('hello')
+        _supports_transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+        
         logger.info(f"Successfully connected to MongoDB database: {_database.name}")
         
     except Exception as e:
@@ -79,6 +87,27 @@ async def close_mongo_connection() -> None:
             raise
 
 
+async def run_in_transaction(callback: Callable[[Optional[AsyncIOMotorClientSession]], Awaitable[T]]) -> T:
+    """
+    Run database writes in one multi-document transaction when the server supports it
+    
+    The callback receives the session to pass to every operation, or None on
+    a standalone server, where its writes apply one by one. Transient
+    transaction errors (e.g. write conflicts) re-run the callback.
+    
+    Args:
+        callback: Coroutine function taking the session
+        
+    Returns:
+        The callback's result
+    """
+    if _client is None or not _supports_transactions:
+        return await callback(None)
+    
+    async with await _client.start_session() as session:
+        return await session.with_transaction(callback)
+
+
 async def ping_database() -> bool:
     """
     Ping the database to check if connection is alive
@@ -1,10 +1,15 @@
 """
 Authentication dependencies for protected routes
 """
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from bson import ObjectId
 
+from ..config import settings
 from ..utils.security import verify_token
 from ..database import get_database
 
@@ -12,6 +17,97 @@ from ..database import get_database
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
+class PrincipalCache:
+    """
+    LRU cache of user IDs recently confirmed to exist
+    
+    Tokens are still decoded and verified on every request; the cache only
+    skips the users lookup. Entries are keyed by the token subject and expire
+    after the configured TTL or at the token's own expiry, whichever is first.
+    """
+    
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+    
+    def contains(self, user_id: str) -> bool:
+        """
+        Check whether a user is cached and the entry is still fresh
+        
+        Args:
+            user_id: Token subject
+            
+        Returns:
+            bool: True on a cache hit
+        """
+        expires_at = self._entries.get(user_id)
+        if expires_at is not None and expires_at > time.time():
+            self._entries.move_to_end(user_id)
+            self._hits += 1
+            return True
+        
+        if expires_at is not None:
+            del self._entries[user_id]
+        self._misses += 1
+        return False
+    
+    def add(self, user_id: str, token_exp: Any) -> None:
+        """
+        Cache a confirmed user until the TTL or token expiry
+        
+        Args:
+            user_id: Token subject
+            token_exp: The token's exp claim (seconds since epoch), if present
+        """
+        expires_at = time.time() + self.ttl_seconds
+        if isinstance(token_exp, (int, float)):
+            expires_at = min(expires_at, float(token_exp))
+        
+        self._entries[user_id] = expires_at
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+    
+    def invalidate(self, user_id: str) -> None:
+        """
+        Drop a user from the cache (e.g. after account deletion)
+        
+        Args:
+            user_id: Token subject
+        """
+        if self._entries.pop(user_id, None) is not None:
+            self._invalidations += 1
+    
+    def get_metrics(self) -> Dict[str, int]:
+        """
+        Get cache size and hit/miss counters
+        
+        Returns:
+            dict: Entry count, hits, misses, evictions and invalidations
+        """
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "invalidations": self._invalidations,
+        }
+
+
+# Global principal cache instance
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.principal_cache_ttl_seconds,
+    max_entries=settings.principal_cache_max_entries
+)
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
     """
     Dependency to get current authenticated user from JWT token
@@ -36,6 +132,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Skip the database lookup for recently confirmed users
+    if principal_cache.contains(user_id):
+        return user_id
+    
     # Verify user exists in database
     db = get_database()
     users_collection = db["users"]
@@ -56,4 +156,5 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    principal_cache.add(user_id, payload.get("exp"))
     return user_id
\ No newline at end of file
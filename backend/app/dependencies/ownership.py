@@ -0,0 +1,167 @@
+"""
+Script ownership dependencies for protected routes
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from fastapi import Depends, HTTPException, status
+from bson import ObjectId
+
+from ..config import settings
+from ..database import get_database
+from .auth import get_current_user
+
+
+class OwnershipCache:
+    """
+    Short-lived LRU cache of script_id -> owner user_id
+
+    A script's owner never changes, so the only staleness to guard against is
+    deletion; delete handlers call invalidate(), and the TTL bounds staleness
+    across workers.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, script_id: str) -> str | None:
+        """
+        Get the cached owner of a script
+
+        Args:
+            script_id: Script ID
+
+        Returns:
+            str | None: Owner user ID, or None if not cached or expired
+        """
+        entry = self._entries.get(script_id)
+        if entry is not None and entry[1] > time.monotonic():
+            self._entries.move_to_end(script_id)
+            self._hits += 1
+            return entry[0]
+
+        if entry is not None:
+            del self._entries[script_id]
+        self._misses += 1
+        return None
+
+    def add(self, script_id: str, user_id: str) -> None:
+        """
+        Cache the owner of a script
+
+        Args:
+            script_id: Script ID
+            user_id: Owner user ID
+        """
+        self._entries[script_id] = (user_id, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(script_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, script_ids: Iterable[str]) -> None:
+        """
+        Drop scripts from the cache (e.g. after deletion)
+
+        Args:
+            script_ids: Script IDs to drop
+        """
+        for script_id in script_ids:
+            if self._entries.pop(script_id, None) is not None:
+                self._invalidations += 1
+
+    def get_metrics(self) -> Dict[str, int]:
+        """
+        Get cache size and hit/miss counters
+
+        Returns:
+            dict: Entry count, hits, misses and invalidations
+        """
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "invalidations": self._invalidations,
+        }
+
+
+# Global ownership cache instance
+ownership_cache = OwnershipCache(
+    ttl_seconds=settings.ownership_cache_ttl_seconds,
+    max_entries=settings.ownership_cache_max_entries
+)
+
+
+def require_script_owner(action: str, fields: Iterable[str] = ()) -> Callable[..., Any]:
+    """
+    Build a dependency that checks the current user owns the {script_id} script
+
+    The dependency validates the ObjectId, then loads only user_id plus the
+    declared fields. When no fields are declared, a cached owner answers the
+    check without touching the database.
+
+    Args:
+        action: Completes "You don't have permission to ..." in the 403 message
+        fields: Script fields the handler needs
+
+    Returns:
+        Callable: Dependency returning the script document restricted to _id,
+            user_id and the declared fields
+    """
+    projection = {"user_id": 1, **{field: 1 for field in fields}}
+    needs_document = len(projection) > 1
+
+    async def dependency(
+        script_id: str,
+        current_user_id: str = Depends(get_current_user)
+    ) -> Dict[str, Any]:
+        # Validate ObjectId format
+        try:
+            script_object_id = ObjectId(script_id)
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid script ID format"
+            )
+
+        owner_id = None if needs_document else ownership_cache.get(script_id)
+        if owner_id is not None:
+            script = {"_id": script_object_id, "user_id": owner_id}
+        else:
+            # Fetch only the fields needed for the ownership check and the handler
+            try:
+                script = await get_database()["scripts"].find_one(
+                    {"_id": script_object_id},
+                    projection
+                )
+            except Exception as e:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Failed to fetch script: {str(e)}"
+                )
+
+            # Check if script exists
+            if not script:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Script not found"
+                )
+
+            ownership_cache.add(script_id, script["user_id"])
+
+        # Verify ownership
+        if script["user_id"] != current_user_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"You don't have permission to {action}"
+            )
+
+        return script
+
+    return dependency
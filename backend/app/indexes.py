@@ -0,0 +1,201 @@
+"""
+MongoDB index manifest and query plan verification
+
+The manifest is applied idempotently at application startup. Run this module
+directly to apply it and/or verify that router queries avoid collection scans:
+
+    python -m app.indexes --apply --explain
+"""
+import argparse
+import asyncio
+import logging
+from typing import Any, Dict, List, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Index manifest: collection -> list of (keys, options)
+INDEX_MANIFEST: Dict[str, List[Tuple[List[Tuple[str, int]], Dict[str, Any]]]] = {
+    "users": [
+        ([("email", 1)], {"name": "email_unique", "unique": True}),
+    ],
+    "scripts": [
+        # Listings filter by owner and page by (created_at, _id) descending
+        ([("user_id", 1), ("created_at", -1), ("_id", -1)], {"name": "user_created_at"}),
+    ],
+    "commercial_queries": [
+        # Prefix also serves lookups by script_id alone
+        ([("script_id", 1), ("status", 1)], {"name": "script_status"}),
+    ],
+    "budget_models": [
+        ([("script_id", 1)], {"name": "script_id_unique", "unique": True}),
+    ],
+    "analysis_jobs": [
+        # Workers claim due queued jobs and jobs with expired leases
+        ([("status", 1), ("run_after", 1)], {"name": "status_run_after"}),
+        ([("status", 1), ("lease_expires_at", 1)], {"name": "status_lease_expires_at"}),
+        # At most one active job per script; submissions reuse it
+        (
+            [("script_id", 1)],
+            {
+                "name": "script_active_unique",
+                "unique": True,
+                "partialFilterExpression": {"status": {"$in": ["queued", "running"]}},
+            },
+        ),
+    ],
+    "analysis_cache": [
+        # TTL index: MongoDB removes cached results once they are this old
+        (
+            [("created_at", 1)],
+            {"name": "created_at_ttl", "expireAfterSeconds": settings.analysis_cache_mongo_ttl_seconds},
+        ),
+    ],
+}
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> None:
+    """
+    Create every index in the manifest that does not exist yet
+
+    create_index is a no-op for an existing identical index, so this is safe
+    to run on every startup. Failures (e.g. duplicate data blocking a unique
+    index) are logged per index and do not stop the remaining indexes.
+
+    Args:
+        db: Database to provision
+    """
+    for collection_name, indexes in INDEX_MANIFEST.items():
+        for keys, options in indexes:
+            try:
+                await db[collection_name].create_index(keys, **options)
+            except Exception as e:
+                logger.error(f"Failed to create index {options.get('name')} on {collection_name}: {str(e)}")
+    logger.info("Database indexes verified")
+
+
+# Representative router queries: (description, collection, filter, sort)
+_SAMPLE_ID = ObjectId("000000000000000000000000")
+ROUTER_QUERIES: List[Tuple[str, str, Dict[str, Any], List[Tuple[str, int]]]] = [
+    ("auth: user by email", "users", {"email": "user@example.com"}, []),
+    ("auth: user by id", "users", {"_id": _SAMPLE_ID}, []),
+    ("scripts: script by id", "scripts", {"_id": _SAMPLE_ID}, []),
+    ("scripts: list user scripts", "scripts", {"user_id": str(_SAMPLE_ID)}, [("created_at", -1), ("_id", -1)]),
+    (
+        "scripts: list user scripts after cursor",
+        "scripts",
+        {
+            "user_id": str(_SAMPLE_ID),
+            "$or": [
+                {"created_at": {"$lt": _SAMPLE_ID.generation_time}},
+                {"created_at": _SAMPLE_ID.generation_time, "_id": {"$lt": _SAMPLE_ID}},
+            ],
+        },
+        [("created_at", -1), ("_id", -1)],
+    ),
+    ("queries: by script", "commercial_queries", {"script_id": str(_SAMPLE_ID)}, []),
+    ("queries: by scripts ($in)", "commercial_queries", {"script_id": {"$in": [str(_SAMPLE_ID)]}}, []),
+    ("queries: accepted by script", "commercial_queries", {"script_id": str(_SAMPLE_ID), "status": "accepted"}, []),
+    ("queries: by id and script", "commercial_queries", {"_id": _SAMPLE_ID, "script_id": str(_SAMPLE_ID)}, []),
+    ("budget: by script", "budget_models", {"script_id": str(_SAMPLE_ID)}, []),
+    ("budget: by scripts ($in)", "budget_models", {"script_id": {"$in": [str(_SAMPLE_ID)]}}, []),
+    ("jobs: by id", "analysis_jobs", {"_id": _SAMPLE_ID}, []),
+    (
+        "jobs: active for script",
+        "analysis_jobs",
+        {"script_id": str(_SAMPLE_ID), "status": {"$in": ["queued", "running"]}},
+        [],
+    ),
+    (
+        "jobs: claim next due",
+        "analysis_jobs",
+        {
+            "$or": [
+                {"status": "queued", "run_after": {"$lte": _SAMPLE_ID.generation_time}},
+                {"status": "running", "lease_expires_at": {"$lt": _SAMPLE_ID.generation_time}},
+            ]
+        },
+        [("run_after", 1)],
+    ),
+]
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """
+    Collect every stage name in a query plan tree
+
+    Args:
+        plan: Plan node from explain() output
+
+    Returns:
+        List[str]: Stage names, outermost first
+    """
+    stages = [plan.get("stage", "?")]
+    if "inputStage" in plan:
+        stages.extend(_plan_stages(plan["inputStage"]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+async def explain_router_queries(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    """
+    Run explain() on each representative router query
+
+    Args:
+        db: Database to inspect
+
+    Returns:
+        List[dict]: One entry per query with its winning plan stages and a collection-scan flag
+    """
+    report = []
+    for description, collection_name, query, sort in ROUTER_QUERIES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        # Slot-based engine plans nest the classic plan under queryPlan
+        stages = _plan_stages(winning_plan.get("queryPlan", winning_plan))
+        report.append({
+            "query": description,
+            "collection": collection_name,
+            "stages": stages,
+            "collection_scan": "COLLSCAN" in stages,
+        })
+    return report
+
+
+async def _main() -> int:
+    from .database import connect_to_mongo, close_mongo_connection, get_database
+
+    parser = argparse.ArgumentParser(description="Apply and verify MongoDB indexes")
+    parser.add_argument("--apply", action="store_true", help="Create missing indexes from the manifest")
+    parser.add_argument("--explain", action="store_true", help="Report query plans for router queries")
+    args = parser.parse_args()
+
+    await connect_to_mongo()
+    try:
+        db = get_database()
+        if args.apply:
+            await ensure_indexes(db)
+
+        if args.explain or not args.apply:
+            report = await explain_router_queries(db)
+            for entry in report:
+                marker = "COLLSCAN" if entry["collection_scan"] else "ok"
+                print(f"[{marker:>8}] {entry['query']:<45} {' <- '.join(entry['stages'])}")
+            if any(entry["collection_scan"] for entry in report):
+                return 1
+        return 0
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(_main()))
@@ -3,12 +3,20 @@ FastAPI application entry point
 """
 import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .config import settings
-from .database import connect_to_mongo, close_mongo_connection, ping_database
-from .routers import auth, scripts, budget
+from .database import connect_to_mongo, close_mongo_connection, ping_database, get_database
+from .indexes import ensure_indexes
+from .routers import auth, scripts, budget, jobs
+from .services.detection_executor import get_detection_executor, shutdown_detection_executor
+from .services.analysis_cache import get_analysis_cache
+from .services.ai_detection import get_term_dictionary, reload_term_dictionary
+from .services.job_queue import get_job_worker, start_job_worker, stop_job_worker
+from .dependencies.auth import get_current_user, principal_cache
+from .dependencies.ownership import ownership_cache
+from .utils.security import shutdown_hash_executor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,7 +31,10 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up application...")
     try:
+        reload_term_dictionary()  # Fail fast on a missing or broken dictionary artifact
         await connect_to_mongo()
+        await ensure_indexes(get_database())
+        start_job_worker()
         logger.info("Application startup complete")
     except Exception as e:
         logger.error(f"Failed to start application: {str(e)}")
@@ -34,6 +45,9 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down application...")
     try:
+        await stop_job_worker()
+        shutdown_detection_executor()
+        shutdown_hash_executor()
         await close_mongo_connection()
         logger.info("Application shutdown complete")
     except Exception as e:
@@ -58,12 +72,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers
 app.include_router(auth.router)
 app.include_router(scripts.router)
 app.include_router(budget.router)
+app.include_router(jobs.router)
 
 
 @app.get("/healthz")
@@ -97,6 +113,38 @@ async def health_check():
         }
 
 
+@app.get("/metrics")
+async def metrics(current_user_id: str = Depends(get_current_user)):
+    """
+    Runtime metrics endpoint for monitoring
+    
+    Requires authentication, since queue depths and cache sizes describe
+    the deployment's load.
+    
+    Args:
+        current_user_id: ID of the authenticated user
+        
+    Returns:
+        dict: Detection executor, job worker and cache counters and timings
+    """
+    job_worker = get_job_worker()
+    term_dictionary = get_term_dictionary()
+    return {
+        "detection": get_detection_executor().get_metrics(),
+        "term_dictionary": {
+            "version": term_dictionary.version,
+            "fingerprint": term_dictionary.fingerprint,
+            "terms": len(term_dictionary),
+            "artifact_bytes": term_dictionary.size_bytes,
+            "bytes_per_term": term_dictionary.memory_report()["bytes_per_term"],
+        },
+        "jobs": job_worker.get_metrics() if job_worker is not None else None,
+        "analysis_cache": get_analysis_cache().get_metrics(),
+        "principal_cache": principal_cache.get_metrics(),
+        "ownership_cache": ownership_cache.get_metrics()
+    }
+
+
 @app.get("/")
 async def root():
     """
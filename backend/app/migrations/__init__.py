@@ -0,0 +1,3 @@
+"""
+One-off data migrations, run as modules (python -m app.migrations.<name>)
+"""
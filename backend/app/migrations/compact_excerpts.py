@@ -0,0 +1,168 @@
+"""
+Migrate commercial queries to compact storage (no stored script_excerpt)
+
+Excerpts are derived from the script text on read, so stored copies only
+cost space and write volume. Run from the backend directory:
+
+    python -m app.migrations.compact_excerpts            # report only
+    python -m app.migrations.compact_excerpts --apply    # drop stored excerpts
+    python -m app.migrations.compact_excerpts --restore  # store excerpts again (before disabling COMPACT_QUERY_STORAGE)
+"""
+import argparse
+import asyncio
+from typing import Any, Dict
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from ..services.ai_detection import extract_excerpt
+from ..services.script_storage import TEXT_FIELDS, load_script_text
+
+# BSON overhead of the field besides its UTF-8 bytes: type byte, "script_excerpt\0" key,
+# int32 length prefix and the string's trailing NUL
+EXCERPT_FIELD_OVERHEAD_BYTES = 1 + len("script_excerpt") + 1 + 4 + 1
+
+RESTORE_BATCH_SIZE = 1000
+
+
+async def excerpt_storage_report(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+    """
+    Measure how much of commercial_queries is spent on stored excerpts
+
+    Sizes are computed server side ($bsonSize needs MongoDB 4.4+).
+
+    Args:
+        db: Database to inspect
+
+    Returns:
+        dict: Document counts, total and excerpt bytes, and the per-query and
+            per-analysis write volume that compact storage saves
+    """
+    queries_collection = db["commercial_queries"]
+    excerpt_bytes = {"$cond": [
+        {"$eq": [{"$type": "$script_excerpt"}, "string"]},
+        {"$add": [{"$strLenBytes": "$script_excerpt"}, EXCERPT_FIELD_OVERHEAD_BYTES]},
+        0
+    ]}
+    # Sum per script first, then over scripts, so no stage holds every script id at once
+    totals = await queries_collection.aggregate([
+        {"$group": {
+            "_id": "$script_id",
+            "documents": {"$sum": 1},
+            "document_bytes": {"$sum": {"$bsonSize": "$$ROOT"}},
+            "with_excerpt": {"$sum": {"$cond": [{"$eq": [{"$type": "$script_excerpt"}, "string"]}, 1, 0]}},
+            "excerpt_bytes": {"$sum": excerpt_bytes},
+        }},
+        {"$group": {
+            "_id": None,
+            "documents": {"$sum": "$documents"},
+            "scripts": {"$sum": 1},
+            "document_bytes": {"$sum": "$document_bytes"},
+            "with_excerpt": {"$sum": "$with_excerpt"},
+            "excerpt_bytes": {"$sum": "$excerpt_bytes"},
+        }},
+        {"$project": {"_id": 0}},
+    ], allowDiskUse=True).to_list(length=1)
+
+    report = totals[0] if totals else {
+        "documents": 0, "scripts": 0, "document_bytes": 0, "with_excerpt": 0, "excerpt_bytes": 0
+    }
+    with_excerpt = report["with_excerpt"]
+    report["saved_fraction"] = report["excerpt_bytes"] / report["document_bytes"] if report["document_bytes"] else 0.0
+    # Every (re-)analysis rewrites all of a script's queries
+    report["saved_bytes_per_query_write"] = report["excerpt_bytes"] / with_excerpt if with_excerpt else 0.0
+    report["saved_bytes_per_analysis"] = (
+        report["saved_bytes_per_query_write"] * report["documents"] / report["scripts"] if report["scripts"] else 0.0
+    )
+    return report
+
+
+async def drop_stored_excerpts(db: AsyncIOMotorDatabase) -> int:
+    """
+    Remove script_excerpt from every commercial query
+
+    Args:
+        db: Database to migrate
+
+    Returns:
+        int: Number of documents modified
+    """
+    result = await db["commercial_queries"].update_many(
+        {"script_excerpt": {"$exists": True}},
+        {"$unset": {"script_excerpt": ""}}
+    )
+    return result.modified_count
+
+
+async def restore_stored_excerpts(db: AsyncIOMotorDatabase) -> int:
+    """
+    Store script_excerpt again on every query that lacks one
+
+    Args:
+        db: Database to migrate
+
+    Returns:
+        int: Number of documents modified
+    """
+    queries_collection = db["commercial_queries"]
+    script_ids = await queries_collection.distinct("script_id", {"script_excerpt": {"$exists": False}})
+
+    modified = 0
+    for script_id in script_ids:
+        script = await db["scripts"].find_one({"_id": ObjectId(script_id)}, dict.fromkeys(TEXT_FIELDS, 1))
+        if script is None:
+            continue
+        script_text = await load_script_text(db, script)
+
+        operations = []
+        cursor = queries_collection.find(
+            {"script_id": script_id, "script_excerpt": {"$exists": False}},
+            {"start_index": 1, "end_index": 1}
+        )
+        async for query in cursor:
+            excerpt = extract_excerpt(script_text, query["start_index"], query["end_index"])
+            operations.append(UpdateOne({"_id": query["_id"]}, {"$set": {"script_excerpt": excerpt}}))
+            if len(operations) >= RESTORE_BATCH_SIZE:
+                modified += (await queries_collection.bulk_write(operations, ordered=False)).modified_count
+                operations = []
+        if operations:
+            modified += (await queries_collection.bulk_write(operations, ordered=False)).modified_count
+    return modified
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"query documents:           {report['documents']} across {report['scripts']} scripts")
+    print(f"documents with excerpt:    {report['with_excerpt']}")
+    print(f"total document bytes:      {report['document_bytes']}")
+    print(f"stored excerpt bytes:      {report['excerpt_bytes']} ({report['saved_fraction']:.1%} of documents)")
+    print(f"saved per query write:     {report['saved_bytes_per_query_write']:.0f} bytes")
+    print(f"saved per script analysis: {report['saved_bytes_per_analysis']:.0f} bytes")
+
+
+async def _main() -> int:
+    from ..database import connect_to_mongo, close_mongo_connection, get_database
+
+    parser = argparse.ArgumentParser(description="Migrate commercial queries to compact excerpt storage")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--apply", action="store_true", help="Remove stored excerpts")
+    group.add_argument("--restore", action="store_true", help="Store derived excerpts on queries without one")
+    args = parser.parse_args()
+
+    await connect_to_mongo()
+    try:
+        db = get_database()
+        _print_report(await excerpt_storage_report(db))
+
+        if args.apply:
+            print(f"removed excerpts from {await drop_stored_excerpts(db)} documents")
+            _print_report(await excerpt_storage_report(db))
+        elif args.restore:
+            print(f"restored excerpts on {await restore_stored_excerpts(db)} documents")
+        return 0
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(_main()))
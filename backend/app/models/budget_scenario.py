@@ -0,0 +1,49 @@
+"""
+Budget what-if scenario models
+"""
+from typing import Optional, Dict, List
+from pydantic import BaseModel, ConfigDict, Field
+
+from .script import CreativeFlexibility
+
+class BudgetScenario(BaseModel):
+    """
+    One what-if scenario for the budget scenario sweep
+    """
+    accepted_query_ids: Optional[List[str]] = Field(default=None, alias="acceptedQueryIds")  # None keeps the currently accepted queries
+    creative_flexibility: Optional[CreativeFlexibility] = Field(default=None, alias="creativeFlexibility")  # None keeps the script's level
+    min_confidence: int = Field(default=0, ge=0, le=100, alias="minConfidence")  # Accepted queries scoring lower at this level are left out
+    
+    model_config = ConfigDict(populate_by_name=True)
+
+class BudgetScenarioRequest(BaseModel):
+    """
+    Scenarios to evaluate against a script's queries
+    """
+    scenarios: List[BudgetScenario] = Field(min_length=1)
+
+class BudgetScenarioResult(BaseModel):
+    """
+    Budget impact of one scenario
+    """
+    creative_flexibility: CreativeFlexibility = Field(alias="creativeFlexibility")
+    accepted_count: int = Field(alias="acceptedCount")
+    potential_sponsorship_revenue: float = Field(alias="potentialSponsorshipRevenue")
+    total_projected_revenue: float = Field(alias="totalProjectedRevenue")
+    net_impact: float = Field(alias="netImpact")
+    category_breakdown: Dict[str, float] = Field(alias="categoryBreakdown")
+    brand_safety_score: int = Field(ge=0, le=100, alias="brandSafetyScore")
+    
+    model_config = ConfigDict(populate_by_name=True)
+
+class BudgetScenarioResponse(BaseModel):
+    """
+    Budget scenario sweep response, one result per scenario in request order
+    """
+    script_id: str = Field(alias="scriptId")
+    baseline_adsense_revenue: float = Field(alias="baselineAdsenseRevenue")
+    production_budget: float = Field(alias="productionBudget")
+    query_count: int = Field(alias="queryCount")
+    scenarios: List[BudgetScenarioResult]
+    
+    model_config = ConfigDict(populate_by_name=True)
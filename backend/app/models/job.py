@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from pydantic import BaseModel, Field
+
+
+class JobTimings(BaseModel):
+    """Timing of a job's final attempt"""
+    queue_seconds: Optional[float] = Field(None, description="Seconds from submission to the start of the final attempt")
+    run_seconds: Optional[float] = Field(None, description="Seconds the final attempt ran")
+
+
+class AnalysisJobResponse(BaseModel):
+    """Model for background analysis job status"""
+    id: str = Field(..., description="Job unique identifier")
+    script_id: str = Field(..., description="Script being analyzed")
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    attempts: int = Field(..., description="Attempts started so far")
+    max_attempts: int = Field(..., description="Attempts allowed before the job fails")
+    error: Optional[str] = Field(None, description="Error of the latest failed attempt")
+    result: Optional[Dict[str, Any]] = Field(None, description="Analysis result, e.g. {\"query_count\": 12, \"unchanged\": false}")
+    created_at: datetime = Field(..., description="Submission timestamp")
+    started_at: Optional[datetime] = Field(None, description="Start of the latest attempt")
+    finished_at: Optional[datetime] = Field(None, description="Completion timestamp")
+    timings: JobTimings = Field(default_factory=JobTimings, description="Queue and run durations")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "id": "507f1f77bcf86cd799439013",
+                "script_id": "507f1f77bcf86cd799439011",
+                "status": "succeeded",
+                "attempts": 1,
+                "max_attempts": 3,
+                "error": None,
+                "result": {"query_count": 12, "unchanged": False},
+                "created_at": "2024-01-01T12:00:00Z",
+                "started_at": "2024-01-01T12:00:01Z",
+                "finished_at": "2024-01-01T12:00:03Z",
+                "timings": {"queue_seconds": 1.0, "run_seconds": 2.1}
+            }
+        }
+
+
+def job_to_response(job: Dict[str, Any]) -> AnalysisJobResponse:
+    """
+    Convert a job document to its response model
+
+    Args:
+        job: Job document from the analysis_jobs collection
+
+    Returns:
+        AnalysisJobResponse: Job status for clients
+    """
+    return AnalysisJobResponse(
+        id=str(job["_id"]),
+        script_id=job["script_id"],
+        status=job["status"],
+        attempts=job["attempts"],
+        max_attempts=job["max_attempts"],
+        error=job.get("error"),
+        result=job.get("result"),
+        created_at=job["created_at"],
+        started_at=job.get("started_at"),
+        finished_at=job.get("finished_at"),
+        timings=JobTimings(**(job.get("timings") or {}))
+    )
@@ -61,12 +61,32 @@ class ScriptCreate(BaseModel):
         return v
 
 
+class ScriptUpdate(BaseModel):
+    """Model for replacing a script's text (and optionally its title)"""
+    title: Optional[str] = Field(None, description="New script title (unchanged if not provided)")
+    text: str = Field(..., min_length=10, description="Updated script text content")
+
+    @field_validator('text')
+    @classmethod
+    def validate_text(cls, v):
+        if len(v.strip()) < 10:
+            raise ValueError('text must be at least 10 characters')
+        return v.strip()
+
+    @field_validator('title')
+    @classmethod
+    def validate_title(cls, v):
+        if v is not None:
+            return v.strip() if v.strip() else None
+        return v
+
+
 class ScriptInDB(BaseModel):
     """Model for script stored in database"""
     id: str = Field(..., description="Script unique identifier")
     user_id: str = Field(..., description="User ID who owns the script")
     title: str = Field(..., description="Script title")
-    text: str = Field(..., description="Script text content")
+    text: Optional[str] = Field(None, description="Script text content (omitted from listings unless requested)")
     params: ScriptParams = Field(..., description="Script parameters")
     created_at: datetime = Field(..., description="Creation timestamp")
     updated_at: datetime = Field(..., description="Last update timestamp")
@@ -6,8 +6,16 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 
 from ..models.user import UserCreate, UserResponse
-from ..utils.security import hash_password, verify_password, create_access_token, verify_token
+from ..utils.security import (
+    hash_password_async,
+    verify_password_async,
+    password_needs_rehash,
+    create_access_token,
+    verify_token,
+)
 from ..database import get_database
+from ..dependencies.auth import principal_cache
+from ..dependencies.ownership import ownership_cache
 
 router = APIRouter(prefix="/api/v1/auth", tags=["Authentication"])
 
@@ -40,8 +48,8 @@ async def signup(user_data: UserCreate):
             detail="Email already registered"
         )
     
-    # Hash password
-    password_hash = hash_password(user_data.password)
+    # Hash password off the event loop
+    password_hash = await hash_password_async(user_data.password)
     
     # Create user document
     now = datetime.utcnow()
@@ -85,14 +93,22 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Verify password
-    if not verify_password(form_data.password, user["password_hash"]):
+    # Verify password off the event loop
+    if not await verify_password_async(form_data.password, user["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Upgrade the stored hash if the Argon2 parameters have changed
+    if password_needs_rehash(user["password_hash"]):
+        new_hash = await hash_password_async(form_data.password)
+        await users_collection.update_one(
+            {"_id": user["_id"], "password_hash": user["password_hash"]},
+            {"$set": {"password_hash": new_hash, "updated_at": datetime.utcnow()}}
+        )
+    
     # Create access token with user_id in "sub" claim
     access_token = create_access_token(
         data={"sub": str(user["_id"])}
@@ -204,7 +220,7 @@ async def delete_account(token: str = Depends(oauth2_scheme)):
     
     try:
         # 1. Find all user's scripts
-        cursor = scripts_collection.find({"user_id": user_id})
+        cursor = scripts_collection.find({"user_id": user_id}, {"_id": 1})
         user_scripts = await cursor.to_list(length=None)
         script_ids = [str(s["_id"]) for s in user_scripts]
         
@@ -217,10 +233,14 @@ async def delete_account(token: str = Depends(oauth2_scheme)):
             
             # 4. Delete the scripts themselves
             await scripts_collection.delete_many({"user_id": user_id})
+            ownership_cache.invalidate(script_ids)
             
         # 5. Delete the user
         await users_collection.delete_one({"_id": user_oid})
         
+        # 6. Stop authenticating outstanding tokens from the principal cache
+        principal_cache.invalidate(user_id)
+        
         return
         
     except Exception as e:
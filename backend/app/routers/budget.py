@@ -2,12 +2,15 @@
 Budget router for budget analysis and calculation
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from bson import ObjectId
 from datetime import datetime
 
 from ..models.budget import BudgetResponse, BudgetInDB
-from ..dependencies.auth import get_current_user
+from ..models.budget_scenario import BudgetScenarioRequest, BudgetScenarioResponse, BudgetScenarioResult
+from ..config import settings
+from ..dependencies.ownership import require_script_owner
 from ..database import get_database
+from ..services.budget_updates import sum_accepted_revenue
+from ..services.budget_scenarios import baseline_adsense_revenue, brand_safety_score
 
 router = APIRouter(
     prefix="/api/v1/scripts",
@@ -17,14 +20,14 @@ router = APIRouter(
 @router.post("/{script_id}/budget", response_model=BudgetResponse, response_model_by_alias=True)
 async def calculate_budget(
     script_id: str,
-    current_user_id: str = Depends(get_current_user)
+    script: dict = Depends(require_script_owner("access this script", fields=("params",)))
 ):
     """
     Calculate budget impact for a script based on accepted queries
     
     Args:
         script_id: Script ID to calculate budget for
-        current_user_id: ID of the authenticated user
+        script: Owned script (params)
         
     Returns:
         BudgetResponse: Calculated budget model
@@ -33,49 +36,12 @@ async def calculate_budget(
         HTTPException: If script not found or user doesn't own script
     """
     db = get_database()
-    scripts_collection = db["scripts"]
     queries_collection = db["commercial_queries"]
     budget_collection = db["budget_models"]
     
-    # Validate ObjectId format
+    # Sum accepted query revenue per category on the server
     try:
-        script_object_id = ObjectId(script_id)
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid script ID format"
-        )
-    
-    # Fetch script to verify ownership and get params
-    try:
-        script = await scripts_collection.find_one({"_id": script_object_id})
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch script: {str(e)}"
-        )
-    
-    # Check if script exists
-    if not script:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Script not found"
-        )
-    
-    # Verify ownership
-    if script["user_id"] != current_user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You don't have permission to access this script"
-        )
-    
-    # Fetch accepted queries for this script
-    try:
-        cursor = queries_collection.find({
-            "script_id": script_id,
-            "status": "accepted"
-        })
-        accepted_queries = await cursor.to_list(length=None)
+        sponsorship_revenue, category_breakdown = await sum_accepted_revenue(queries_collection, script_id)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -84,42 +50,16 @@ async def calculate_budget(
     
     # Calculate revenue
     # Baseline AdSense: Assume $5 per 1000 views, 10M views for target audience size
-    # This is a simplified calculation as per PRD "predefined industry benchmarks"
-    # In a real app, this would be more complex
-    
     target_audience = script["params"].get("target_audience", "")
     production_budget = float(script["params"].get("target_production_budget", 0))
-    
-    # Simple baseline based on audience type (mock logic)
-    baseline_adsense = 50000.0  # Default baseline
-    if "young" in target_audience.lower():
-        baseline_adsense = 60000.0
-    elif "tech" in target_audience.lower():
-        baseline_adsense = 75000.0
-        
-    # Calculate sponsorship revenue and category breakdown
-    sponsorship_revenue = 0
-    category_breakdown = {}
-    
-    for query in accepted_queries:
-        revenue = query.get("estimated_revenue", 0)
-        sponsorship_revenue += revenue
+    baseline_adsense = baseline_adsense_revenue(target_audience)
         
-        # Get category/type
-        query_type = query.get("type", "other")
-        # Convert to string and capitalize
-        category = str(query_type).capitalize()
-            
-        category_breakdown[category] = category_breakdown.get(category, 0) + revenue
-    
     total_revenue = baseline_adsense + sponsorship_revenue
     net_impact = total_revenue - production_budget
     
-    # Calculate Brand Safety Score (Mock logic for demonstration)
+    # Calculate Brand Safety Score
     # In a production app, this would analyze text sentiment, profanity, etc.
-    brand_safety_score = 95
-    if "Product" in category_breakdown and category_breakdown["Product"] > 10000:
-        brand_safety_score -= 5 # Slightly lower if very heavy on product placement
+    brand_safety = brand_safety_score(category_breakdown)
     
     # Generate Monetization Tips
     monetization_tips = [
@@ -146,7 +86,7 @@ async def calculate_budget(
         "production_budget": production_budget,
         "net_impact": net_impact,
         "category_breakdown": category_breakdown,
-        "brand_safety_score": brand_safety_score,
+        "brand_safety_score": brand_safety,
         "monetization_tips": monetization_tips,
         "updated_at": now
     }
@@ -179,7 +119,7 @@ async def calculate_budget(
             production_budget=production_budget,
             net_impact=net_impact,
             category_breakdown=category_breakdown,
-            brand_safety_score=brand_safety_score,
+            brand_safety_score=brand_safety,
             monetization_tips=monetization_tips,
             created_at=created_at,
             updated_at=now
@@ -191,60 +131,120 @@ async def calculate_budget(
             detail=f"Failed to save budget calculation: {str(e)}"
         )
 
-@router.get("/{script_id}/budget", response_model=BudgetResponse, response_model_by_alias=True)
-async def get_budget(
+@router.post("/{script_id}/budget/scenarios", response_model=BudgetScenarioResponse, response_model_by_alias=True)
+async def evaluate_budget_scenarios(
     script_id: str,
-    current_user_id: str = Depends(get_current_user)
+    scenario_request: BudgetScenarioRequest,
+    script: dict = Depends(require_script_owner("access this script", fields=("params",)))
 ):
     """
-    Retrieve existing budget calculation
+    Evaluate what-if budget scenarios without changing any query or budget
+    
+    The script's queries are loaded once and every scenario is evaluated in
+    one vectorized pass, so producers can compare accept/reject combinations
+    and creative flexibility levels before committing to them.
     
     Args:
-        script_id: Script ID to retrieve budget for
-        current_user_id: ID of the authenticated user
+        script_id: Script ID to evaluate scenarios for
+        scenario_request: Scenarios (accepted query ids, creative flexibility, minimum confidence)
+        script: Owned script (params)
         
     Returns:
-        BudgetResponse: Budget model
+        BudgetScenarioResponse: Totals, net impact and category breakdown per scenario
         
     Raises:
-        HTTPException: If script/budget not found or user doesn't own script
+        HTTPException: If the script is not owned, there are too many scenarios
+            or a scenario references a query of another script
     """
-    db = get_database()
-    scripts_collection = db["scripts"]
-    budget_collection = db["budget_models"]
+    from ..models.script import CreativeFlexibility
+    from ..services.budget_scenarios import Scenario, evaluate_scenarios
+    from ..services.detection_executor import get_detection_executor, DetectionQueueFullError
     
-    # Validate ObjectId format
-    try:
-        script_object_id = ObjectId(script_id)
-    except Exception:
+    if len(scenario_request.scenarios) > settings.budget_scenario_max_scenarios:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid script ID format"
+            detail=f"At most {settings.budget_scenario_max_scenarios} scenarios can be evaluated per request"
         )
     
-    # Fetch script to verify ownership
+    db = get_database()
+    
+    # Load the fields scenarios depend on, once for all scenarios
     try:
-        script = await scripts_collection.find_one({"_id": script_object_id})
+        cursor = db["commercial_queries"].find(
+            {"script_id": script_id},
+            {"term": 1, "status": 1, "type": 1, "estimated_revenue": 1, "confidence_score": 1}
+        )
+        queries = await cursor.to_list(length=None)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch script: {str(e)}"
+            detail=f"Failed to fetch queries: {str(e)}"
         )
     
-    # Check if script exists
-    if not script:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Script not found"
-        )
+    # Resolve query ids to positions in the loaded queries
+    positions = {str(query["_id"]): position for position, query in enumerate(queries)}
+    script_flexibility = CreativeFlexibility(script["params"]["creative_flexibility"])
+    scenarios = []
+    for scenario_number, scenario in enumerate(scenario_request.scenarios):
+        accepted_positions = None
+        if scenario.accepted_query_ids is not None:
+            unknown_ids = [query_id for query_id in scenario.accepted_query_ids if query_id not in positions]
+            if unknown_ids:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Scenario {scenario_number} references queries not found for this script: {', '.join(unknown_ids[:5])}"
+                )
+            accepted_positions = [positions[query_id] for query_id in scenario.accepted_query_ids]
+        scenarios.append(Scenario(
+            accepted_positions=accepted_positions,
+            creative_flexibility=scenario.creative_flexibility or script_flexibility,
+            min_confidence=scenario.min_confidence
+        ))
     
-    # Verify ownership
-    if script["user_id"] != current_user_id:
+    baseline_adsense = baseline_adsense_revenue(script["params"].get("target_audience", ""))
+    production_budget = float(script["params"].get("target_production_budget", 0))
+    
+    # Large sweeps take a while; keep them off the event loop, within the executor's queue limit
+    try:
+        results = await get_detection_executor().run_in_thread(
+            evaluate_scenarios, queries, script_flexibility, scenarios, baseline_adsense, production_budget
+        )
+    except DetectionQueueFullError as e:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You don't have permission to access this script"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Analysis capacity exhausted, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
         )
+    
+    return BudgetScenarioResponse(
+        script_id=script_id,
+        baseline_adsense_revenue=baseline_adsense,
+        production_budget=production_budget,
+        query_count=len(queries),
+        scenarios=[BudgetScenarioResult(**result) for result in results]
+    )
+
+@router.get("/{script_id}/budget", response_model=BudgetResponse, response_model_by_alias=True)
+async def get_budget(
+    script_id: str,
+    script: dict = Depends(require_script_owner("access this script"))
+):
+    """
+    Retrieve existing budget calculation
+    
+    Args:
+        script_id: Script ID to retrieve budget for
+        script: Owned script (ownership check only)
+        
+    Returns:
+        BudgetResponse: Budget model
         
+    Raises:
+        HTTPException: If script/budget not found or user doesn't own script
+    """
+    db = get_database()
+    budget_collection = db["budget_models"]
+    
     # Fetch budget model
     try:
         budget = await budget_collection.find_one({"script_id": script_id})
@@ -0,0 +1,85 @@
+"""
+Jobs router for polling background analysis jobs
+"""
+import asyncio
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from bson import ObjectId
+
+from ..models.job import AnalysisJobResponse, job_to_response
+from ..dependencies.auth import get_current_user
+from ..database import get_database
+from ..services.job_queue import JOBS_COLLECTION, ACTIVE_JOB_STATUSES
+
+router = APIRouter(
+    prefix="/api/v1/jobs",
+    tags=["jobs"]
+)
+
+# How often a long-poll request re-reads the job
+JOB_POLL_INTERVAL_SECONDS = 0.5
+
+
+@router.get("/{job_id}", response_model=AnalysisJobResponse)
+async def get_job(
+    job_id: str,
+    wait: int = Query(0, ge=0, le=30, description="Seconds to wait for the job to finish before responding"),
+    current_user_id: str = Depends(get_current_user)
+):
+    """
+    Get the status of a background analysis job
+    
+    With wait > 0 the request is held until the job succeeds or fails, or
+    the wait elapses, so clients can long-poll instead of polling rapidly.
+    
+    Args:
+        job_id: Job ID returned when the job was submitted
+        wait: Maximum seconds to wait for completion
+        current_user_id: ID of the authenticated user
+        
+    Returns:
+        AnalysisJobResponse: Current job status
+        
+    Raises:
+        HTTPException: If job not found or user doesn't own the job
+    """
+    # Validate ObjectId format
+    try:
+        job_object_id = ObjectId(job_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid job ID format"
+        )
+    
+    jobs_collection = get_database()[JOBS_COLLECTION]
+    deadline = time.monotonic() + wait
+    
+    while True:
+        try:
+            job = await jobs_collection.find_one({"_id": job_object_id})
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to fetch job: {str(e)}"
+            )
+        
+        # Check if job exists
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found"
+            )
+        
+        # Verify ownership
+        if job["user_id"] != current_user_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You don't have permission to access this job"
+            )
+        
+        if job["status"] not in ACTIVE_JOB_STATUSES or time.monotonic() >= deadline:
+            return job_to_response(job)
+        
+        await asyncio.sleep(min(JOB_POLL_INTERVAL_SECONDS, max(0.0, deadline - time.monotonic())))
@@ -1,22 +1,48 @@
 """
 Scripts router for script management and analysis
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
 from datetime import datetime
-from typing import List
+from typing import AsyncIterator, List, Optional
+import asyncio
+import base64
+import json
+import logging
 
-from ..models.script import ScriptCreate, ScriptInDB, ScriptResponse, ScriptAnalysisResponse
+from ..models.script import ScriptCreate, ScriptUpdate, ScriptInDB, ScriptResponse, ScriptAnalysisResponse
 from ..models.commercial_query import CommercialQueryResponse
 from ..models.budget import BudgetResponse
+from ..models.job import AnalysisJobResponse, job_to_response
 from ..dependencies.auth import get_current_user
-from ..database import get_database
+from ..config import settings
+from ..dependencies.ownership import require_script_owner, ownership_cache
+from ..services.script_analysis import (
+    analyze_script_progressively,
+    detect_script_document_queries,
+    script_analysis_key,
+    store_script_queries,
+    to_storage_document,
+    fill_excerpts,
+    fill_missing_excerpts,
+    fill_script_excerpts,
+)
+from ..services.script_storage import TEXT_FIELDS, delete_script_text, load_script_text, open_script_text
+from ..services.budget_updates import apply_budget_increments, budget_increments, refresh_budget_totals
+from ..database import get_database, run_in_transaction
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/api/v1/scripts",
     tags=["scripts"]
 )
 
+# Number of scripts joined and serialized at a time by the NDJSON export
+EXPORT_BATCH_SIZE = 50
+
 
 def generate_title_from_text(text: str) -> str:
     """
@@ -35,14 +61,245 @@ def generate_title_from_text(text: str) -> str:
     return title
 
 
+def format_sse_event(event: str, data: dict) -> str:
+    """
+    Encode one Server-Sent Event
+    
+    Args:
+        event: Event name
+        data: JSON-serializable payload
+        
+    Returns:
+        str: The event in text/event-stream format
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# Response header carrying the keyset cursor for the next page of a listing
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(script: dict) -> str:
+    """
+    Encode the (created_at, _id) keyset position of a script as an opaque cursor
+    
+    Args:
+        script: Script document (must include created_at and _id)
+        
+    Returns:
+        str: URL-safe cursor string
+    """
+    raw = f"{script['created_at'].isoformat()}|{script['_id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def build_scripts_page_filter(user_id: str, after: Optional[str]) -> dict:
+    """
+    Build the scripts filter for a keyset page ordered by (created_at, _id) descending
+    
+    Args:
+        user_id: Owner of the scripts
+        after: Cursor returned with the previous page, if any
+        
+    Returns:
+        dict: MongoDB filter
+        
+    Raises:
+        HTTPException: If the cursor is malformed
+    """
+    query = {"user_id": user_id}
+    if not after:
+        return query
+    
+    try:
+        raw = base64.urlsafe_b64decode(after.encode("ascii")).decode("utf-8")
+        created_at_str, id_str = raw.split("|", 1)
+        created_at = datetime.fromisoformat(created_at_str)
+        last_id = ObjectId(id_str)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+    
+    query["$or"] = [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": last_id}}
+    ]
+    return query
+
+
+async def fetch_scripts_page(
+    scripts_collection,
+    user_id: str,
+    limit: Optional[int],
+    after: Optional[str],
+    projection: dict,
+    response: Response
+) -> List[dict]:
+    """
+    Fetch one keyset page of a user's scripts, newest first
+    
+    When a limit is given and more scripts remain, the cursor for the next
+    page is set in the X-Next-Cursor response header.
+    
+    Args:
+        scripts_collection: Scripts collection
+        user_id: Owner of the scripts
+        limit: Maximum number of scripts, or None for all remaining scripts
+        after: Cursor returned with the previous page, if any
+        projection: Fields to load
+        response: Response used to return the next-page cursor
+        
+    Returns:
+        List[dict]: Script documents
+    """
+    cursor = scripts_collection.find(
+        build_scripts_page_filter(user_id, after),
+        projection
+    ).sort([("created_at", -1), ("_id", -1)])
+    
+    if limit is None:
+        return await cursor.to_list(length=None)
+    
+    # Read one extra document to learn whether another page exists
+    scripts = await cursor.limit(limit + 1).to_list(length=limit + 1)
+    if len(scripts) > limit:
+        scripts = scripts[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(scripts[-1])
+    return scripts
+
+
+async def build_script_analyses(db, scripts: List[dict]) -> List[ScriptAnalysisResponse]:
+    """
+    Join scripts with their budgets and queries using two batched lookups
+    
+    Args:
+        db: Database instance
+        scripts: Script documents, in the order the analyses should be returned
+        
+    Returns:
+        List[ScriptAnalysisResponse]: Analyses for scripts that have a budget calculated
+    """
+    from ..models.script import ScriptParams
+    
+    script_ids = [str(script["_id"]) for script in scripts]
+    if not script_ids:
+        return []
+    
+    # Fetch budgets for all scripts at once, keeping the first per script
+    budgets_by_script = {}
+    budget_cursor = db["budget_models"].find({"script_id": {"$in": script_ids}})
+    async for budget in budget_cursor:
+        budgets_by_script.setdefault(budget["script_id"], budget)
+    
+    # Fetch queries only for scripts that will be returned, grouped per script
+    analysed_ids = [script_id for script_id in script_ids if script_id in budgets_by_script]
+    queries_by_script = {script_id: [] for script_id in analysed_ids}
+    if analysed_ids:
+        queries_cursor = db["commercial_queries"].find({"script_id": {"$in": analysed_ids}})
+        async for query in queries_cursor:
+            queries_by_script[query["script_id"]].append(query)
+        
+        # Derive excerpts not stored with the queries, loading text only where needed
+        script_texts = {script_id: script.get("text") for script, script_id in zip(scripts, script_ids)}
+        await fill_missing_excerpts(
+            db, script_texts, [query for queries in queries_by_script.values() for query in queries]
+        )
+    
+    analyses = []
+    for script, script_id in zip(scripts, script_ids):
+        try:
+            budget = budgets_by_script.get(script_id)
+            if not budget:
+                continue # Skip if no budget calculated yet (incomplete analysis)
+            
+            # Text stored in GridFS is only present in the projection when requested
+            if script.get("text_file_id") is not None and script.get("text") is None:
+                script["text"] = await load_script_text(db, script)
+            
+            queries = queries_by_script[script_id]
+            
+            # Construct Query Responses
+            query_responses = [
+                CommercialQueryResponse(
+                    id=str(q["_id"]),
+                    script_id=q["script_id"],
+                    term=q["term"],
+                    type=q["type"],
+                    reason=q["reason"],
+                    estimated_revenue=q["estimated_revenue"],
+                    status=q["status"],
+                    script_excerpt=q["script_excerpt"],
+                    start_index=q["start_index"],
+                    end_index=q["end_index"],
+                    confidence_score=q["confidence_score"],
+                    created_at=q["created_at"],
+                    updated_at=q["updated_at"]
+                ) for q in queries
+            ]
+            
+            # Construct Budget Response
+            budget_response = BudgetResponse(
+                id=str(budget["_id"]),
+                script_id=budget["script_id"],
+                baseline_adsense_revenue=budget["baseline_adsense_revenue"],
+                potential_sponsorship_revenue=budget["potential_sponsorship_revenue"],
+                total_projected_revenue=budget["total_projected_revenue"],
+                production_budget=budget["production_budget"],
+                net_impact=budget["net_impact"],
+                category_breakdown=budget.get("category_breakdown"),
+                brand_safety_score=budget.get("brand_safety_score", 100),
+                monetization_tips=budget.get("monetization_tips", []),
+                created_at=budget["created_at"],
+                updated_at=budget["updated_at"]
+            )
+            
+            # Construct ScriptInDB
+            script_in_db = ScriptInDB(
+                id=script_id,
+                user_id=script["user_id"],
+                title=script["title"],
+                text=script.get("text"),
+                params=ScriptParams(**script["params"]),
+                created_at=script["created_at"],
+                updated_at=script["updated_at"]
+            )
+            
+            analyses.append(ScriptAnalysisResponse(
+                script=script_in_db,
+                budget_model=budget_response,
+                commercial_queries=query_responses,
+                saved_at=budget["updated_at"] # Use budget update time as "saved at" equivalent
+            ))
+        except Exception as e:
+            # Log error and skip this script if it's malformed
+            print(f"Error processing script {script.get('_id')}: {e}")
+            continue
+    
+    return analyses
+
+
 @router.get("/analyses", response_model=List[ScriptAnalysisResponse], response_model_by_alias=True)
 async def list_script_analyses(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximum number of scripts to scan for this page"),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    include: Optional[str] = Query(None, description="Comma-separated optional fields to include (supported: text)"),
     current_user_id: str = Depends(get_current_user)
 ):
     """
-    List all script analyses for the current user, including budget and queries
+    List script analyses for the current user, including budget and queries
+    
+    Scripts are paged newest first by (created_at, _id). Scripts without a
+    budget are skipped, so a page may hold fewer analyses than the limit.
+    The script text is only loaded when requested with include=text.
     
     Args:
+        response: Response used to return the next-page cursor
+        limit: Maximum number of scripts to scan, or all when omitted
+        after: Cursor for the next page
+        include: Optional fields to include
         current_user_id: ID of the authenticated user
         
     Returns:
@@ -50,98 +307,411 @@ async def list_script_analyses(
     """
     db = get_database()
     scripts_collection = db["scripts"]
-    budget_collection = db["budget_models"]
-    queries_collection = db["commercial_queries"]
+    
+    include_fields = {field.strip() for field in include.split(",")} if include else set()
+    projection = None if "text" in include_fields else {"text": 0, "text_file_id": 0}
     
     try:
-        # Fetch all scripts for the user, sorted by created_at descending
-        cursor = scripts_collection.find(
-            {"user_id": current_user_id}
-        ).sort("created_at", -1)
+        # Fetch the page of scripts for the user, sorted by created_at descending
+        scripts = await fetch_scripts_page(
+            scripts_collection, current_user_id, limit, after, projection, response
+        )
+        
+        # Join budgets and queries with one batched query each
+        return await build_script_analyses(db, scripts)
         
-        scripts = await cursor.to_list(length=None)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch analyses: {str(e)}"
+        )
+
+
+async def stream_script_analyses(db, user_id: str, projection: Optional[dict]) -> AsyncIterator[str]:
+    """
+    Yield a user's analyses as NDJSON lines, newest first
+    
+    Scripts are read from a cursor and joined in batches of EXPORT_BATCH_SIZE,
+    so memory use does not grow with the number of scripts.
+    
+    Args:
+        db: Database instance
+        user_id: Owner of the scripts
+        projection: Script fields to load
         
-        analyses = []
+    Yields:
+        str: One JSON-encoded ScriptAnalysisResponse per line
+    """
+    cursor = db["scripts"].find(
+        {"user_id": user_id},
+        projection
+    ).sort([("created_at", -1), ("_id", -1)]).batch_size(EXPORT_BATCH_SIZE)
+    
+    batch = []
+    try:
+        async for script in cursor:
+            batch.append(script)
+            if len(batch) < EXPORT_BATCH_SIZE:
+                continue
+            for analysis in await build_script_analyses(db, batch):
+                yield analysis.model_dump_json(by_alias=True) + "\n"
+            batch = []
         
-        from ..models.script import ScriptParams
+        for analysis in await build_script_analyses(db, batch):
+            yield analysis.model_dump_json(by_alias=True) + "\n"
+    except Exception as e:
+        # Headers are already sent, so the client sees a truncated stream
+        logger.error(f"Analyses export failed for user {user_id}: {str(e)}")
+        raise
+    finally:
+        await cursor.close()
+
+
+@router.get("/analyses/export")
+async def export_script_analyses(
+    include: Optional[str] = Query(None, description="Comma-separated optional fields to include (supported: text)"),
+    current_user_id: str = Depends(get_current_user)
+):
+    """
+    Stream all script analyses for the current user as NDJSON
+    
+    Each line is one ScriptAnalysisResponse, in the same shape and order as
+    GET /analyses. The first lines are sent before the whole result set has
+    been read, and memory use stays constant regardless of script count.
+    
+    Args:
+        include: Optional fields to include
+        current_user_id: ID of the authenticated user
         
-        for script in scripts:
-            try:
-                script_id = str(script["_id"])
+    Returns:
+        StreamingResponse: application/x-ndjson stream of analyses
+    """
+    db = get_database()
+    
+    include_fields = {field.strip() for field in include.split(",")} if include else set()
+    projection = None if "text" in include_fields else {"text": 0, "text_file_id": 0}
+    
+    return StreamingResponse(
+        stream_script_analyses(db, current_user_id, projection),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.websocket("/live")
+async def live_detection(
+    websocket: WebSocket,
+    token: str = Query(..., description="JWT access token (browsers cannot set WebSocket headers)")
+):
+    """
+    Stream commercial query matches for a document while it is being edited
+    
+    Protocol (JSON messages):
+        client -> {"type": "init", "text": str, "creativeFlexibility": str (optional)}
+        server -> {"type": "matches", "version": 0, "added": [match, ...], "removed": []}
+        client -> {"type": "edit", "offset": int, "deleted": int, "inserted": str}
+        server -> {"type": "matches", "version": n, "added": [...], "removed": [match id, ...]}
+        server -> {"type": "error", "detail": str} (the message is ignored)
+    
+    Offsets refer to the document after all previous edits. Matches not
+    listed in a reply keep their id and shift with the edit like the text.
+    
+    Args:
+        websocket: Client connection
+        token: JWT access token
+    """
+    from ..services.detection_executor import get_detection_executor, DetectionQueueFullError
+    from ..services.live_detection import LiveMatchIndex, InvalidEditError, scan_matches
+    from ..services.ai_detection import get_term_dictionary
+    from ..models.script import CreativeFlexibility
+    
+    try:
+        await get_current_user(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    
+    index = None
+    version = 0
+    try:
+        while True:
+            message = await websocket.receive_json()
+            message_type = message.get("type") if isinstance(message, dict) else None
+            
+            if message_type == "init":
+                text = message.get("text")
+                if not isinstance(text, str) or len(text) > settings.live_detection_max_chars:
+                    await websocket.send_json({
+                        "type": "error",
+                        "detail": f"text must be a string of at most {settings.live_detection_max_chars} characters"
+                    })
+                    continue
+                try:
+                    flexibility = CreativeFlexibility(
+                        message.get("creativeFlexibility", CreativeFlexibility.MINOR_DIALOGUE_CHANGES)
+                    )
+                except ValueError:
+                    await websocket.send_json({"type": "error", "detail": "Invalid creativeFlexibility"})
+                    continue
                 
-                # Fetch budget
-                budget = await budget_collection.find_one({"script_id": script_id})
-                if not budget:
-                    continue # Skip if no budget calculated yet (incomplete analysis)
-                    
-                # Fetch queries
-                queries_cursor = queries_collection.find({"script_id": script_id})
-                queries = await queries_cursor.to_list(length=None)
+                # The full initial scan goes through the executor like any analysis
+                try:
+                    fingerprint, matches = await get_detection_executor().run(scan_matches, text)
+                except DetectionQueueFullError:
+                    await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                    return
                 
-                # Construct Query Responses
-                query_responses = [
-                    CommercialQueryResponse(
-                        id=str(q["_id"]),
-                        script_id=q["script_id"],
-                        term=q["term"],
-                        type=q["type"],
-                        reason=q["reason"],
-                        estimated_revenue=q["estimated_revenue"],
-                        status=q["status"],
-                        script_excerpt=q["script_excerpt"],
-                        start_index=q["start_index"],
-                        end_index=q["end_index"],
-                        confidence_score=q["confidence_score"],
-                        created_at=q["created_at"],
-                        updated_at=q["updated_at"]
-                    ) for q in queries
-                ]
+                # A pool worker may have scanned with another dictionary version;
+                # the index then re-scans with this process's dictionary
+                dictionary = get_term_dictionary()
+                if fingerprint != dictionary.fingerprint:
+                    matches = None
+                index = LiveMatchIndex(text, flexibility, matches, dictionary)
+                version = 0
+                await websocket.send_json({
+                    "type": "matches",
+                    "version": version,
+                    "added": [index.describe(match) for match in index.matches()],
+                    "removed": []
+                })
+            
+            elif message_type == "edit":
+                if index is None:
+                    await websocket.send_json({"type": "error", "detail": "Send an init message first"})
+                    continue
                 
-                # Construct Budget Response
-                budget_response = BudgetResponse(
-                    id=str(budget["_id"]),
-                    script_id=budget["script_id"],
-                    baseline_adsense_revenue=budget["baseline_adsense_revenue"],
-                    potential_sponsorship_revenue=budget["potential_sponsorship_revenue"],
-                    total_projected_revenue=budget["total_projected_revenue"],
-                    production_budget=budget["production_budget"],
-                    net_impact=budget["net_impact"],
-                    category_breakdown=budget.get("category_breakdown"),
-                    brand_safety_score=budget.get("brand_safety_score", 100),
-                    monetization_tips=budget.get("monetization_tips", []),
-                    created_at=budget["created_at"],
-                    updated_at=budget["updated_at"]
-                )
+                offset = message.get("offset")
+                deleted = message.get("deleted", 0)
+                inserted = message.get("inserted", "")
+                if not isinstance(offset, int) or not isinstance(deleted, int) or not isinstance(inserted, str):
+                    await websocket.send_json({
+                        "type": "error",
+                        "detail": "edit needs integer offset and deleted and string inserted"
+                    })
+                    continue
+                if index.text_length - deleted + len(inserted) > settings.live_detection_max_chars:
+                    await websocket.send_json({
+                        "type": "error",
+                        "detail": f"Document would exceed {settings.live_detection_max_chars} characters"
+                    })
+                    continue
                 
-                # Construct ScriptInDB
-                script_in_db = ScriptInDB(
-                    id=script_id,
-                    user_id=script["user_id"],
-                    title=script["title"],
-                    text=script["text"],
-                    params=ScriptParams(**script["params"]),
-                    created_at=script["created_at"],
-                    updated_at=script["updated_at"]
-                )
+                # Re-scans only a window around the edit, so it stays on the event loop
+                try:
+                    added, removed = index.apply_edit(offset, deleted, inserted)
+                except InvalidEditError as e:
+                    await websocket.send_json({"type": "error", "detail": str(e)})
+                    continue
                 
-                analyses.append(ScriptAnalysisResponse(
-                    script=script_in_db,
-                    budget_model=budget_response,
-                    commercial_queries=query_responses,
-                    saved_at=budget["updated_at"] # Use budget update time as "saved at" equivalent
-                ))
-            except Exception as e:
-                # Log error and skip this script if it's malformed
-                print(f"Error processing script {script.get('_id')}: {e}")
-                continue
+                version += 1
+                await websocket.send_json({
+                    "type": "matches",
+                    "version": version,
+                    "added": [index.describe(match) for match in added],
+                    "removed": removed
+                })
             
-        return analyses
+            else:
+                await websocket.send_json({"type": "error", "detail": "Unknown message type"})
+    except WebSocketDisconnect:
+        pass
+    except ValueError:
+        # receive_json could not decode the message
+        await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA)
+
+
+@router.post("/analyze:batch")
+async def analyze_scripts_batch(
+    batch_data: dict,
+    current_user_id: str = Depends(get_current_user)
+):
+    """
+    Analyze many scripts in one call
+    
+    Scripts are loaded with one query, detection runs concurrently on the
+    detection executor, and all queries are written with unordered
+    insert_many calls in bounded chunks.
+    
+    Args:
+        batch_data: Dictionary containing {"script_ids": ["script_id", ...]}
+        current_user_id: ID of the authenticated user
+        
+    Returns:
+        dict: {"analyzed_count": number, "results": [{"id", "result", "query_count"}, ...]}
+              in request order, where result is one of "analyzed", "unchanged",
+              "not_found", "forbidden", "invalid_id", "busy" (retry later) or "failed"
         
+    Raises:
+        HTTPException: If the request is malformed or too large
+    """
+    db = get_database()
+    scripts_collection = db["scripts"]
+    queries_collection = db["commercial_queries"]
+    
+    from ..services.detection_executor import DetectionQueueFullError
+    from ..models.script import ScriptParams
+    from pymongo.errors import BulkWriteError
+    
+    script_ids = batch_data.get("script_ids", [])
+    if not isinstance(script_ids, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="script_ids must be a list"
+        )
+    if len(script_ids) > settings.batch_analyze_max_scripts:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.batch_analyze_max_scripts} scripts can be analyzed per batch"
+        )
+    
+    # Validate ids up front; repeated ids are analyzed once and share the outcome
+    results = []
+    entries_by_id = {}
+    for script_id in script_ids:
+        result_entry = {"id": script_id, "result": None, "query_count": 0}
+        results.append(result_entry)
+        try:
+            script_object_id = ObjectId(script_id)
+        except Exception:
+            result_entry["result"] = "invalid_id"
+            continue
+        entries_by_id.setdefault(script_object_id, []).append(result_entry)
+    
+    def record(script_object_id, result, query_count=0):
+        for result_entry in entries_by_id[script_object_id]:
+            result_entry["result"] = result
+            result_entry["query_count"] = query_count
+    
+    # Load every script in one round trip
+    try:
+        cursor = scripts_collection.find(
+            {"_id": {"$in": list(entries_by_id)}},
+            {"user_id": 1, **dict.fromkeys(TEXT_FIELDS, 1), "params": 1, "analysis_key": 1}
+        )
+        scripts = {script["_id"]: script for script in await cursor.to_list(length=None)}
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch analyses: {str(e)}"
+            detail=f"Failed to fetch scripts: {str(e)}"
         )
+    
+    pending = []
+    unchanged_ids = []
+    for script_object_id in entries_by_id:
+        script = scripts.get(script_object_id)
+        if script is None:
+            record(script_object_id, "not_found")
+        elif script["user_id"] != current_user_id:
+            record(script_object_id, "forbidden")
+        else:
+            params = ScriptParams(**script["params"])
+            analysis_key = script_analysis_key(script, params.creative_flexibility)
+            if script.get("analysis_key") == analysis_key:
+                unchanged_ids.append(str(script_object_id))
+            else:
+                pending.append((script_object_id, script, params, analysis_key))
+    
+    # Stored queries already reflect unchanged scripts; report their counts
+    if unchanged_ids:
+        try:
+            counts = await queries_collection.aggregate([
+                {"$match": {"script_id": {"$in": unchanged_ids}}},
+                {"$group": {"_id": "$script_id", "count": {"$sum": 1}}}
+            ]).to_list(length=None)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to count queries: {str(e)}"
+            )
+        query_counts = {count["_id"]: count["count"] for count in counts}
+        for script_id in unchanged_ids:
+            record(ObjectId(script_id), "unchanged", query_counts.get(script_id, 0))
+    
+    # Fan detection out with bounded concurrency so single analyses still get capacity
+    semaphore = asyncio.Semaphore(settings.batch_analyze_concurrency)
+    
+    async def detect(script, params, analysis_key):
+        async with semaphore:
+            return await detect_script_document_queries(db, script, params, analysis_key)
+    
+    outcomes = await asyncio.gather(
+        *(detect(script, params, analysis_key) for _, script, params, analysis_key in pending),
+        return_exceptions=True
+    )
+    
+    detected = {}
+    for (script_object_id, _, _, analysis_key), outcome in zip(pending, outcomes):
+        if isinstance(outcome, DetectionQueueFullError):
+            record(script_object_id, "busy")
+        elif isinstance(outcome, BaseException):
+            logger.error(f"Batch analysis of script {script_object_id} failed: {str(outcome)}")
+            record(script_object_id, "failed")
+        else:
+            detected[script_object_id] = (outcome, analysis_key)
+    
+    if not detected:
+        return {"analyzed_count": 0, "results": results}
+    
+    # Replace the stored queries of every detected script
+    detected_ids = [str(script_object_id) for script_object_id in detected]
+    
+    async def clear_queries(session):
+        await queries_collection.delete_many({"script_id": {"$in": detected_ids}}, session=session)
+        # Accepted queries went with the old ones, so the budget totals are recomputed
+        await refresh_budget_totals(db, detected_ids, session=session)
+    
+    try:
+        await run_in_transaction(clear_queries)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to clear existing queries: {str(e)}"
+        )
+    
+    now = datetime.utcnow()
+    query_docs = [
+        dict(to_storage_document(query), script_id=str(script_object_id), created_at=now, updated_at=now)
+        for script_object_id, (detected_queries, _) in detected.items()
+        for query in detected_queries
+    ]
+    
+    # Unordered chunks keep going past individual failures; track which scripts they hit
+    failed_ids = set()
+    chunk_size = settings.batch_insert_chunk_size
+    for chunk_start in range(0, len(query_docs), chunk_size):
+        chunk = query_docs[chunk_start:chunk_start + chunk_size]
+        try:
+            await queries_collection.insert_many(chunk, ordered=False)
+        except BulkWriteError as e:
+            failed_ids.update(chunk[error["index"]]["script_id"] for error in e.details.get("writeErrors", []))
+        except Exception as e:
+            logger.error(f"Failed to store batch analysis queries: {str(e)}")
+            failed_ids.update(query["script_id"] for query in chunk)
+    
+    # Record analysis keys for fully stored scripts; partially stored ones must be re-analyzed
+    operations = []
+    analyzed_count = 0
+    for script_object_id, (detected_queries, analysis_key) in detected.items():
+        if str(script_object_id) in failed_ids:
+            record(script_object_id, "failed")
+            operations.append(UpdateOne({"_id": script_object_id}, {"$unset": {"analysis_key": ""}}))
+        else:
+            record(script_object_id, "analyzed", len(detected_queries))
+            operations.append(UpdateOne({"_id": script_object_id}, {"$set": {"analysis_key": analysis_key}}))
+            analyzed_count += 1
+    
+    try:
+        await scripts_collection.bulk_write(operations, ordered=False)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to save analysis state: {str(e)}"
+        )
+    
+    return {"analyzed_count": analyzed_count, "results": results}
 
 
 @router.post("", response_model=ScriptResponse, status_code=status.HTTP_201_CREATED)
@@ -197,17 +767,130 @@ async def create_script(
         )
 
 
+@router.post("/upload", response_model=ScriptResponse, status_code=status.HTTP_201_CREATED)
+async def upload_script(
+    request: Request,
+    target_production_budget: float = Query(..., alias="targetProductionBudget"),
+    target_audience: str = Query(..., alias="targetAudience"),
+    creative_flexibility: str = Query(..., alias="creativeFlexibility"),
+    creative_direction_notes: Optional[str] = Query(None, alias="creativeDirectionNotes"),
+    title: Optional[str] = Query(None, description="Script title (auto-generated if not provided)"),
+    current_user_id: str = Depends(get_current_user)
+):
+    """
+    Create a script from a raw UTF-8 request body streamed into GridFS
+    
+    The body is the script text itself (not JSON or multipart), so uploads
+    of any size are written chunk by chunk without being buffered; the
+    script parameters come from the query string. The text is stored as
+    sent, up to SCRIPT_UPLOAD_MAX_BYTES.
+    
+    Args:
+        request: Request whose body is the script text
+        target_production_budget: Target production budget
+        target_audience: Target audience description
+        creative_flexibility: Level of creative flexibility allowed
+        creative_direction_notes: Optional creative direction notes
+        title: Optional script title
+        current_user_id: ID of the authenticated user
+        
+    Returns:
+        ScriptResponse: Created script summary (id, title, created_at)
+        
+    Raises:
+        HTTPException: If the parameters or text are invalid, the text is too
+            large, or a database error occurs
+    """
+    from fastapi.exceptions import RequestValidationError
+    from pydantic import ValidationError
+    from ..models.script import ScriptParams
+    from ..services.script_storage import ScriptTextError, ScriptTextTooLargeError, store_script_text
+    
+    db = get_database()
+    scripts_collection = db["scripts"]
+    
+    try:
+        params = ScriptParams(
+            target_production_budget=target_production_budget,
+            target_audience=target_audience,
+            creative_flexibility=creative_flexibility,
+            creative_direction_notes=creative_direction_notes
+        )
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    title = title.strip() if title and title.strip() else None
+    
+    # Reject declared oversize bodies before reading them
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.script_upload_max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Script text exceeds {settings.script_upload_max_bytes} bytes"
+        )
+    
+    try:
+        stored = await store_script_text(
+            db, request.stream(), title or "script.txt", {"user_id": current_user_id}
+        )
+    except ScriptTextTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except ScriptTextError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to store script text: {str(e)}"
+        )
+    
+    title = title or generate_title_from_text(stored.title_source)
+    now = datetime.utcnow()
+    script_doc = {
+        "user_id": current_user_id,
+        "title": title,
+        "text_file_id": stored.file_id,
+        "text_sha256": stored.sha256,
+        "text_bytes": stored.size_bytes,
+        "params": params.model_dump(),
+        "created_at": now,
+        "updated_at": now
+    }
+    
+    try:
+        result = await scripts_collection.insert_one(script_doc)
+    except Exception as e:
+        await delete_script_text(db, stored.file_id)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create script: {str(e)}"
+        )
+    
+    return ScriptResponse(
+        id=str(result.inserted_id),
+        title=title,
+        created_at=now
+    )
+
+
 @router.get("/{script_id}", response_model=ScriptInDB)
 async def get_script(
     script_id: str,
-    current_user_id: str = Depends(get_current_user)
+    script: dict = Depends(require_script_owner(
+        "access this script",
+        fields=("title", *TEXT_FIELDS, "params", "created_at", "updated_at")
+    ))
 ):
     """
     Get a script by ID
     
     Args:
         script_id: Script ID to retrieve
-        current_user_id: ID of the authenticated user
+        script: Owned script (title, text, params and timestamps)
         
     Returns:
         ScriptInDB: Full script object with all details
@@ -215,66 +898,266 @@ async def get_script(
     Raises:
         HTTPException: If script not found or user doesn't own the script
     """
+    # Convert MongoDB document to ScriptInDB model
+    from ..models.script import ScriptParams
+    
+    try:
+        text = await load_script_text(get_database(), script)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to load script text: {str(e)}"
+        )
+    
+    return ScriptInDB(
+        id=str(script["_id"]),
+        user_id=script["user_id"],
+        title=script["title"],
+        text=text,
+        params=ScriptParams(**script["params"]),
+        created_at=script["created_at"],
+        updated_at=script["updated_at"]
+    )
+
+
+@router.get("/{script_id}/text")
+async def get_script_text(
+    script_id: str,
+    script: dict = Depends(require_script_owner("access this script", fields=TEXT_FIELDS))
+):
+    """
+    Stream a script's text as plain UTF-8
+    
+    Texts uploaded to GridFS are sent one stored chunk at a time, so large
+    scripts are never loaded whole.
+    
+    Args:
+        script_id: Script ID
+        script: Owned script (text or GridFS reference)
+        
+    Returns:
+        StreamingResponse: text/plain stream of the script text
+        
+    Raises:
+        HTTPException: If script not found, user doesn't own the script, or
+            the stored text cannot be opened
+    """
+    # Open before responding so a missing file is an error, not an empty body
+    try:
+        chunks = await open_script_text(get_database(), script)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to load script text: {str(e)}"
+        )
+    
+    return StreamingResponse(chunks, media_type="text/plain; charset=utf-8")
+
+
+@router.put("/{script_id}")
+async def update_script(
+    script_id: str,
+    script_data: ScriptUpdate,
+    script: dict = Depends(require_script_owner(
+        "edit this script",
+        fields=("title", *TEXT_FIELDS, "params", "analysis_key", "updated_at")
+    ))
+):
+    """
+    Replace a script's text and incrementally refresh its commercial queries
+    
+    When the stored queries reflect the current text, only the edited regions
+    are re-scanned: untouched queries keep their id and status with shifted
+    offsets, and only added, removed or changed queries are written. Scripts
+    that were never analyzed (or whose analysis is stale) just get the new
+    text and are fully analyzed on the next analyze call. The new text is
+    stored inline; an uploaded GridFS text is replaced and removed.
+    
+    Args:
+        script_id: Script ID to update
+        script_data: New text and optional title
+        script: Owned script (title, text, params, analysis key and last update time)
+        
+    Returns:
+        dict: Updated queries (None if the script has no current analysis) and
+            counts of added, removed and updated queries
+        
+    Raises:
+        HTTPException: If script not found, user doesn't own the script, or
+            the script was modified concurrently
+    """
     db = get_database()
     scripts_collection = db["scripts"]
+    queries_collection = db["commercial_queries"]
     
-    # Validate ObjectId format
+    from ..services.detection_executor import get_detection_executor, DetectionQueueFullError
+    from ..services.analysis_cache import make_analysis_key
+    from ..services.incremental_detection import plan_incremental_detection
+    from ..services.ai_detection import build_query_documents
+    from ..models.script import ScriptParams
+    
+    params = ScriptParams(**script["params"])
+    new_text = script_data.text
+    
+    # Incremental detection needs stored queries that reflect the old text exactly
+    incremental = script.get("analysis_key") == script_analysis_key(script, params.creative_flexibility)
     try:
-        script_object_id = ObjectId(script_id)
-    except Exception:
+        old_text = await load_script_text(db, script) if incremental else None
+    except Exception as e:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid script ID format"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to load script text: {str(e)}"
+        )
+    
+    now = datetime.utcnow()
+    script_update = {"text": new_text, "updated_at": now}
+    if script_data.title:
+        script_update["title"] = script_data.title
+    
+    # Save the text and clear the analysis key until the queries catch up;
+    # matching on updated_at rejects edits based on an outdated version
+    try:
+        result = await scripts_collection.update_one(
+            {"_id": script["_id"], "updated_at": script["updated_at"]},
+            {
+                "$set": script_update,
+                "$unset": {"analysis_key": "", "text_file_id": "", "text_sha256": "", "text_bytes": ""}
+            }
         )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update script: {str(e)}"
+        )
+    
+    if result.matched_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Script was modified concurrently, please reload and retry"
+        )
+    
+    # The uploaded text was replaced by the inline one
+    await delete_script_text(db, script.get("text_file_id"))
+    
+    delta = {"added": 0, "removed": 0, "updated": 0}
+    if not incremental:
+        return {"queries": None, "delta": delta}
+    
+    try:
+        cursor = queries_collection.find({"script_id": script_id})
+        stored_queries = await cursor.to_list(length=None)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch queries: {str(e)}"
+        )
+    
+    # Diff and re-scan off the event loop, sending only the fields the plan reads
+    plan_input = [
+        {field: query.get(field) for field in ("_id", "term", "start_index", "end_index", "script_excerpt")}
+        for query in stored_queries
+    ]
+    try:
+        plan = await get_detection_executor().run(
+            plan_incremental_detection, old_text, new_text, plan_input, params
+        )
+    except DetectionQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Analysis capacity exhausted, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to analyze script: {str(e)}"
+        )
+    
+    added_docs = [
+        dict(query, script_id=script_id, created_at=now, updated_at=now)
+        for query in build_query_documents(
+            new_text, plan.added, include_excerpts=not settings.compact_query_storage
+        )
+    ]
+    
+    # Write only the delta, with the budget totals it moves
+    async def apply_delta(session):
+        if plan.removed_ids:
+            await queries_collection.delete_many(
+                {"_id": {"$in": plan.removed_ids}, "script_id": script_id},
+                session=session
+            )
+        
+        if plan.updated:
+            await queries_collection.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": query_id, "script_id": script_id},
+                        {"$set": dict(changes, updated_at=now)}
+                    )
+                    for query_id, changes in plan.updated.items()
+                ],
+                ordered=False,
+                session=session
+            )
+        
+        if added_docs:
+            await queries_collection.insert_many(added_docs, session=session)
+        
+        await refresh_budget_totals(db, [script_id], session=session)
     
-    # Fetch script from database
     try:
-        script = await scripts_collection.find_one({"_id": script_object_id})
+        await run_in_transaction(apply_delta)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch script: {str(e)}"
+            detail=f"Failed to store queries: {str(e)}"
         )
     
-    # Check if script exists
-    if not script:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Script not found"
+    # The stored queries now reflect the new text
+    try:
+        await scripts_collection.update_one(
+            {"_id": script["_id"], "updated_at": now},
+            {"$set": {"analysis_key": make_analysis_key(new_text, params.creative_flexibility)}}
         )
-    
-    # Verify ownership
-    if script["user_id"] != current_user_id:
+    except Exception as e:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You don't have permission to access this script"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to save analysis state: {str(e)}"
         )
     
-    # Convert MongoDB document to ScriptInDB model
-    from ..models.script import ScriptParams
+    # Apply the same delta in memory to build the response
+    removed_ids = set(plan.removed_ids)
+    current_queries = []
+    for query in stored_queries + added_docs:
+        if query["_id"] in removed_ids:
+            continue
+        changes = plan.updated.get(query["_id"])
+        if changes:
+            query.update(changes, updated_at=now)
+        current_queries.append(query)
+    fill_excerpts(current_queries, new_text)
     
-    return ScriptInDB(
-        id=str(script["_id"]),
-        user_id=script["user_id"],
-        title=script["title"],
-        text=script["text"],
-        params=ScriptParams(**script["params"]),
-        created_at=script["created_at"],
-        updated_at=script["updated_at"]
-    )
+    query_responses = []
+    for query in current_queries:
+        query["id"] = str(query.pop("_id"))
+        query_responses.append(CommercialQueryResponse(**query))
+    
+    delta = {"added": len(added_docs), "removed": len(plan.removed_ids), "updated": len(plan.updated)}
+    return {"queries": query_responses, "delta": delta}
 
 
 @router.delete("/{script_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_script(
     script_id: str,
-    current_user_id: str = Depends(get_current_user)
+    script: dict = Depends(require_script_owner("delete this script"))
 ):
     """
     Delete a script and all associated data (budget, queries)
     
     Args:
         script_id: Script ID to delete
-        current_user_id: ID of the authenticated user
+        script: Owned script (ownership check only)
         
     Raises:
         HTTPException: If script not found or user doesn't own script
@@ -284,48 +1167,26 @@ async def delete_script(
     budget_collection = db["budget_models"]
     queries_collection = db["commercial_queries"]
     
-    # Validate ObjectId format
-    try:
-        script_object_id = ObjectId(script_id)
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid script ID format"
-        )
-    
-    # Fetch script to verify ownership
     try:
-        script = await scripts_collection.find_one({"_id": script_object_id})
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch script: {str(e)}"
-        )
-    
-    # Check if script exists
-    if not script:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Script not found"
-        )
-    
-    # Verify ownership
-    if script["user_id"] != current_user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You don't have permission to delete this script"
+        # Delete script, noting any uploaded text it references
+        deleted = await scripts_collection.find_one_and_delete(
+            {"_id": script["_id"]},
+            projection={"text_file_id": 1}
         )
         
-    try:
-        # Delete script
-        await scripts_collection.delete_one({"_id": script_object_id})
-        
         # Delete associated budget
         await budget_collection.delete_many({"script_id": script_id})
         
         # Delete associated queries
         await queries_collection.delete_many({"script_id": script_id})
         
+        # Forget the cached owner so the script ID stops resolving
+        ownership_cache.invalidate([script_id])
+        
+        # Delete the uploaded text, if any
+        if deleted is not None:
+            await delete_script_text(db, deleted.get("text_file_id"))
+        
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -335,12 +1196,18 @@ async def delete_script(
 
 @router.get("", response_model=List[ScriptResponse])
 async def list_user_scripts(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximum number of scripts to return"),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
     current_user_id: str = Depends(get_current_user)
 ):
     """
-    List all scripts for the current user
+    List scripts for the current user, newest first
     
     Args:
+        response: Response used to return the next-page cursor
+        limit: Maximum number of scripts, or all when omitted
+        after: Cursor for the next page
         current_user_id: ID of the authenticated user
         
     Returns:
@@ -350,12 +1217,11 @@ async def list_user_scripts(
     scripts_collection = db["scripts"]
     
     try:
-        # Fetch all scripts for the user, sorted by created_at descending
-        cursor = scripts_collection.find(
-            {"user_id": current_user_id}
-        ).sort("created_at", -1)
-        
-        scripts = await cursor.to_list(length=None)
+        # Fetch only the summary fields, sorted by created_at descending
+        scripts = await fetch_scripts_page(
+            scripts_collection, current_user_id, limit, after,
+            {"title": 1, "created_at": 1}, response
+        )
         
         # Convert to ScriptResponse models
         return [
@@ -366,6 +1232,8 @@ async def list_user_scripts(
             )
             for script in scripts
         ]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -376,14 +1244,17 @@ async def list_user_scripts(
 @router.post("/{script_id}/analyze")
 async def analyze_script(
     script_id: str,
-    current_user_id: str = Depends(get_current_user)
+    script: dict = Depends(require_script_owner(
+        "analyze this script",
+        fields=(*TEXT_FIELDS, "params", "analysis_key")
+    ))
 ):
     """
     Analyze a script for commercial queries
     
     Args:
         script_id: Script ID to analyze
-        current_user_id: ID of the authenticated user
+        script: Owned script (text, params and last analysis key)
         
     Returns:
         dict: Dictionary containing array of detected commercial queries
@@ -392,156 +1263,209 @@ async def analyze_script(
         HTTPException: If script not found or user doesn't own the script
     """
     db = get_database()
-    scripts_collection = db["scripts"]
     queries_collection = db["commercial_queries"]
     
-    # Validate ObjectId format
-    try:
-        script_object_id = ObjectId(script_id)
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid script ID format"
-        )
-    
-    # Fetch script from database
-    try:
-        script = await scripts_collection.find_one({"_id": script_object_id})
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch script: {str(e)}"
-        )
-    
-    # Check if script exists
-    if not script:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Script not found"
-        )
-    
-    # Verify ownership
-    if script["user_id"] != current_user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You don't have permission to analyze this script"
-        )
-    
     # Import detection service
-    from ..services.ai_detection import detect_commercial_queries
+    from ..services.detection_executor import DetectionQueueFullError
     from ..models.script import ScriptParams
     from ..models.commercial_query import CommercialQueryResponse
     
     # Reconstruct ScriptParams from stored data
     params = ScriptParams(**script["params"])
+    analysis_key = script_analysis_key(script, params.creative_flexibility)
+    
+    # Nothing changed since the last analysis: return the stored queries untouched
+    if script.get("analysis_key") == analysis_key:
+        try:
+            cursor = queries_collection.find({"script_id": script_id})
+            stored_queries = await cursor.to_list(length=None)
+            await fill_script_excerpts(db, script, stored_queries)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to fetch queries: {str(e)}"
+            )
+        
+        query_responses = []
+        for query in stored_queries:
+            query["id"] = str(query.pop("_id"))
+            query_responses.append(CommercialQueryResponse(**query))
+        return {"queries": query_responses}
     
-    # Detect commercial queries
+    # Detect off the event loop, or reuse cached results
     try:
-        detected_queries = detect_commercial_queries(script["text"], params)
+        detected_queries = await detect_script_document_queries(db, script, params, analysis_key)
+    except DetectionQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Analysis capacity exhausted, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to analyze script: {str(e)}"
         )
     
-    # Delete existing queries for this script (to allow re-analysis)
+    # Replace the stored queries and record the analysis key they reflect
     try:
-        await queries_collection.delete_many({"script_id": script_id})
+        query_docs = await store_script_queries(db, script["_id"], detected_queries, analysis_key)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to clear existing queries: {str(e)}"
+            detail=f"Failed to store queries: {str(e)}"
         )
     
-    # Store detected queries in database
+    # Create response objects with MongoDB IDs
+    try:
+        await fill_script_excerpts(db, script, query_docs)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to load script text: {str(e)}"
+        )
     query_responses = []
-    if detected_queries:
-        try:
-            # Prepare query documents for insertion
-            query_docs = []
-            for query in detected_queries:
-                query_dict = query.model_dump()
-                query_dict["script_id"] = script_id  # Set the script_id
-                # Remove the 'id' field as MongoDB will generate _id
-                query_dict.pop("id", None)
-                query_docs.append(query_dict)
-            
-            # Insert all queries
-            result = await queries_collection.insert_many(query_docs)
-            
-            # Create response objects with MongoDB IDs
-            for i, inserted_id in enumerate(result.inserted_ids):
-                query_dict = query_docs[i].copy()
-                query_dict["id"] = str(inserted_id)
-                query_responses.append(CommercialQueryResponse(**query_dict))
-                
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to store queries: {str(e)}"
-            )
+    for query_doc in query_docs:
+        query_dict = query_doc.copy()
+        query_dict["id"] = str(query_dict.pop("_id"))
+        query_responses.append(CommercialQueryResponse(**query_dict))
     
     return {"queries": query_responses}
 
 
-@router.get("/{script_id}/queries", response_model=List[CommercialQueryResponse])
-async def get_script_queries(
+@router.post("/{script_id}/analyze/stream")
+async def stream_script_analysis(
     script_id: str,
-    current_user_id: str = Depends(get_current_user)
+    script: dict = Depends(require_script_owner(
+        "analyze this script",
+        fields=(*TEXT_FIELDS, "text_bytes", "params", "analysis_key")
+    ))
 ):
     """
-    Get all commercial queries for a script
+    Analyze a script, streaming progress and results as Server-Sent Events
+    
+    Events (data is JSON):
+        progress -> {"percent": float, "matches": int, "stored": int}
+        queries  -> {"queries": [CommercialQueryResponse, ...]} for each stored batch
+        done     -> {"query_count": int, "unchanged": bool}
+        error    -> {"status": int, "detail": str, "retry_after": int (503 only)}
+    
+    percent is the share of the text scanned so far, matches the queries
+    detected so far and stored those already saved. Queries are sent as soon
+    as they are stored, so large scripts show results before detection
+    finishes. Read it with fetch() (EventSource cannot send the token).
     
     Args:
-        script_id: Script ID to get queries for
-        current_user_id: ID of the authenticated user
+        script_id: Script ID to analyze
+        script: Owned script (text or GridFS reference, params and last analysis key)
         
     Returns:
-        List[CommercialQueryResponse]: Array of commercial queries
+        StreamingResponse: text/event-stream of analysis events
         
     Raises:
         HTTPException: If script not found or user doesn't own the script
     """
+    from ..services.detection_executor import DetectionQueueFullError
+    from ..models.script import ScriptParams
+    
     db = get_database()
-    scripts_collection = db["scripts"]
-    queries_collection = db["commercial_queries"]
+    params = ScriptParams(**script["params"])
+    analysis_key = script_analysis_key(script, params.creative_flexibility)
     
-    # Validate ObjectId format
-    try:
-        script_object_id = ObjectId(script_id)
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid script ID format"
-        )
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event, data in analyze_script_progressively(db, script, params, analysis_key):
+                if event == "queries":
+                    data = {"queries": [
+                        CommercialQueryResponse(
+                            id=str(query["_id"]),
+                            **{field: value for field, value in query.items() if field != "_id"}
+                        ).model_dump(mode="json", by_alias=True)
+                        for query in data["queries"]
+                    ]}
+                yield format_sse_event(event, data)
+        except DetectionQueueFullError as e:
+            yield format_sse_event("error", {
+                "status": status.HTTP_503_SERVICE_UNAVAILABLE,
+                "detail": "Analysis capacity exhausted, please retry shortly",
+                "retry_after": e.retry_after
+            })
+        except Exception as e:
+            # Headers are already sent, so the failure is reported as an event
+            logger.error(f"Streamed analysis of script {script_id} failed: {str(e)}")
+            yield format_sse_event("error", {
+                "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "detail": f"Failed to analyze script: {str(e)}"
+            })
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/{script_id}/analyze/jobs", response_model=AnalysisJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_analysis_job(
+    script_id: str,
+    script: dict = Depends(require_script_owner("analyze this script"))
+):
+    """
+    Queue a background analysis of a script
+    
+    Returns immediately; poll GET /api/v1/jobs/{job_id} (optionally with
+    ?wait=) for completion, then fetch the queries. While a job for the
+    script is queued or running, that job is returned instead of a new one.
+    
+    Args:
+        script_id: Script ID to analyze
+        script: Owned script (ownership check only)
+        
+    Returns:
+        AnalysisJobResponse: The queued (or already active) job
+        
+    Raises:
+        HTTPException: If script not found or user doesn't own the script
+    """
+    from ..services.job_queue import submit_analysis_job as queue_analysis_job
     
-    # Fetch script to verify ownership
     try:
-        script = await scripts_collection.find_one({"_id": script_object_id})
+        job = await queue_analysis_job(script["user_id"], script_id)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch script: {str(e)}"
+            detail=f"Failed to queue analysis job: {str(e)}"
         )
     
-    # Check if script exists
-    if not script:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Script not found"
-        )
+    return job_to_response(job)
+
+
+@router.get("/{script_id}/queries", response_model=List[CommercialQueryResponse])
+async def get_script_queries(
+    script_id: str,
+    script: dict = Depends(require_script_owner("access queries for this script"))
+):
+    """
+    Get all commercial queries for a script
     
-    # Verify ownership
-    if script["user_id"] != current_user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You don't have permission to access queries for this script"
-        )
+    Args:
+        script_id: Script ID to get queries for
+        script: Owned script (ownership check only)
+        
+    Returns:
+        List[CommercialQueryResponse]: Array of commercial queries
+        
+    Raises:
+        HTTPException: If script not found or user doesn't own the script
+    """
+    db = get_database()
+    queries_collection = db["commercial_queries"]
     
     # Fetch all queries for this script
     try:
         cursor = queries_collection.find({"script_id": script_id})
         queries = await cursor.to_list(length=None)
+        await fill_missing_excerpts(db, {}, queries)
         
         # Import response model
         from ..models.commercial_query import CommercialQueryResponse
@@ -576,7 +1500,7 @@ async def get_script_queries(
 async def bulk_update_query_statuses(
     script_id: str,
     updates_data: dict,
-    current_user_id: str = Depends(get_current_user)
+    script: dict = Depends(require_script_owner("modify queries for this script"))
 ):
     """
     Bulk update the status of multiple commercial queries
@@ -584,130 +1508,166 @@ async def bulk_update_query_statuses(
     Args:
         script_id: Script ID that owns the queries
         updates_data: Dictionary containing {"updates": [{"id": "query_id", "status": "accepted"}, ...]}
-        current_user_id: ID of the authenticated user
+        script: Owned script (ownership check only)
         
     Returns:
-        dict: {"updated_count": number, "queries": [updated_query_objects]}
+        dict: {"updated_count": number, "queries": [updated_query_objects],
+               "results": [{"id", "status", "result"}, ...]} where result is one of
+               "updated", "not_found", "invalid_id", "invalid_status" or "failed"
         
     Raises:
         HTTPException: If script not found or user doesn't own script
     """
     db = get_database()
-    scripts_collection = db["scripts"]
     queries_collection = db["commercial_queries"]
     
-    # Validate ObjectId format
-    try:
-        script_object_id = ObjectId(script_id)
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid script ID format"
-        )
-    
-    # Fetch script to verify ownership
-    try:
-        script = await scripts_collection.find_one({"_id": script_object_id})
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch script: {str(e)}"
-        )
-    
-    # Check if script exists
-    if not script:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Script not found"
-        )
-    
-    # Verify ownership
-    if script["user_id"] != current_user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You don't have permission to modify queries for this script"
-        )
-    
     # Get updates list
     updates = updates_data.get("updates", [])
     if not updates:
-        return {"updated_count": 0, "queries": []}
+        return {"updated_count": 0, "queries": [], "results": []}
     
     # Validate statuses
     from ..models.commercial_query import QueryStatus
+    from pymongo.errors import BulkWriteError
     valid_statuses = [s.value for s in QueryStatus]
     
-    # Process updates
-    updated_queries = []
-    updated_count = 0
-    now = datetime.utcnow()
-    
+    # Validate every update up front; for repeated ids the last update wins
+    results = []
+    pending_updates = {}
     for update in updates:
         query_id = update.get("id")
         new_status = update.get("status")
+        result_entry = {"id": query_id, "status": new_status}
+        results.append(result_entry)
         
-        # Skip invalid updates
-        if not query_id or not new_status:
-            continue
-        
-        if new_status not in valid_statuses:
+        if not new_status or new_status not in valid_statuses:
+            result_entry["result"] = "invalid_status"
             continue
         
         # Validate query_id format
         try:
             query_object_id = ObjectId(query_id)
         except Exception:
-            continue  # Skip invalid IDs
+            result_entry["result"] = "invalid_id"
+            continue
         
-        try:
-            # Verify query belongs to the script
-            query = await queries_collection.find_one({
-                "_id": query_object_id,
-                "script_id": script_id
-            })
-            
-            if not query:
-                continue  # Skip queries that don't belong to this script
-            
-            # Update query status
-            result = await queries_collection.update_one(
-                {"_id": query_object_id},
-                {
-                    "$set": {
-                        "status": new_status,
-                        "updated_at": now
-                    }
-                }
+        pending_updates.pop(query_object_id, None)
+        pending_updates[query_object_id] = (new_status, result_entry)
+    
+    if not pending_updates:
+        return {"updated_count": 0, "queries": [], "results": results}
+    
+    # Apply all updates in one round trip; scoping by script_id makes each
+    # operation an atomic ownership check, even with concurrent batches
+    now = datetime.utcnow()
+    operation_ids = list(pending_updates)
+    
+    async def apply_updates(session):
+        # Read the statuses being replaced so the budget moves by exactly the changed revenue
+        cursor = queries_collection.find(
+            {"_id": {"$in": operation_ids}, "script_id": script_id},
+            {"status": 1, "type": 1, "estimated_revenue": 1},
+            session=session
+        )
+        previous_queries = await cursor.to_list(length=None)
+        
+        # Each operation only applies while the query still has the status read
+        # above, so a concurrent change in between cannot skew the deltas
+        operations = [
+            UpdateOne(
+                {"_id": query["_id"], "script_id": script_id, "status": query.get("status")},
+                {"$set": {"status": pending_updates[query["_id"]][0], "updated_at": now}}
             )
-            
-            if result.modified_count > 0:
-                updated_count += 1
-                # Fetch updated query
-                updated_query = await queries_collection.find_one({"_id": query_object_id})
-                updated_queries.append(
-                    CommercialQueryResponse(
-                        id=str(updated_query["_id"]),
-                        script_id=updated_query["script_id"],
-                        term=updated_query["term"],
-                        type=updated_query["type"],
-                        reason=updated_query["reason"],
-                        estimated_revenue=updated_query["estimated_revenue"],
-                        status=updated_query["status"],
-                        script_excerpt=updated_query["script_excerpt"],
-                        start_index=updated_query["start_index"],
-                        end_index=updated_query["end_index"],
-                        confidence_score=updated_query["confidence_score"],
-                        created_at=updated_query["created_at"],
-                        updated_at=updated_query["updated_at"]
-                    )
+            for query in previous_queries
+        ]
+        if not operations:
+            return 0, set()
+        
+        failed_ids = set()
+        try:
+            write_result = await queries_collection.bulk_write(operations, ordered=False, session=session)
+            matched_count, modified_count = write_result.matched_count, write_result.modified_count
+        except BulkWriteError as e:
+            if session is not None:
+                raise  # The transaction is aborted, so none of the updates applied
+            details = e.details
+            matched_count, modified_count = details.get("nMatched", 0), details.get("nModified", 0)
+            failed_ids = {previous_queries[error["index"]]["_id"] for error in details.get("writeErrors", [])}
+        
+        # Move the stored budget in the same transaction as the status changes
+        applied_queries = [query for query in previous_queries if query["_id"] not in failed_ids]
+        if matched_count == len(applied_queries):
+            await apply_budget_increments(db, script_id, budget_increments(
+                (query, pending_updates[query["_id"]][0]) for query in applied_queries
+            ), session=session)
+        else:
+            # Another request changed some of these queries after the read; which
+            # operations lost is unknown, so recompute the totals instead
+            await refresh_budget_totals(db, [script_id], session=session)
+        return modified_count, failed_ids
+    
+    try:
+        updated_count, failed_ids = await run_in_transaction(apply_updates)
+    except BulkWriteError:
+        updated_count, failed_ids = 0, set(operation_ids)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update queries: {str(e)}"
+        )
+    
+    # Fetch the updated queries in one round trip
+    try:
+        cursor = queries_collection.find({
+            "_id": {"$in": operation_ids},
+            "script_id": script_id
+        })
+        fetched_queries = {query["_id"]: query for query in await cursor.to_list(length=None)}
+        await fill_missing_excerpts(db, {}, list(fetched_queries.values()))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch updated queries: {str(e)}"
+        )
+    
+    # Report per-item results and return updated queries in request order
+    updated_queries = []
+    for query_object_id, (_, result_entry) in pending_updates.items():
+        updated_query = fetched_queries.get(query_object_id)
+        if query_object_id in failed_ids:
+            result_entry["result"] = "failed"
+        elif not updated_query:
+            result_entry["result"] = "not_found"  # Missing or belongs to another script
+        else:
+            result_entry["result"] = "updated"
+            updated_queries.append(
+                CommercialQueryResponse(
+                    id=str(updated_query["_id"]),
+                    script_id=updated_query["script_id"],
+                    term=updated_query["term"],
+                    type=updated_query["type"],
+                    reason=updated_query["reason"],
+                    estimated_revenue=updated_query["estimated_revenue"],
+                    status=updated_query["status"],
+                    script_excerpt=updated_query["script_excerpt"],
+                    start_index=updated_query["start_index"],
+                    end_index=updated_query["end_index"],
+                    confidence_score=updated_query["confidence_score"],
+                    created_at=updated_query["created_at"],
+                    updated_at=updated_query["updated_at"]
                 )
-        except Exception:
-            # Skip queries that fail to update
-            continue
+            )
+    
+    # Earlier duplicates of an id share the outcome of its final update
+    outcomes = {str(query_object_id): entry["result"] for query_object_id, (_, entry) in pending_updates.items()}
+    for result_entry in results:
+        if "result" not in result_entry:
+            result_entry["result"] = outcomes[str(ObjectId(result_entry["id"]))]
     
     return {
         "updated_count": updated_count,
-        "queries": updated_queries
+        "queries": updated_queries,
+        "results": results
     }
 
 
@@ -716,7 +1676,7 @@ async def update_query_status(
     script_id: str,
     query_id: str,
     status_update: dict,
-    current_user_id: str = Depends(get_current_user)
+    script: dict = Depends(require_script_owner("modify queries for this script"))
 ):
     """
     Update the status of a single commercial query
@@ -725,7 +1685,7 @@ async def update_query_status(
         script_id: Script ID that owns the query
         query_id: Query ID to update
         status_update: Dictionary containing {"status": "accepted" | "rejected" | "pending"}
-        current_user_id: ID of the authenticated user
+        script: Owned script (ownership check only)
         
     Returns:
         CommercialQueryResponse: Updated query object
@@ -734,18 +1694,9 @@ async def update_query_status(
         HTTPException: If script/query not found, user doesn't own script, or invalid status
     """
     db = get_database()
-    scripts_collection = db["scripts"]
     queries_collection = db["commercial_queries"]
     
-    # Validate ObjectId formats
-    try:
-        script_object_id = ObjectId(script_id)
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid script ID format"
-        )
-    
+    # Validate query ID format
     try:
         query_object_id = ObjectId(query_id)
     except Exception:
@@ -754,29 +1705,6 @@ async def update_query_status(
             detail="Invalid query ID format"
         )
     
-    # Fetch script to verify ownership
-    try:
-        script = await scripts_collection.find_one({"_id": script_object_id})
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch script: {str(e)}"
-        )
-    
-    # Check if script exists
-    if not script:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Script not found"
-        )
-    
-    # Verify ownership
-    if script["user_id"] != current_user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You don't have permission to modify queries for this script"
-        )
-    
     # Validate status value
     new_status = status_update.get("status")
     if not new_status:
@@ -793,52 +1721,42 @@ async def update_query_status(
             detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
         )
     
-    # Fetch query to verify it belongs to the script
-    try:
-        query = await queries_collection.find_one({"_id": query_object_id})
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch query: {str(e)}"
-        )
-    
-    # Check if query exists
-    if not query:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Query not found"
-        )
-    
-    # Verify query belongs to the script
-    if query["script_id"] != script_id:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Query does not belong to this script"
-        )
+    # Update the query only if it belongs to the script, and move the stored
+    # budget by the revenue that changed status in the same transaction
+    now = datetime.utcnow()
     
-    # Update query status
-    try:
-        now = datetime.utcnow()
-        result = await queries_collection.update_one(
-            {"_id": query_object_id},
+    async def apply_update(session):
+        previous_query = await queries_collection.find_one_and_update(
+            {"_id": query_object_id, "script_id": script_id},
             {
                 "$set": {
                     "status": new_status,
                     "updated_at": now
                 }
-            }
+            },
+            return_document=ReturnDocument.BEFORE,
+            session=session
         )
+        if previous_query is not None:
+            await apply_budget_increments(
+                db, script_id, budget_increments([(previous_query, new_status)]), session=session
+            )
+        return previous_query
+    
+    try:
+        previous_query = await run_in_transaction(apply_update)
         
-        if result.modified_count == 0:
+        if not previous_query:
+            # Distinguish a missing query from one owned by another script
+            exists = await queries_collection.find_one({"_id": query_object_id}, {"_id": 1})
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to update query status"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Query does not belong to this script" if exists else "Query not found"
             )
         
-        # Fetch updated query
-        updated_query = await queries_collection.find_one({"_id": query_object_id})
-        
         # Return updated query
+        updated_query = dict(previous_query, status=new_status, updated_at=now)
+        await fill_missing_excerpts(db, {}, [updated_query])
         return CommercialQueryResponse(
             id=str(updated_query["_id"]),
             script_id=updated_query["script_id"],
@@ -2,58 +2,106 @@
 AI Detection Service for Commercial Query Detection
 Uses rule-based logic with predefined commercial terms
 """
-import re
-from typing import List, Dict, Set, Tuple
+from typing import Any, List, Dict, Iterable, Iterator, TextIO, Tuple
 from datetime import datetime
+import logging
+import os
+import time
 import uuid
 
+from ..config import settings
 from ..models.script import ScriptParams, CreativeFlexibility
 from ..models.commercial_query import CommercialQueryInDB, QueryType, QueryStatus
+from .term_dictionary import BUNDLED_CATALOGUE_PATH, TermDictionary, TermDictionaryError
 
 
-# Commercial Terms Database
-COMMERCIAL_TERMS = [
-    # Products
-    {"term": "coffee", "type": QueryType.PRODUCT, "reason": "CPG category; high advertiser demand", "base_revenue": 5000, "base_confidence": 85},
-    {"term": "laptop", "type": QueryType.PRODUCT, "reason": "Tech product; premium sponsorship potential", "base_revenue": 8000, "base_confidence": 90},
-    {"term": "smartphone", "type": QueryType.PRODUCT, "reason": "Tech product; high-value category", "base_revenue": 10000, "base_confidence": 92},
-    {"term": "phone", "type": QueryType.PRODUCT, "reason": "Tech product; high-value category", "base_revenue": 9000, "base_confidence": 88},
-    {"term": "car", "type": QueryType.PRODUCT, "reason": "Automotive; premium sponsorship", "base_revenue": 15000, "base_confidence": 88},
-    {"term": "vehicle", "type": QueryType.PRODUCT, "reason": "Automotive; premium sponsorship", "base_revenue": 14000, "base_confidence": 86},
-    {"term": "watch", "type": QueryType.PRODUCT, "reason": "Luxury goods; high-value placement", "base_revenue": 12000, "base_confidence": 89},
-    {"term": "sneakers", "type": QueryType.PRODUCT, "reason": "Fashion/athletic; strong brand partnerships", "base_revenue": 7000, "base_confidence": 84},
-    {"term": "shoes", "type": QueryType.PRODUCT, "reason": "Fashion/athletic; strong brand partnerships", "base_revenue": 6500, "base_confidence": 82},
-    {"term": "beer", "type": QueryType.PRODUCT, "reason": "Beverage; established product placement", "base_revenue": 8500, "base_confidence": 87},
-    {"term": "wine", "type": QueryType.PRODUCT, "reason": "Beverage; premium brand opportunities", "base_revenue": 7500, "base_confidence": 85},
-    {"term": "soda", "type": QueryType.PRODUCT, "reason": "Beverage; major brand category", "base_revenue": 6000, "base_confidence": 86},
-    
-    # Environments
-    {"term": "kitchen", "type": QueryType.ENVIRONMENT, "reason": "Home setting; appliance/food brands", "base_revenue": 6000, "base_confidence": 80},
-    {"term": "office", "type": QueryType.ENVIRONMENT, "reason": "Workplace setting; B2B opportunities", "base_revenue": 7000, "base_confidence": 82},
-    {"term": "gym", "type": QueryType.ENVIRONMENT, "reason": "Fitness setting; health/wellness brands", "base_revenue": 6500, "base_confidence": 85},
-    {"term": "restaurant", "type": QueryType.ENVIRONMENT, "reason": "Dining setting; food/beverage brands", "base_revenue": 5500, "base_confidence": 83},
-    {"term": "cafe", "type": QueryType.ENVIRONMENT, "reason": "Dining setting; food/beverage brands", "base_revenue": 5000, "base_confidence": 81},
-    {"term": "store", "type": QueryType.ENVIRONMENT, "reason": "Retail setting; multiple brand categories", "base_revenue": 7500, "base_confidence": 84},
-    {"term": "mall", "type": QueryType.ENVIRONMENT, "reason": "Retail setting; multiple brand categories", "base_revenue": 8000, "base_confidence": 85},
-    {"term": "airport", "type": QueryType.ENVIRONMENT, "reason": "Travel setting; premium brand opportunities", "base_revenue": 9000, "base_confidence": 86},
-    {"term": "hotel", "type": QueryType.ENVIRONMENT, "reason": "Hospitality setting; luxury brand placement", "base_revenue": 8500, "base_confidence": 84},
-    
-    # Situations
-    {"term": "wedding", "type": QueryType.SITUATION, "reason": "Life event; multiple brand categories", "base_revenue": 9000, "base_confidence": 87},
-    {"term": "travel", "type": QueryType.SITUATION, "reason": "Tourism/hospitality opportunities", "base_revenue": 8500, "base_confidence": 86},
-    {"term": "vacation", "type": QueryType.SITUATION, "reason": "Tourism/hospitality opportunities", "base_revenue": 8000, "base_confidence": 85},
-    {"term": "party", "type": QueryType.SITUATION, "reason": "Social event; food/beverage/entertainment", "base_revenue": 6000, "base_confidence": 82},
-    {"term": "meeting", "type": QueryType.SITUATION, "reason": "Business setting; B2B opportunities", "base_revenue": 5500, "base_confidence": 80},
-    {"term": "date", "type": QueryType.SITUATION, "reason": "Social setting; lifestyle brands", "base_revenue": 5000, "base_confidence": 79},
-    {"term": "shopping", "type": QueryType.SITUATION, "reason": "Retail activity; multiple brand categories", "base_revenue": 7000, "base_confidence": 83},
-    
-    # Thematic
-    {"term": "luxury", "type": QueryType.THEMATIC, "reason": "Premium lifestyle; high-value brands", "base_revenue": 10000, "base_confidence": 88},
-    {"term": "technology", "type": QueryType.THEMATIC, "reason": "Tech theme; innovation-focused brands", "base_revenue": 9500, "base_confidence": 87},
-    {"term": "fashion", "type": QueryType.THEMATIC, "reason": "Style theme; apparel/accessory brands", "base_revenue": 8000, "base_confidence": 85},
-    {"term": "fitness", "type": QueryType.THEMATIC, "reason": "Health theme; wellness brands", "base_revenue": 7500, "base_confidence": 84},
-    {"term": "adventure", "type": QueryType.THEMATIC, "reason": "Action theme; outdoor/travel brands", "base_revenue": 8500, "base_confidence": 86},
-]
+logger = logging.getLogger(__name__)
+
+# Default chunk size for streamed detection (~1 MB of ASCII text)
+STREAM_CHUNK_CHARS = 1 << 20
+
+# Active term dictionary, replaced as a whole on reload so a scan that holds
+# a reference keeps seeing one consistent version
+_term_dictionary: TermDictionary | None = None
+_term_dictionary_file: Tuple[int, int, int] | None = None  # (inode, size, mtime) of the mapped artifact
+_term_dictionary_checked_at = 0.0
+
+
+def _artifact_signature(path: str) -> Tuple[int, int, int]:
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def reload_term_dictionary() -> TermDictionary:
+    """
+    Load the configured term dictionary and make it the active one
+    
+    Maps the compiled artifact at TERM_DICTIONARY_PATH, or compiles the
+    bundled catalogue in memory when no artifact is configured.
+    
+    Returns:
+        TermDictionary: The newly active dictionary
+        
+    Raises:
+        OSError: If the artifact cannot be read
+        TermDictionaryError: If the artifact is invalid
+    """
+    global _term_dictionary, _term_dictionary_file, _term_dictionary_checked_at
+    
+    path = settings.term_dictionary_path
+    if path:
+        signature = _artifact_signature(path)
+        dictionary = TermDictionary.open(path)
+    else:
+        signature = None
+        dictionary = TermDictionary.from_catalogue(BUNDLED_CATALOGUE_PATH)
+    
+    _term_dictionary, _term_dictionary_file = dictionary, signature
+    _term_dictionary_checked_at = time.monotonic()
+    logger.info(f"Loaded term dictionary {dictionary.version} ({len(dictionary)} terms, {dictionary.fingerprint})")
+    return dictionary
+
+
+def get_term_dictionary() -> TermDictionary:
+    """
+    Get the active term dictionary, picking up a recompiled artifact
+    
+    The artifact file is checked at most every TERM_DICTIONARY_CHECK_SECONDS;
+    when it was replaced, the new version is mapped and swapped in. A broken
+    artifact is logged and the current version stays active. Fetch the
+    dictionary once per scan and use it for both matching and term data.
+    
+    Returns:
+        TermDictionary: Matcher and term data for the current dictionary
+    """
+    global _term_dictionary_checked_at
+    
+    if _term_dictionary is None:
+        return reload_term_dictionary()
+    
+    path = settings.term_dictionary_path
+    now = time.monotonic()
+    if path and now - _term_dictionary_checked_at >= settings.term_dictionary_check_seconds:
+        _term_dictionary_checked_at = now
+        try:
+            if _artifact_signature(path) != _term_dictionary_file:
+                return reload_term_dictionary()
+        except (OSError, TermDictionaryError) as e:
+            logger.error(f"Failed to reload term dictionary, keeping {_term_dictionary.version}: {str(e)}")
+    return _term_dictionary
+
+
+def get_term_dictionary_version() -> str:
+    """
+    Get a short fingerprint of the current term dictionary
+    
+    Covers every field of the term data (not just the terms), so it can be
+    used to version cached detection results.
+    
+    Returns:
+        str: Hex fingerprint of the term dictionary
+    """
+    return get_term_dictionary().fingerprint
 
 
 def calculate_revenue_multiplier(flexibility: CreativeFlexibility) -> float:
@@ -121,72 +169,246 @@ def extract_excerpt(text: str, start: int, end: int, context_chars: int = 50) ->
     return excerpt
 
 
-def detect_commercial_queries(script_text: str, params: ScriptParams) -> List[CommercialQueryInDB]:
+class DetectedQuery:
     """
-    Detect commercial queries in script text using rule-based logic
+    Lightweight detection result for one term occurrence
+    
+    Used on the hot path instead of CommercialQueryInDB: no validation, no
+    per-match id or timestamp, and type/reason reference the shared term
+    dictionary strings. Pydantic models are built only at the API boundary.
+    """
+    __slots__ = ("term", "type", "reason", "estimated_revenue", "confidence_score", "start_index", "end_index")
+    
+    def __init__(
+        self,
+        term: str,
+        type: QueryType,
+        reason: str,
+        estimated_revenue: float,
+        confidence_score: int,
+        start_index: int,
+        end_index: int
+    ):
+        self.term = term
+        self.type = type
+        self.reason = reason
+        self.estimated_revenue = estimated_revenue
+        self.confidence_score = confidence_score
+        self.start_index = start_index
+        self.end_index = end_index
+    
+    def __repr__(self) -> str:
+        return f"DetectedQuery({self.term!r}, {self.start_index}, {self.end_index})"
+
+
+def _score_term(
+    dictionary: TermDictionary,
+    term_index: int,
+    revenue_multiplier: float,
+    confidence_adjustment: int
+) -> Tuple[QueryType, str, float, int]:
+    """
+    Look up a term's type and reason and score it for a flexibility level
+    
+    Args:
+        dictionary: Dictionary the term id belongs to
+        term_index: Term id
+        revenue_multiplier: Multiplier from calculate_revenue_multiplier
+        confidence_adjustment: Adjustment from calculate_confidence_adjustment
+        
+    Returns:
+        Tuple[QueryType, str, float, int]: Type, reason, estimated revenue and confidence score
+    """
+    # Ensure confidence is within 0-100 range
+    return (
+        dictionary.term_type(term_index),
+        dictionary.reason(term_index),
+        round(dictionary.base_revenue[term_index] * revenue_multiplier, 2),
+        max(0, min(100, dictionary.base_confidence[term_index] + confidence_adjustment))
+    )
+
+
+def find_commercial_queries(
+    script_text: str,
+    params: ScriptParams,
+    start: int = 0,
+    end: int | None = None
+) -> List[DetectedQuery]:
+    """
+    Detect commercial queries in script text as lightweight records
     
     Args:
         script_text: The script text to analyze
         params: Script parameters including creative flexibility
+        start: Only detect terms starting at or after this offset
+        end: Only detect terms starting before this offset (default: end of text)
         
     Returns:
-        List[CommercialQueryInDB]: List of detected commercial queries
+        List[DetectedQuery]: Detected queries, ordered by term then position
     """
-    queries: List[CommercialQueryInDB] = []
-    detected_positions: Set[Tuple[str, int]] = set()  # Track (term, position) to avoid duplicates
-    
     # Get multipliers based on creative flexibility
     revenue_multiplier = calculate_revenue_multiplier(params.creative_flexibility)
     confidence_adjustment = calculate_confidence_adjustment(params.creative_flexibility)
     
-    # Search for each commercial term
-    for term_data in COMMERCIAL_TERMS:
-        term = term_data["term"]
+    # Type, reason, revenue and confidence depend only on the term, so look
+    # them up in the dictionary columns once per term id
+    term_fields: Dict[int, Tuple[QueryType, str, float, int]] = {}
+    queries: List[DetectedQuery] = []
+    
+    # Find every term occurrence in a single pass, ordered by term then position.
+    # The matcher reports each (term, position) once, so no duplicate check is needed
+    dictionary = get_term_dictionary()
+    for term_index, start_index, end_index in dictionary.find_matches(script_text, start, end):
+        fields = term_fields.get(term_index)
+        if fields is None:
+            fields = term_fields[term_index] = _score_term(
+                dictionary, term_index, revenue_multiplier, confidence_adjustment
+            )
         
-        # Create regex pattern for whole word matching (case-insensitive)
-        pattern = r'\b' + re.escape(term) + r'\b'
+        queries.append(DetectedQuery(
+            script_text[start_index:end_index],  # Use actual matched text (preserves case)
+            *fields,
+            start_index,
+            end_index
+        ))
+    
+    return queries
+
+
+def stream_commercial_queries(chunks: Iterable[str], params: ScriptParams) -> Iterator[DetectedQuery]:
+    """
+    Detect commercial queries in script text that arrives in chunks
+    
+    Memory stays bounded by the chunk size plus the longest term, whatever
+    the script size, and each query is yielded as soon as the text after it
+    has arrived. Terms and word boundaries split across chunks are detected
+    like in the joined text, and offsets are into the whole script. One
+    dictionary version is used for the whole stream.
+    
+    Args:
+        chunks: Consecutive pieces of the script text, e.g. from read_text_chunks
+        params: Script parameters including creative flexibility
         
-        # Find all matches
-        for match in re.finditer(pattern, script_text, re.IGNORECASE):
-            start_index = match.start()
-            end_index = match.end()
-            
-            # Check if this position was already detected
-            position_key = (term.lower(), start_index)
-            if position_key in detected_positions:
-                continue
-            
-            # Mark as detected
-            detected_positions.add(position_key)
-            
-            # Calculate adjusted revenue and confidence
-            estimated_revenue = term_data["base_revenue"] * revenue_multiplier
-            confidence_score = term_data["base_confidence"] + confidence_adjustment
-            
-            # Ensure confidence is within 0-100 range
-            confidence_score = max(0, min(100, confidence_score))
-            
-            # Extract excerpt
-            script_excerpt = extract_excerpt(script_text, start_index, end_index)
-            
-            # Create query object
-            now = datetime.utcnow()
-            query = CommercialQueryInDB(
-                id=str(uuid.uuid4()),
-                script_id="",  # Will be set when storing in database
-                term=match.group(),  # Use actual matched text (preserves case)
-                type=term_data["type"],
-                reason=term_data["reason"],
-                estimated_revenue=round(estimated_revenue, 2),
-                status=QueryStatus.PENDING,
-                script_excerpt=script_excerpt,
-                start_index=start_index,
-                end_index=end_index,
-                confidence_score=confidence_score,
-                created_at=now,
-                updated_at=now
+    Yields:
+        DetectedQuery: The queries find_commercial_queries returns for the
+            joined text, ordered by position then term
+    """
+    revenue_multiplier = calculate_revenue_multiplier(params.creative_flexibility)
+    confidence_adjustment = calculate_confidence_adjustment(params.creative_flexibility)
+    term_fields: Dict[int, Tuple[QueryType, str, float, int]] = {}
+    
+    dictionary = get_term_dictionary()
+    window = ""  # Recent text, so matched text can be sliced out of it
+    window_offset = 0
+    
+    def tracked_chunks() -> Iterator[str]:
+        nonlocal window, window_offset
+        for chunk in chunks:
+            # Matches decided by a chunk start less than one longest term plus two
+            # characters before it; keep twice that of the previous text
+            keep = max(0, len(window) - 2 * (dictionary.max_term_length + 2))
+            window_offset += keep
+            window = window[keep:] + chunk
+            yield chunk
+    
+    for term_index, start_index, end_index in dictionary.iter_matches(tracked_chunks()):
+        fields = term_fields.get(term_index)
+        if fields is None:
+            fields = term_fields[term_index] = _score_term(
+                dictionary, term_index, revenue_multiplier, confidence_adjustment
             )
-            
-            queries.append(query)
+        yield DetectedQuery(
+            window[start_index - window_offset:end_index - window_offset],  # Actual matched text (preserves case)
+            *fields,
+            start_index,
+            end_index
+        )
+
+
+def read_text_chunks(text_file: TextIO, chunk_chars: int = STREAM_CHUNK_CHARS) -> Iterator[str]:
+    """
+    Read an open text file in chunks for stream_commercial_queries
+    
+    Args:
+        text_file: File opened in text mode
+        chunk_chars: Characters per chunk
+        
+    Yields:
+        str: Chunks until the end of the file
+    """
+    while True:
+        chunk = text_file.read(chunk_chars)
+        if not chunk:
+            return
+        yield chunk
+
+
+def build_query_documents(
+    script_text: str,
+    detected: List[DetectedQuery],
+    include_excerpts: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    Convert detection results into commercial query documents
+    
+    The documents have no id, script_id or timestamps; those are set once
+    per analysis when the queries are stored.
     
-    return queries
\ No newline at end of file
+    Args:
+        script_text: Text the queries were detected in
+        detected: Results from find_commercial_queries
+        include_excerpts: Whether to add script_excerpt
+        
+    Returns:
+        List[dict]: Query documents with pending status
+    """
+    documents = []
+    for query in detected:
+        document = {
+            "term": query.term,
+            "type": query.type,
+            "reason": query.reason,
+            "estimated_revenue": query.estimated_revenue,
+            "status": QueryStatus.PENDING,
+            "start_index": query.start_index,
+            "end_index": query.end_index,
+            "confidence_score": query.confidence_score,
+        }
+        if include_excerpts:
+            document["script_excerpt"] = extract_excerpt(script_text, query.start_index, query.end_index)
+        documents.append(document)
+    return documents
+
+
+def detect_commercial_queries(
+    script_text: str,
+    params: ScriptParams,
+    start: int = 0,
+    end: int | None = None
+) -> List[CommercialQueryInDB]:
+    """
+    Detect commercial queries in script text using rule-based logic
+    
+    Builds full models for API responses; internal callers should use
+    find_commercial_queries and build_query_documents instead.
+    
+    Args:
+        script_text: The script text to analyze
+        params: Script parameters including creative flexibility
+        start: Only detect terms starting at or after this offset
+        end: Only detect terms starting before this offset (default: end of text)
+        
+    Returns:
+        List[CommercialQueryInDB]: List of detected commercial queries
+    """
+    now = datetime.utcnow()
+    return [
+        CommercialQueryInDB(
+            id=str(uuid.uuid4()),
+            script_id="",  # Will be set when storing in database
+            created_at=now,
+            updated_at=now,
+            **document
+        )
+        for document in build_query_documents(script_text, find_commercial_queries(script_text, params, start, end))
+    ]
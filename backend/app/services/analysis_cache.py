@@ -0,0 +1,208 @@
+"""
+Content-hash keyed cache for commercial query detection results
+In-process LRU tier with byte-size eviction plus an optional MongoDB tier whose entries expire by TTL index
+"""
+import hashlib
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..database import get_database
+from ..models.script import CreativeFlexibility
+from .ai_detection import get_term_dictionary_version
+
+logger = logging.getLogger(__name__)
+
+# Rough per-object overhead used when estimating the size of cached queries
+_DICT_OVERHEAD_BYTES = 232
+_FIELD_OVERHEAD_BYTES = 64
+
+CACHE_COLLECTION = "analysis_cache"
+
+
+def make_analysis_key(script_text: str, flexibility: CreativeFlexibility) -> str:
+    """
+    Build the cache key for a detection run
+
+    Args:
+        script_text: The script text to analyze
+        flexibility: Creative flexibility used for revenue and confidence
+
+    Returns:
+        str: Key combining the text hash, flexibility and term dictionary version
+    """
+    return make_analysis_key_for_hash(hashlib.sha256(script_text.encode("utf-8")).hexdigest(), flexibility)
+
+
+def make_analysis_key_for_hash(text_hash: str, flexibility: CreativeFlexibility) -> str:
+    """
+    Build the cache key for a detection run from the text's SHA-256
+
+    Used for texts stored in GridFS, whose hash was computed during upload.
+
+    Args:
+        text_hash: Hex SHA-256 of the UTF-8 script text
+        flexibility: Creative flexibility used for revenue and confidence
+
+    Returns:
+        str: Same key make_analysis_key gives for the text
+    """
+    return f"{text_hash}:{CreativeFlexibility(flexibility).value}:{get_term_dictionary_version()}"
+
+
+def _estimate_size(queries: List[Dict[str, Any]]) -> int:
+    """
+    Estimate the in-memory size of cached query documents
+
+    Args:
+        queries: Detected query documents
+
+    Returns:
+        int: Approximate size in bytes
+    """
+    size = 0
+    for query in queries:
+        size += _DICT_OVERHEAD_BYTES + _FIELD_OVERHEAD_BYTES * len(query)
+        for value in query.values():
+            if isinstance(value, str):
+                size += len(value)
+    return size
+
+
+class AnalysisCache:
+    """
+    Two-tier detection result cache
+
+    Values are lists of detected query documents (CommercialQueryInDB dumps
+    without id or script_id). Callers must treat returned lists as read-only.
+    """
+
+    def __init__(self, max_bytes: int, mongo_enabled: bool):
+        self.max_bytes = max_bytes
+        self.mongo_enabled = mongo_enabled
+
+        self._entries: "OrderedDict[str, Tuple[List[Dict[str, Any]], int]]" = OrderedDict()
+        self._bytes = 0
+        self._memory_hits = 0
+        self._mongo_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _remember(self, key: str, queries: List[Dict[str, Any]]) -> None:
+        """
+        Store an entry in the in-process tier, evicting least recently used entries
+
+        Args:
+            key: Cache key
+            queries: Detected query documents
+        """
+        size = _estimate_size(queries)
+        if size > self.max_bytes:
+            return
+
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[1]
+
+        self._entries[key] = (queries, size)
+        self._bytes += size
+
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._evictions += 1
+
+    async def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Look up cached detection results
+
+        Args:
+            key: Cache key from make_analysis_key
+
+        Returns:
+            Optional[List[dict]]: Cached query documents, or None on a miss
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self._memory_hits += 1
+            return entry[0]
+
+        if self.mongo_enabled:
+            try:
+                document = await get_database()[CACHE_COLLECTION].find_one({"_id": key})
+            except Exception as e:
+                logger.warning(f"Analysis cache lookup failed: {str(e)}")
+                document = None
+
+            if document is not None:
+                queries = document["queries"]
+                self._remember(key, queries)
+                self._mongo_hits += 1
+                return queries
+
+        self._misses += 1
+        return None
+
+    async def put(self, key: str, queries: List[Dict[str, Any]]) -> None:
+        """
+        Store detection results in both tiers
+
+        Persistence failures (e.g. results over the document size limit) are
+        logged and otherwise ignored, since the cache is best-effort.
+
+        Args:
+            key: Cache key from make_analysis_key
+            queries: Detected query documents
+        """
+        self._remember(key, queries)
+
+        if self.mongo_enabled:
+            try:
+                await get_database()[CACHE_COLLECTION].replace_one(
+                    {"_id": key},
+                    {"_id": key, "queries": queries, "created_at": datetime.utcnow()},
+                    upsert=True
+                )
+            except Exception as e:
+                logger.warning(f"Analysis cache write failed: {str(e)}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Get cache size and hit/miss counters
+
+        Returns:
+            dict: Entry count, byte usage, hits per tier, misses and evictions
+        """
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "memory_hits": self._memory_hits,
+            "mongo_hits": self._mongo_hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+        }
+
+
+# Global cache instance, created on first use
+_cache: AnalysisCache | None = None
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """
+    Get the analysis cache, creating it from settings on first use
+
+    Returns:
+        AnalysisCache: The shared cache
+    """
+    global _cache
+
+    if _cache is None:
+        _cache = AnalysisCache(
+            max_bytes=settings.analysis_cache_max_bytes,
+            mongo_enabled=settings.analysis_cache_mongo_enabled,
+        )
+    return _cache
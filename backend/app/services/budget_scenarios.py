@@ -0,0 +1,174 @@
+"""
+Budget rules and vectorized what-if scenario evaluation
+A script's queries are loaded once; every scenario (accepted queries, creative
+flexibility level, minimum confidence) is evaluated with NumPy array operations
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ..models.script import CreativeFlexibility
+from .ai_detection import calculate_confidence_adjustment, calculate_revenue_multiplier, get_term_dictionary
+from .budget_updates import ACCEPTED_STATUS, category_name
+from .term_dictionary import TermDictionary
+
+FLEXIBILITY_LEVELS = list(CreativeFlexibility)
+
+# Scenarios x queries cells held in memory at a time (~16 MB per float64 matrix)
+SCENARIO_CHUNK_CELLS = 2 ** 21
+
+BASE_BRAND_SAFETY_SCORE = 95
+HEAVY_PRODUCT_PLACEMENT_REVENUE = 10000  # Product revenue above this lowers brand safety
+HEAVY_PRODUCT_PLACEMENT_PENALTY = 5
+
+
+def baseline_adsense_revenue(target_audience: str) -> float:
+    """
+    Baseline AdSense revenue for a target audience
+
+    Simplified calculation as per PRD "predefined industry benchmarks";
+    in a real app, this would be more complex.
+
+    Args:
+        target_audience: Script's target audience description
+
+    Returns:
+        float: Baseline revenue
+    """
+    if "young" in target_audience.lower():
+        return 60000.0
+    if "tech" in target_audience.lower():
+        return 75000.0
+    return 50000.0  # Default baseline
+
+
+def brand_safety_score(category_breakdown: Dict[str, float]) -> int:
+    """
+    Brand safety score for a category breakdown (mock logic for demonstration)
+
+    Args:
+        category_breakdown: Revenue per capitalized category
+
+    Returns:
+        int: Score from 0 to 100
+    """
+    if category_breakdown.get("Product", 0) > HEAVY_PRODUCT_PLACEMENT_REVENUE:
+        return BASE_BRAND_SAFETY_SCORE - HEAVY_PRODUCT_PLACEMENT_PENALTY  # Slightly lower if very heavy on product placement
+    return BASE_BRAND_SAFETY_SCORE
+
+
+@dataclass
+class Scenario:
+    """A resolved scenario: query positions to accept (None = currently accepted), level and threshold"""
+    accepted_positions: Optional[List[int]]
+    creative_flexibility: CreativeFlexibility
+    min_confidence: int
+
+
+def evaluate_scenarios(
+    queries: List[Dict[str, Any]],
+    script_flexibility: CreativeFlexibility,
+    scenarios: List[Scenario],
+    baseline_revenue: float,
+    production_budget: float,
+    dictionary: Optional[TermDictionary] = None
+) -> List[Dict[str, Any]]:
+    """
+    Evaluate budget scenarios for one script's queries
+
+    Stored revenue and confidence reflect the script's flexibility level and
+    are used as is at that level. Other levels are derived from the term's
+    base revenue and confidence in the dictionary, the same way detection
+    does. Stored values are rounded and clipped, so they are only converted
+    back to base values for terms the dictionary no longer has.
+
+    Args:
+        queries: Stored queries (term, status, type, estimated_revenue, confidence_score)
+        script_flexibility: Flexibility level the stored values were computed for
+        scenarios: Scenarios to evaluate
+        baseline_revenue: Baseline AdSense revenue of the script
+        production_budget: Script's target production budget
+        dictionary: Term dictionary (default: the currently loaded one)
+
+    Returns:
+        List[dict]: Per scenario, in order: creative_flexibility, accepted_count,
+            potential_sponsorship_revenue, total_projected_revenue, net_impact,
+            category_breakdown (categories with accepted queries) and brand_safety_score
+    """
+    query_count = len(queries)
+    stored_revenue = np.array([query.get("estimated_revenue", 0) for query in queries], dtype=np.float64)
+    stored_confidence = np.array([query["confidence_score"] for query in queries], dtype=np.float64)
+    currently_accepted = np.array([query.get("status") == ACCEPTED_STATUS for query in queries], dtype=bool)
+
+    # Base values per query, looked up once per distinct term
+    multipliers = np.array([calculate_revenue_multiplier(level) for level in FLEXIBILITY_LEVELS])
+    adjustments = np.array([calculate_confidence_adjustment(level) for level in FLEXIBILITY_LEVELS])
+    script_level = FLEXIBILITY_LEVELS.index(script_flexibility)
+    dictionary = dictionary or get_term_dictionary()
+    term_indexes: Dict[str, Optional[int]] = {}
+    base_revenue = stored_revenue / multipliers[script_level]
+    base_confidence = stored_confidence - adjustments[script_level]
+    for position, query in enumerate(queries):
+        term = query.get("term", "")
+        if term not in term_indexes:
+            term_indexes[term] = dictionary.term_index(term)
+        term_index = term_indexes[term]
+        if term_index is not None:
+            base_revenue[position] = dictionary.base_revenue[term_index]
+            base_confidence[position] = dictionary.base_confidence[term_index]
+
+    # Revenue and confidence of every query at every level: (levels, queries)
+    revenue_by_level = np.round(base_revenue * multipliers[:, None], 2)
+    revenue_by_level[script_level] = stored_revenue
+    confidence_by_level = np.clip(base_confidence + adjustments[:, None], 0, 100)
+    confidence_by_level[script_level] = stored_confidence
+
+    # One-hot category membership: (queries, categories)
+    categories = sorted({category_name(query.get("type")) for query in queries})
+    category_index = {category: position for position, category in enumerate(categories)}
+    category_matrix = np.zeros((query_count, len(categories)), dtype=np.float64)
+    category_matrix[np.arange(query_count), [category_index[category_name(query.get("type"))] for query in queries]] = 1.0
+    product_column = category_index.get("Product")
+
+    results = []
+    chunk_rows = max(1, SCENARIO_CHUNK_CELLS // max(1, query_count))
+    for chunk_start in range(0, len(scenarios), chunk_rows):
+        chunk = scenarios[chunk_start:chunk_start + chunk_rows]
+        levels = np.array([FLEXIBILITY_LEVELS.index(scenario.creative_flexibility) for scenario in chunk])
+        min_confidence = np.array([scenario.min_confidence for scenario in chunk], dtype=np.float64)
+
+        accepted = np.zeros((len(chunk), query_count), dtype=bool)
+        for row, scenario in enumerate(chunk):
+            if scenario.accepted_positions is None:
+                accepted[row] = currently_accepted
+            else:
+                accepted[row, scenario.accepted_positions] = True
+        accepted &= confidence_by_level[levels] >= min_confidence[:, None]
+
+        contributions = np.where(accepted, revenue_by_level[levels], 0.0)
+        sponsorship = contributions.sum(axis=1)
+        breakdown = contributions @ category_matrix
+        category_counts = accepted.astype(np.float64) @ category_matrix
+        accepted_counts = accepted.sum(axis=1)
+
+        total = baseline_revenue + sponsorship
+        net_impact = total - production_budget
+        safety = np.full(len(chunk), BASE_BRAND_SAFETY_SCORE)
+        if product_column is not None:
+            safety[breakdown[:, product_column] > HEAVY_PRODUCT_PLACEMENT_REVENUE] -= HEAVY_PRODUCT_PLACEMENT_PENALTY
+
+        for row, scenario in enumerate(chunk):
+            results.append({
+                "creative_flexibility": scenario.creative_flexibility,
+                "accepted_count": int(accepted_counts[row]),
+                "potential_sponsorship_revenue": float(sponsorship[row]),
+                "total_projected_revenue": float(total[row]),
+                "net_impact": float(net_impact[row]),
+                "category_breakdown": {
+                    category: float(breakdown[row, column])
+                    for column, category in enumerate(categories) if category_counts[row, column]
+                },
+                "brand_safety_score": int(safety[row]),
+            })
+    return results
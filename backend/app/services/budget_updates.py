@@ -0,0 +1,317 @@
+"""
+Incremental maintenance of stored budget models
+Query status changes move the budget's revenue totals with $inc deltas; paths
+that replace a script's queries (re-analysis, edits) recompute the totals with
+refresh_budget_totals. The consistency checker compares stored budgets against
+a full recompute:
+
+    python -m app.services.budget_updates                      # report drift for every budget
+    python -m app.services.budget_updates --script-id <id> --repair
+"""
+import argparse
+import asyncio
+import math
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+ACCEPTED_STATUS = "accepted"
+
+# Budget fields that move by the same amount as sponsorship revenue
+REVENUE_FIELDS = ("potential_sponsorship_revenue", "total_projected_revenue", "net_impact")
+
+# Stored totals within this many dollars of the recompute count as consistent
+CONSISTENCY_TOLERANCE = 0.01
+
+
+def category_name(query_type: Any) -> str:
+    """
+    Budget category_breakdown key for a query type
+
+    Args:
+        query_type: Stored query type (None counts as "other")
+
+    Returns:
+        str: Capitalized category name
+    """
+    return str(query_type if query_type is not None else "other").capitalize()
+
+
+async def sum_accepted_revenue(queries_collection, script_id: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Total the estimated revenue of a script's accepted queries with one $group aggregation
+
+    Only one small document per query type crosses the wire, instead of
+    every accepted query.
+
+    Args:
+        queries_collection: The commercial_queries collection
+        script_id: Script ID
+
+    Returns:
+        Tuple[float, Dict[str, float]]: Sponsorship revenue and revenue per
+            capitalized category ("Other" for queries without a type)
+    """
+    totals = await sum_accepted_revenue_by_script(queries_collection, [script_id])
+    return totals.get(script_id, (0, {}))
+
+
+async def sum_accepted_revenue_by_script(
+    queries_collection,
+    script_ids: List[str],
+    session: Optional[AsyncIOMotorClientSession] = None
+) -> Dict[str, Tuple[float, Dict[str, float]]]:
+    """
+    Total accepted revenue for several scripts with one $group aggregation
+
+    Args:
+        queries_collection: The commercial_queries collection
+        script_ids: Script IDs
+        session: Transaction session, if any
+
+    Returns:
+        Dict[str, Tuple[float, Dict[str, float]]]: script_id -> (sponsorship
+            revenue, revenue per category), only for scripts with accepted queries
+    """
+    cursor = queries_collection.aggregate([
+        {"$match": {"script_id": {"$in": script_ids}, "status": ACCEPTED_STATUS}},
+        {"$group": {
+            "_id": {"script_id": "$script_id", "type": "$type"},
+            "revenue": {"$sum": {"$ifNull": ["$estimated_revenue", 0]}},
+        }},
+    ], session=session)
+
+    totals: Dict[str, Tuple[float, Dict[str, float]]] = {}
+    async for group in cursor:
+        sponsorship_revenue, category_breakdown = totals.get(group["_id"]["script_id"], (0, {}))
+        category = category_name(group["_id"].get("type"))
+        category_breakdown[category] = category_breakdown.get(category, 0) + group["revenue"]
+        totals[group["_id"]["script_id"]] = (sponsorship_revenue + group["revenue"], category_breakdown)
+    return totals
+
+
+def expected_totals(
+    budget: Dict[str, Any],
+    sponsorship_revenue: float,
+    category_breakdown: Dict[str, float]
+) -> Dict[str, Any]:
+    """
+    Budget revenue fields for the given accepted revenue
+
+    Args:
+        budget: Stored budget with baseline_adsense_revenue and production_budget
+        sponsorship_revenue: Revenue of the accepted queries
+        category_breakdown: Accepted revenue per category
+
+    Returns:
+        dict: Values for REVENUE_FIELDS and category_breakdown
+    """
+    total_revenue = budget["baseline_adsense_revenue"] + sponsorship_revenue
+    return {
+        "potential_sponsorship_revenue": sponsorship_revenue,
+        "total_projected_revenue": total_revenue,
+        "net_impact": total_revenue - budget["production_budget"],
+        "category_breakdown": category_breakdown,
+    }
+
+
+def revenue_delta(old_status: Optional[str], new_status: str, revenue: float) -> float:
+    """
+    Change in sponsorship revenue when a query moves between statuses
+
+    Args:
+        old_status: Status before the change
+        new_status: Status after the change
+        revenue: The query's estimated revenue
+
+    Returns:
+        float: +revenue when the query becomes accepted, -revenue when it
+            stops being accepted, otherwise 0
+    """
+    if old_status == new_status:
+        return 0
+    if new_status == ACCEPTED_STATUS:
+        return revenue
+    if old_status == ACCEPTED_STATUS:
+        return -revenue
+    return 0
+
+
+def budget_increments(transitions: Iterable[Tuple[Dict[str, Any], str]]) -> Dict[str, float]:
+    """
+    Build the $inc document for a set of query status changes
+
+    Args:
+        transitions: (query as stored before the change, new status) pairs;
+            the query needs status, type and estimated_revenue
+
+    Returns:
+        Dict[str, float]: Field -> delta, empty if no revenue moved
+    """
+    increments: Dict[str, float] = {}
+    for query, new_status in transitions:
+        delta = revenue_delta(query.get("status"), new_status, query.get("estimated_revenue", 0))
+        if not delta:
+            continue
+        for field in REVENUE_FIELDS + (f"category_breakdown.{category_name(query.get('type'))}",):
+            increments[field] = increments.get(field, 0) + delta
+    return increments
+
+
+async def apply_budget_increments(
+    db: AsyncIOMotorDatabase,
+    script_id: str,
+    increments: Dict[str, float],
+    session: Optional[AsyncIOMotorClientSession] = None
+) -> None:
+    """
+    Move a script's stored budget by the given deltas
+
+    Scripts without a calculated budget are left alone; POST /budget builds
+    one from scratch. Brand safety score and monetization tips are only
+    refreshed by that recalculation.
+
+    Args:
+        db: Database handle
+        script_id: Script whose queries changed
+        increments: Output of budget_increments
+        session: Transaction session the status change runs in, if any
+    """
+    if not increments:
+        return
+    await db["budget_models"].update_one(
+        {"script_id": script_id},
+        {"$inc": increments, "$set": {"updated_at": datetime.utcnow()}},
+        session=session
+    )
+
+
+async def refresh_budget_totals(
+    db: AsyncIOMotorDatabase,
+    script_ids: Iterable[str],
+    session: Optional[AsyncIOMotorClientSession] = None
+) -> None:
+    """
+    Recompute stored budget totals after scripts' queries were replaced
+
+    Deleting and re-inserting queries drops accepted ones without a status
+    change, so no $inc delta describes it; the totals are recomputed from the
+    stored accepted queries instead. Scripts without a budget are skipped.
+
+    Args:
+        db: Database handle
+        script_ids: Scripts whose queries were replaced
+        session: Transaction session the replacement runs in, if any
+    """
+    script_ids = list(script_ids)
+    if not script_ids:
+        return
+    budgets = await db["budget_models"].find(
+        {"script_id": {"$in": script_ids}},
+        {"script_id": 1, "baseline_adsense_revenue": 1, "production_budget": 1},
+        session=session
+    ).to_list(length=None)
+    if not budgets:
+        return
+
+    totals = await sum_accepted_revenue_by_script(
+        db["commercial_queries"], [budget["script_id"] for budget in budgets], session
+    )
+    now = datetime.utcnow()
+    await db["budget_models"].bulk_write([
+        UpdateOne(
+            {"_id": budget["_id"]},
+            {"$set": dict(expected_totals(budget, *totals.get(budget["script_id"], (0, {}))), updated_at=now)}
+        )
+        for budget in budgets
+    ], ordered=False, session=session)
+
+
+async def check_budget_consistency(
+    db: AsyncIOMotorDatabase,
+    script_id: Optional[str] = None,
+    repair: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Compare stored budgets with a full recompute from accepted queries
+
+    Args:
+        db: Database handle
+        script_id: Only check this script's budget (default: all budgets)
+        repair: Overwrite drifted totals with the recomputed values
+
+    Returns:
+        List[dict]: Per budget {"script_id", "consistent", "mismatches",
+            "stored", "expected", "repaired"}
+    """
+    budgets_collection = db["budget_models"]
+    queries_collection = db["commercial_queries"]
+
+    reports = []
+    cursor = budgets_collection.find({"script_id": script_id} if script_id else {})
+    async for budget in cursor:
+        sponsorship_revenue, category_breakdown = await sum_accepted_revenue(queries_collection, budget["script_id"])
+        expected = expected_totals(budget, sponsorship_revenue, category_breakdown)
+        stored = {field: budget.get(field) for field in expected}
+
+        mismatches = [
+            field for field in REVENUE_FIELDS
+            if not math.isclose(stored[field] or 0, expected[field], abs_tol=CONSISTENCY_TOLERANCE)
+        ]
+        # Categories whose accepted queries were all rejected stay behind at 0
+        stored_breakdown = stored["category_breakdown"] or {}
+        mismatches.extend(
+            f"category_breakdown.{category}"
+            for category in sorted(set(stored_breakdown) | set(category_breakdown))
+            if not math.isclose(
+                stored_breakdown.get(category, 0), category_breakdown.get(category, 0),
+                abs_tol=CONSISTENCY_TOLERANCE
+            )
+        )
+
+        repaired = False
+        if mismatches and repair:
+            await budgets_collection.update_one(
+                {"_id": budget["_id"]},
+                {"$set": dict(expected, updated_at=datetime.utcnow())}
+            )
+            repaired = True
+
+        reports.append({
+            "script_id": budget["script_id"],
+            "consistent": not mismatches,
+            "mismatches": mismatches,
+            "stored": stored,
+            "expected": expected,
+            "repaired": repaired,
+        })
+    return reports
+
+
+async def _main() -> int:
+    from ..database import connect_to_mongo, close_mongo_connection, get_database
+
+    parser = argparse.ArgumentParser(description="Check stored budgets against a full recompute")
+    parser.add_argument("--script-id", help="Only check this script's budget")
+    parser.add_argument("--repair", action="store_true", help="Overwrite drifted totals with recomputed values")
+    args = parser.parse_args()
+
+    await connect_to_mongo()
+    try:
+        reports = await check_budget_consistency(get_database(), args.script_id, args.repair)
+        drifted = [report for report in reports if not report["consistent"]]
+        for report in drifted:
+            marker = "repaired" if report["repaired"] else "drift"
+            print(f"[{marker:>8}] {report['script_id']}: {', '.join(report['mismatches'])}")
+            for field in REVENUE_FIELDS:
+                print(f"{'':>11} {field:<30} stored {report['stored'][field]} expected {report['expected'][field]}")
+        print(f"checked {len(reports)} budgets, {len(drifted)} drifted")
+        return 1 if drifted and not args.repair else 0
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(_main()))
@@ -0,0 +1,314 @@
+"""
+Off-event-loop executor for commercial query detection
+Runs detection on a thread pool for small scripts and a process pool for large ones
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..config import settings
+from ..models.script import ScriptParams
+from .ai_detection import DetectedQuery, find_commercial_queries, stream_commercial_queries
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionQueueFullError(Exception):
+    """Raised when the detection executor is saturated and cannot accept more work"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Detection queue is full")
+        self.retry_after = retry_after
+
+
+def _timed_call(func: Callable[..., Any], *args: Any) -> Tuple[float, float, Any]:
+    """
+    Run a function inside a worker and record when it started and finished
+
+    time.monotonic() reads a system-wide clock on the platforms we deploy to,
+    so timestamps taken inside a worker process are comparable with the
+    submission time recorded on the event loop.
+
+    Args:
+        func: Function to run
+        args: Positional arguments for the function
+
+    Returns:
+        Tuple[float, float, Any]: (started_at, finished_at, result)
+    """
+    started_at = time.monotonic()
+    result = func(*args)
+    return started_at, time.monotonic(), result
+
+
+def _collect_streamed_queries(
+    chunks: Iterable[str],
+    params: ScriptParams,
+    on_query: Optional[Callable[[DetectedQuery], None]]
+) -> List[DetectedQuery]:
+    detected = []
+    for query in stream_commercial_queries(chunks, params):
+        if on_query is not None:
+            on_query(query)
+        detected.append(query)
+    return detected
+
+
+class _TimingStats:
+    """Running count/total/max for a timing metric"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class DetectionExecutor:
+    """
+    Bounded executor that keeps detection off the event loop
+
+    Scripts at or above the configured size threshold go to a process pool
+    so they do not contend for the GIL; smaller scripts use a thread pool.
+    The number of jobs queued or running is capped, and submissions beyond
+    the cap fail fast with DetectionQueueFullError.
+    """
+
+    def __init__(
+        self,
+        thread_workers: int,
+        process_workers: int,
+        process_threshold_chars: int,
+        max_queue_depth: int,
+        retry_after_seconds: int,
+    ):
+        self.process_threshold_chars = process_threshold_chars
+        self.max_queue_depth = max_queue_depth
+        self.retry_after_seconds = retry_after_seconds
+
+        self._thread_pool = ThreadPoolExecutor(
+            max_workers=thread_workers,
+            thread_name_prefix="detection"
+        )
+        # Spawned workers avoid inheriting the event loop and driver threads
+        self._process_pool = ProcessPoolExecutor(
+            max_workers=process_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        ) if process_workers > 0 else None
+
+        self._in_flight = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._failed = 0
+        self._queue_wait: Dict[str, _TimingStats] = {"thread": _TimingStats(), "process": _TimingStats()}
+        self._execution: Dict[str, _TimingStats] = {"thread": _TimingStats(), "process": _TimingStats()}
+
+    def _select_pool(self, script_text: str) -> Tuple[str, Executor]:
+        """
+        Pick the pool for a script based on its length in characters
+
+        Counting characters is O(1), so pool selection does not encode the
+        script on the event loop.
+
+        Args:
+            script_text: Script text to analyze
+
+        Returns:
+            Tuple[str, Executor]: Pool name and executor
+        """
+        if self._process_pool is not None and len(script_text) >= self.process_threshold_chars:
+            return "process", self._process_pool
+        return "thread", self._thread_pool
+
+    async def run(self, func: Callable[..., Any], script_text: str, *args: Any) -> Any:
+        """
+        Run a detection function for a script on the appropriate pool
+
+        The function must be a picklable module-level callable taking the
+        script text as its first argument, since large scripts are sent to
+        worker processes.
+
+        Args:
+            func: Detection function to run
+            script_text: Script text, used for pool selection and passed to func
+            args: Additional positional arguments for func
+
+        Returns:
+            Any: The function's result
+
+        Raises:
+            DetectionQueueFullError: If the executor is saturated
+        """
+        pool_name, pool = self._select_pool(script_text)
+        return await self._submit(pool_name, pool, func, script_text, *args)
+
+    async def _submit(self, pool_name: str, pool: Executor, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a function on a pool with queue limits, counters and timings
+
+        Args:
+            pool_name: "thread" or "process"
+            pool: Executor to run on
+            func: Function to run
+            args: Positional arguments for func
+
+        Returns:
+            Any: The function's result
+
+        Raises:
+            DetectionQueueFullError: If the executor is saturated
+        """
+        if self._in_flight >= self.max_queue_depth:
+            self._rejected += 1
+            raise DetectionQueueFullError(self.retry_after_seconds)
+
+        loop = asyncio.get_running_loop()
+
+        self._in_flight += 1
+        self._submitted += 1
+        submitted_at = time.monotonic()
+        try:
+            started_at, finished_at, result = await loop.run_in_executor(
+                pool, _timed_call, func, *args
+            )
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._in_flight -= 1
+
+        self._queue_wait[pool_name].record(max(0.0, started_at - submitted_at))
+        self._execution[pool_name].record(finished_at - started_at)
+        return result
+
+    async def detect(self, script_text: str, params: ScriptParams) -> List[DetectedQuery]:
+        """
+        Run find_commercial_queries off the event loop
+
+        Args:
+            script_text: The script text to analyze
+            params: Script parameters including creative flexibility
+
+        Returns:
+            List[DetectedQuery]: List of detected commercial queries
+
+        Raises:
+            DetectionQueueFullError: If the executor is saturated
+        """
+        return await self.run(find_commercial_queries, script_text, params)
+
+    async def detect_chunks(
+        self,
+        chunks: Iterable[str],
+        params: ScriptParams,
+        on_query: Optional[Callable[[DetectedQuery], None]] = None
+    ) -> List[DetectedQuery]:
+        """
+        Run stream_commercial_queries over text chunks off the event loop
+
+        Always uses the thread pool: the chunks are typically read through
+        the event loop (e.g. from GridFS) and cannot be sent to a process.
+
+        Args:
+            chunks: Script text chunks; may block while the next chunk is fetched
+            params: Script parameters including creative flexibility
+            on_query: Called from the worker thread with each query as soon as it is detected
+
+        Returns:
+            List[DetectedQuery]: Detected queries ordered by position
+
+        Raises:
+            DetectionQueueFullError: If the executor is saturated
+        """
+        return await self._submit("thread", self._thread_pool, _collect_streamed_queries, chunks, params, on_query)
+
+    async def run_in_thread(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run other CPU-bound work on the thread pool under the same queue limit
+
+        Args:
+            func: Function to run
+            args: Positional arguments for func
+
+        Returns:
+            Any: The function's result
+
+        Raises:
+            DetectionQueueFullError: If the executor is saturated
+        """
+        return await self._submit("thread", self._thread_pool, func, *args)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Get queue and timing metrics
+
+        Returns:
+            dict: Queue depth, counters, and queue wait/execution timings per pool
+        """
+        return {
+            "in_flight": self._in_flight,
+            "max_queue_depth": self.max_queue_depth,
+            "submitted": self._submitted,
+            "rejected": self._rejected,
+            "failed": self._failed,
+            "queue_wait": {name: stats.snapshot() for name, stats in self._queue_wait.items()},
+            "execution": {name: stats.snapshot() for name, stats in self._execution.items()},
+        }
+
+    def shutdown(self) -> None:
+        """Shut down both worker pools"""
+        self._thread_pool.shutdown(wait=False, cancel_futures=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Global executor instance, created on first use
+_executor: DetectionExecutor | None = None
+
+
+def get_detection_executor() -> DetectionExecutor:
+    """
+    Get the detection executor, creating it from settings on first use
+
+    Returns:
+        DetectionExecutor: The shared executor
+    """
+    global _executor
+
+    if _executor is None:
+        _executor = DetectionExecutor(
+            thread_workers=settings.detection_thread_workers,
+            process_workers=settings.detection_process_workers,
+            process_threshold_chars=settings.detection_process_threshold_chars,
+            max_queue_depth=settings.detection_max_queue_depth,
+            retry_after_seconds=settings.detection_retry_after_seconds,
+        )
+    return _executor
+
+
+def shutdown_detection_executor() -> None:
+    """
+    Shut down the detection executor if it was started
+
+    This function should be called during application shutdown.
+    """
+    global _executor
+
+    if _executor is not None:
+        logger.info("Shutting down detection executor...")
+        _executor.shutdown()
+        _executor = None
@@ -0,0 +1,240 @@
+"""
+Incremental commercial query detection for edited scripts
+Diffs old and new text, re-scans only the changed regions and shifts untouched matches
+"""
+import difflib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..models.script import ScriptParams
+from .ai_detection import DetectedQuery, extract_excerpt, find_commercial_queries, get_term_dictionary
+
+# Above this many lines in the changed middle section, skip line-level diffing
+# and treat the whole middle as one hunk (SequenceMatcher is quadratic worst case)
+MAX_DIFF_LINES = 5000
+
+# (old_start, old_end, new_start, new_end) character ranges of one edit
+Hunk = Tuple[int, int, int, int]
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    """
+    Length of the common prefix of two strings, using C-level slice comparisons
+
+    Args:
+        a: First string
+        b: Second string
+
+    Returns:
+        int: Number of leading characters shared by both strings
+    """
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _common_suffix_length(a: str, b: str, limit: int) -> int:
+    """
+    Length of the common suffix of two strings, capped at limit
+
+    Args:
+        a: First string
+        b: Second string
+        limit: Maximum suffix length to consider
+
+    Returns:
+        int: Number of trailing characters shared by both strings
+    """
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def compute_edit_hunks(old_text: str, new_text: str) -> List[Hunk]:
+    """
+    Compute the changed character ranges between two versions of a text
+
+    Trims the common prefix and suffix, then diffs the remaining middle
+    line by line so scattered edits become separate, small hunks.
+
+    Args:
+        old_text: Previous text
+        new_text: Updated text
+
+    Returns:
+        List[Hunk]: Non-overlapping hunks in ascending order
+    """
+    if old_text == new_text:
+        return []
+
+    prefix = _common_prefix_length(old_text, new_text)
+    suffix = _common_suffix_length(old_text, new_text, min(len(old_text), len(new_text)) - prefix)
+
+    old_middle = old_text[prefix:len(old_text) - suffix]
+    new_middle = new_text[prefix:len(new_text) - suffix]
+    old_lines = old_middle.splitlines(keepends=True)
+    new_lines = new_middle.splitlines(keepends=True)
+
+    whole_middle = [(prefix, len(old_text) - suffix, prefix, len(new_text) - suffix)]
+    if not old_lines or not new_lines or max(len(old_lines), len(new_lines)) > MAX_DIFF_LINES:
+        return whole_middle
+
+    # Character offset of each line start within the middle sections
+    old_offsets = [0]
+    for line in old_lines:
+        old_offsets.append(old_offsets[-1] + len(line))
+    new_offsets = [0]
+    for line in new_lines:
+        new_offsets.append(new_offsets[-1] + len(line))
+
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    hunks = [
+        (prefix + old_offsets[i1], prefix + old_offsets[i2], prefix + new_offsets[j1], prefix + new_offsets[j2])
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+    return hunks or whole_middle
+
+
+def map_offset(hunks: List[Hunk], position: int) -> Optional[int]:
+    """
+    Map an offset in the old text to the same character in the new text
+
+    Args:
+        hunks: Hunks from compute_edit_hunks
+        position: Offset in the old text
+
+    Returns:
+        Optional[int]: Offset in the new text, or None if the position fell
+            strictly inside a replaced range
+    """
+    delta = 0
+    for old_start, old_end, new_start, new_end in hunks:
+        if position <= old_start:
+            break
+        if position < old_end:
+            return None
+        delta = new_end - old_end
+    return position + delta
+
+
+def rescan_windows(hunks: List[Hunk], new_length: int, margin: int) -> List[Tuple[int, int]]:
+    """
+    Build merged new-text windows around each hunk that must be re-scanned
+
+    Args:
+        hunks: Hunks from compute_edit_hunks
+        new_length: Length of the new text
+        margin: Characters to extend on each side of a hunk
+
+    Returns:
+        List[Tuple[int, int]]: Sorted, non-overlapping [start, end) windows
+    """
+    windows: List[Tuple[int, int]] = []
+    for _, _, new_start, new_end in hunks:
+        start = max(0, new_start - margin)
+        end = min(new_length, new_end + margin)
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+        else:
+            windows.append((start, end))
+    return windows
+
+
+@dataclass
+class IncrementalDetectionPlan:
+    """Delta to apply to a script's stored commercial queries after an edit"""
+    removed_ids: List[Any] = field(default_factory=list)
+    # Stored query _id -> fields to $set (offsets, excerpt, matched text)
+    updated: Dict[Any, Dict[str, Any]] = field(default_factory=dict)
+    added: List[DetectedQuery] = field(default_factory=list)
+
+
+def plan_incremental_detection(
+    old_text: str,
+    new_text: str,
+    stored_queries: List[Dict[str, Any]],
+    params: ScriptParams
+) -> IncrementalDetectionPlan:
+    """
+    Work out which stored queries survive an edit and which matches are new
+
+    Stored queries must be a complete detection of old_text with the current
+    term dictionary and creative flexibility. A match can only appear or
+    disappear within one character of an edit, so only windows of the new
+    text extending the longest term length past each hunk are re-scanned.
+    Matches elsewhere keep their id and status and are shifted by the edit
+    length.
+
+    Args:
+        old_text: Text the stored queries were detected in
+        new_text: Updated text
+        stored_queries: Stored query documents (need _id, term, start_index, end_index and script_excerpt if stored)
+        params: Script parameters including creative flexibility
+
+    Returns:
+        IncrementalDetectionPlan: Queries to remove, update and add
+    """
+    plan = IncrementalDetectionPlan()
+    hunks = compute_edit_hunks(old_text, new_text)
+
+    if not hunks:
+        return plan
+
+    margin = get_term_dictionary().max_term_length + 1
+    windows = rescan_windows(hunks, len(new_text), margin)
+
+    # Re-detect inside each window, keyed by position and normalized term
+    rescanned: Dict[Tuple[int, int, str], DetectedQuery] = {}
+    for start, end in windows:
+        for query in find_commercial_queries(new_text, params, start, end):
+            rescanned[(query.start_index, query.end_index, query.term.lower())] = query
+
+    def in_window(position: int) -> bool:
+        return any(start <= position < end for start, end in windows)
+
+    for stored in stored_queries:
+        old_start, old_end = stored["start_index"], stored["end_index"]
+        new_start = map_offset(hunks, old_start)
+        new_end = map_offset(hunks, old_end)
+
+        if new_start is None or new_end is None or new_end - new_start != old_end - old_start:
+            plan.removed_ids.append(stored["_id"])
+            continue
+
+        if in_window(new_start):
+            # Near an edit: only survives if the re-scan found it again
+            replacement = rescanned.pop((new_start, new_end, stored["term"].lower()), None)
+            if replacement is None:
+                plan.removed_ids.append(stored["_id"])
+                continue
+            matched_term = replacement.term
+        else:
+            matched_term = stored["term"]
+
+        changes: Dict[str, Any] = {}
+        if new_start != old_start:
+            changes["start_index"] = new_start
+            changes["end_index"] = new_end
+        if matched_term != stored["term"]:
+            changes["term"] = matched_term
+        # Queries stored without an excerpt (compact storage) derive it on read
+        if stored.get("script_excerpt") is not None:
+            excerpt = extract_excerpt(new_text, new_start, new_end)
+            if excerpt != stored["script_excerpt"]:
+                changes["script_excerpt"] = excerpt
+        if changes:
+            plan.updated[stored["_id"]] = changes
+
+    plan.added = sorted(rescanned.values(), key=lambda query: query.start_index)
+    return plan
@@ -0,0 +1,411 @@
+"""
+Background analysis jobs persisted in MongoDB
+Workers claim jobs with a lease, keep it alive with heartbeats and retry failures with backoff
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from ..config import settings
+from ..database import get_database
+from .detection_executor import DetectionQueueFullError
+from .script_analysis import ScriptNotFoundError, analyze_stored_script
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "analysis_jobs"
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+ACTIVE_JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+
+def retry_delay_seconds(attempt: int) -> float:
+    """
+    Backoff before retrying a job that failed on the given attempt
+
+    Args:
+        attempt: Attempt number that failed (1-based)
+
+    Returns:
+        float: Seconds to wait, doubling per attempt up to the configured cap
+    """
+    delay = settings.job_retry_base_seconds * (2 ** (attempt - 1))
+    return min(delay, settings.job_retry_max_seconds)
+
+
+def _new_job(user_id: str, script_id: str) -> Dict[str, Any]:
+    """
+    Build the document of a newly queued job
+
+    Args:
+        user_id: Owner of the script
+        script_id: Script to analyze
+
+    Returns:
+        dict: Job document without an _id
+    """
+    now = datetime.utcnow()
+    return {
+        "user_id": user_id,
+        "script_id": script_id,
+        "status": JOB_QUEUED,
+        "attempts": 0,
+        "max_attempts": settings.job_max_attempts,
+        "run_after": now,
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "error": None,
+        "result": None,
+        "created_at": now,
+        "started_at": None,
+        "finished_at": None,
+        "timings": {"queue_seconds": None, "run_seconds": None},
+    }
+
+
+async def submit_analysis_job(user_id: str, script_id: str) -> Dict[str, Any]:
+    """
+    Queue an analysis job for a script, reusing an active job for the same script
+
+    A unique partial index allows one active job per script, so concurrent
+    submissions that both miss the lookup insert only one job; the others
+    return it.
+
+    Args:
+        user_id: Owner of the script
+        script_id: Script to analyze
+
+    Returns:
+        dict: The queued or already active job document
+    """
+    jobs_collection = get_database()[JOBS_COLLECTION]
+
+    while True:
+        active_job = await jobs_collection.find_one(
+            {"script_id": script_id, "status": {"$in": list(ACTIVE_JOB_STATUSES)}}
+        )
+        if active_job is not None:
+            return active_job
+
+        job = _new_job(user_id, script_id)
+        try:
+            result = await jobs_collection.insert_one(job)
+            break
+        except DuplicateKeyError:
+            # Another submission queued a job since the lookup; return that one
+            continue
+    job["_id"] = result.inserted_id
+
+    worker = get_job_worker()
+    if worker is not None:
+        worker.wake()
+    return job
+
+
+class JobWorker:
+    """
+    Pool of asyncio tasks that claim and run analysis jobs
+
+    Every process running the API can host a worker; claims are atomic
+    find_one_and_update calls, so workers in different processes never run
+    the same attempt. A job whose lease is not renewed (e.g. its worker
+    died) becomes claimable again once the lease expires.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        lease_seconds: int,
+        heartbeat_seconds: float,
+        poll_seconds: float,
+        timeout_seconds: int
+    ):
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.poll_seconds = poll_seconds
+        self.timeout_seconds = timeout_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._active = 0
+        self._claimed = 0
+        self._succeeded = 0
+        self._retried = 0
+        self._failed = 0
+
+    def start(self) -> None:
+        """Start the worker tasks"""
+        self._tasks = [
+            asyncio.create_task(self._run_slot(), name=f"analysis-job-worker-{slot}")
+            for slot in range(self.concurrency)
+        ]
+        logger.info(f"Started {self.concurrency} analysis job workers ({self.worker_id})")
+
+    async def stop(self) -> None:
+        """
+        Stop the worker tasks
+
+        Running jobs are cancelled; their leases expire and another worker
+        picks them up again.
+        """
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self) -> None:
+        """Let idle slots claim a newly submitted job without waiting for the next poll"""
+        self._wakeup.set()
+
+    async def _run_slot(self) -> None:
+        """Claim and run jobs until stopped"""
+        while not self._stopping:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Failed to claim analysis job: {str(e)}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._active += 1
+            try:
+                await self._run_job(job)
+            finally:
+                self._active -= 1
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the next due job, including jobs with expired leases
+
+        Returns:
+            Optional[dict]: The claimed job, or None if nothing is due
+        """
+        jobs_collection = get_database()[JOBS_COLLECTION]
+        now = datetime.utcnow()
+
+        while True:
+            job = await jobs_collection.find_one_and_update(
+                {
+                    "$or": [
+                        {"status": JOB_QUEUED, "run_after": {"$lte": now}},
+                        {"status": JOB_RUNNING, "lease_expires_at": {"$lt": now}},
+                    ]
+                },
+                {
+                    "$set": {
+                        "status": JOB_RUNNING,
+                        "lease_owner": self.worker_id,
+                        "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                        "started_at": now,
+                    },
+                    "$inc": {"attempts": 1},
+                },
+                sort=[("run_after", 1)],
+                return_document=ReturnDocument.AFTER
+            )
+            if job is None:
+                return None
+
+            # A job whose worker keeps dying must not be retried forever
+            if job["attempts"] > job["max_attempts"]:
+                await self._finish(job, JOB_FAILED, error="Lease expired too many times")
+                continue
+
+            self._claimed += 1
+            return job
+
+    async def _heartbeat(self, job: Dict[str, Any]) -> None:
+        """
+        Renew the job's lease until cancelled
+
+        Args:
+            job: Claimed job
+        """
+        jobs_collection = get_database()[JOBS_COLLECTION]
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                await jobs_collection.update_one(
+                    {"_id": job["_id"], "lease_owner": self.worker_id, "attempts": job["attempts"]},
+                    {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+                )
+            except Exception as e:
+                logger.warning(f"Failed to renew lease of job {job['_id']}: {str(e)}")
+
+    async def _run_job(self, job: Dict[str, Any]) -> None:
+        """
+        Run one claimed job and record its outcome
+
+        Args:
+            job: Claimed job
+        """
+        started = time.monotonic()
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            result = await asyncio.wait_for(
+                analyze_stored_script(get_database(), ObjectId(job["script_id"])),
+                timeout=self.timeout_seconds
+            )
+        except ScriptNotFoundError as e:
+            # Retrying cannot bring a deleted script back
+            await self._finish(job, JOB_FAILED, error=str(e), run_seconds=time.monotonic() - started)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                error = f"Timed out after {self.timeout_seconds} seconds"
+            elif isinstance(e, DetectionQueueFullError):
+                error = "Detection capacity exhausted"
+            else:
+                error = str(e) or type(e).__name__
+            await self._retry_or_fail(job, error, time.monotonic() - started)
+        else:
+            await self._finish(job, JOB_SUCCEEDED, result=result, run_seconds=time.monotonic() - started)
+        finally:
+            heartbeat.cancel()
+
+    async def _retry_or_fail(self, job: Dict[str, Any], error: str, run_seconds: float) -> None:
+        """
+        Requeue a failed attempt with backoff, or fail the job when attempts run out
+
+        Args:
+            job: Claimed job
+            error: Failure description
+            run_seconds: Duration of the failed attempt
+        """
+        if job["attempts"] >= job["max_attempts"]:
+            await self._finish(job, JOB_FAILED, error=error, run_seconds=run_seconds)
+            return
+
+        delay = retry_delay_seconds(job["attempts"])
+        logger.warning(f"Analysis job {job['_id']} attempt {job['attempts']} failed, retrying in {delay}s: {error}")
+        await get_database()[JOBS_COLLECTION].update_one(
+            {"_id": job["_id"], "lease_owner": self.worker_id, "attempts": job["attempts"]},
+            {"$set": {
+                "status": JOB_QUEUED,
+                "run_after": datetime.utcnow() + timedelta(seconds=delay),
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "error": error,
+            }}
+        )
+        self._retried += 1
+
+    async def _finish(
+        self,
+        job: Dict[str, Any],
+        final_status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+        run_seconds: Optional[float] = None
+    ) -> None:
+        """
+        Record a job's final status, result and timings
+
+        The update only applies while this worker still holds the attempt,
+        so a worker whose lease was taken over cannot overwrite the new run.
+
+        Args:
+            job: Claimed job
+            final_status: JOB_SUCCEEDED or JOB_FAILED
+            result: Analysis result for succeeded jobs
+            error: Failure description for failed jobs
+            run_seconds: Duration of the final attempt
+        """
+        now = datetime.utcnow()
+        await get_database()[JOBS_COLLECTION].update_one(
+            {"_id": job["_id"], "lease_owner": self.worker_id, "attempts": job["attempts"]},
+            {"$set": {
+                "status": final_status,
+                "result": result,
+                "error": error,
+                "finished_at": now,
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "timings.queue_seconds": (job["started_at"] - job["created_at"]).total_seconds(),
+                "timings.run_seconds": run_seconds,
+            }}
+        )
+        if final_status == JOB_SUCCEEDED:
+            self._succeeded += 1
+        else:
+            self._failed += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Get worker counters
+
+        Returns:
+            dict: Concurrency, running jobs and claim/outcome counters
+        """
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "active": self._active,
+            "claimed": self._claimed,
+            "succeeded": self._succeeded,
+            "retried": self._retried,
+            "failed": self._failed,
+        }
+
+
+# Global worker instance, created at startup when enabled
+_worker: JobWorker | None = None
+
+
+def get_job_worker() -> JobWorker | None:
+    """
+    Get the job worker running in this process
+
+    Returns:
+        JobWorker | None: The worker, or None if workers are disabled or not started
+    """
+    return _worker
+
+
+def start_job_worker() -> None:
+    """Start the analysis job worker from settings if enabled"""
+    global _worker
+
+    if not settings.job_workers_enabled or _worker is not None:
+        return
+    _worker = JobWorker(
+        concurrency=settings.job_worker_concurrency,
+        lease_seconds=settings.job_lease_seconds,
+        heartbeat_seconds=settings.job_heartbeat_seconds,
+        poll_seconds=settings.job_poll_seconds,
+        timeout_seconds=settings.job_timeout_seconds,
+    )
+    _worker.start()
+
+
+async def stop_job_worker() -> None:
+    """Stop the analysis job worker if it is running"""
+    global _worker
+
+    if _worker is not None:
+        await _worker.stop()
+        _worker = None
@@ -0,0 +1,354 @@
+"""
+Live commercial query detection for documents edited in place
+Keeps a per-document match index that is updated from individual text edits
+"""
+from bisect import bisect_right
+from itertools import count
+from typing import Any, Dict, List, Sequence, Tuple
+
+from ..models.script import CreativeFlexibility
+from .ai_detection import (
+    calculate_confidence_adjustment,
+    calculate_revenue_multiplier,
+    get_term_dictionary,
+)
+from .term_dictionary import TermDictionary
+
+# (start, end, term_index, match_id)
+Match = Tuple[int, int, int, int]
+
+# Target chunk size of a live document's text; chunks are split past twice this
+TEXT_CHUNK_CHARS = 4096
+
+
+class InvalidEditError(ValueError):
+    """Raised when an edit does not fit the current document"""
+
+
+def scan_matches(script_text: str) -> Tuple[str, List[Tuple[int, int, int]]]:
+    """
+    Find every term occurrence in a full document
+
+    Module-level so the initial scan of large documents can run on the
+    detection executor's process pool.
+
+    Args:
+        script_text: Document text
+
+    Returns:
+        Tuple[str, List[Tuple[int, int, int]]]: Fingerprint of the term
+            dictionary used and (term_index, start, end) tuples
+    """
+    dictionary = get_term_dictionary()
+    return dictionary.fingerprint, dictionary.find_matches(script_text)
+
+
+class ChunkedText:
+    """
+    Document text stored as a list of chunks
+
+    An edit rebuilds only the chunks it touches and shifts the chunk start
+    offsets after them, so it costs the edit plus a few chunks and one
+    integer per chunk instead of a copy of the whole document.
+    """
+
+    def __init__(self, text: str, chunk_chars: int = TEXT_CHUNK_CHARS):
+        """
+        Split the initial text into chunks
+
+        Args:
+            text: Initial document text
+            chunk_chars: Target chunk size
+        """
+        self._chunk_chars = chunk_chars
+        self._chunks: List[str] = self._split(text)
+        self._starts: List[int] = []
+        self._length = 0
+        self._reindex(0)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __str__(self) -> str:
+        return "".join(self._chunks)
+
+    def _split(self, text: str) -> List[str]:
+        """
+        Cut text into chunks of the target size
+
+        Args:
+            text: Text to cut
+
+        Returns:
+            List[str]: Non-empty chunks; a short text stays in one piece
+        """
+        if len(text) < 2 * self._chunk_chars:
+            return [text] if text else []
+        size = self._chunk_chars
+        return [text[position:position + size] for position in range(0, len(text), size)]
+
+    def _reindex(self, first: int) -> None:
+        """
+        Recompute the start offsets of the chunks from index first on
+
+        Args:
+            first: Index of the first chunk whose start may have changed
+        """
+        del self._starts[first:]
+        position = self._starts[-1] + len(self._chunks[first - 1]) if first else 0
+        for chunk in self._chunks[first:]:
+            self._starts.append(position)
+            position += len(chunk)
+        self._length = position
+
+    def _chunk_at(self, position: int) -> int:
+        """
+        Find the chunk holding the character at position
+
+        Args:
+            position: Offset in the text; the text length maps to the last chunk
+
+        Returns:
+            int: Chunk index
+        """
+        return max(0, bisect_right(self._starts, position) - 1)
+
+    def slice(self, start: int, end: int) -> str:
+        """
+        Get text[start:end]
+
+        Args:
+            start: First offset, clamped to the text
+            end: End offset, clamped to the text
+
+        Returns:
+            str: The text in the range
+        """
+        start, end = max(0, start), min(self._length, end)
+        if start >= end:
+            return ""
+        index = self._chunk_at(start)
+        parts = []
+        while index < len(self._chunks) and self._starts[index] < end:
+            chunk_start = self._starts[index]
+            parts.append(self._chunks[index][max(0, start - chunk_start):end - chunk_start])
+            index += 1
+        return "".join(parts)
+
+    def replace(self, offset: int, deleted: int, inserted: str) -> None:
+        """
+        Replace text[offset:offset + deleted] with inserted
+
+        Args:
+            offset: Edit position, within the text
+            deleted: Number of characters removed at offset
+            inserted: Text inserted at offset
+        """
+        if not self._chunks:
+            self._chunks = self._split(inserted)
+            self._reindex(0)
+            return
+
+        first = self._chunk_at(offset)
+        last = self._chunk_at(offset + deleted)
+        piece = (
+            self._chunks[first][:offset - self._starts[first]]
+            + inserted
+            + self._chunks[last][offset + deleted - self._starts[last]:]
+        )
+        # Fold small leftovers into the next chunk so deletes do not fragment the text
+        if len(piece) < self._chunk_chars // 2 and last + 1 < len(self._chunks):
+            last += 1
+            piece += self._chunks[last]
+        self._chunks[first:last + 1] = self._split(piece)
+        self._reindex(first)
+
+
+class LiveMatchIndex:
+    """
+    Match index for one document that is kept current edit by edit
+
+    A term match can only appear or disappear within the longest term length
+    of an edit, so each edit re-scans just that window. Matches are split
+    around a cursor like a gap buffer: matches before it are stored with
+    absolute offsets and matches after it with offsets from the document
+    end, which edits before them leave unchanged. Moving the cursor to the
+    next edit only touches the matches in between, so the index work per
+    edit depends on the edit and its distance from the previous one, not
+    on the document size. The text itself is a ChunkedText, so applying
+    the edit to it does not copy the document either.
+    """
+
+    def __init__(
+        self,
+        text: str,
+        flexibility: CreativeFlexibility = CreativeFlexibility.MINOR_DIALOGUE_CHANGES,
+        matches: Sequence[Tuple[int, int, int]] | None = None,
+        dictionary: TermDictionary | None = None
+    ):
+        """
+        Index the initial document
+
+        Args:
+            text: Initial document text
+            flexibility: Creative flexibility used for revenue and confidence
+            matches: Precomputed (term_index, start, end) matches for text, if
+                already scanned elsewhere with the same dictionary
+            dictionary: Term dictionary (default: the currently loaded one);
+                the index keeps using it even if a newer version is loaded
+        """
+        self._text = ChunkedText(text)
+        self._dictionary = dictionary or get_term_dictionary()
+        self._margin = self._dictionary.max_term_length + 1
+        self._revenue_multiplier = calculate_revenue_multiplier(flexibility)
+        self._confidence_adjustment = calculate_confidence_adjustment(flexibility)
+        self._ids = count(1)
+
+        if matches is None:
+            matches = self._dictionary.find_matches(text)
+
+        # Everything starts out before a cursor at the document end
+        self._before: List[Match] = sorted(
+            (start, end, term_index, next(self._ids)) for term_index, start, end in matches
+        )
+        # Stored as (len - start, len - end, term_index, id), nearest-to-cursor last
+        self._after: List[Match] = []
+
+    def __len__(self) -> int:
+        return len(self._before) + len(self._after)
+
+    @property
+    def text_length(self) -> int:
+        """Length of the current document"""
+        return len(self._text)
+
+    @property
+    def text(self) -> str:
+        """Current document text (joins every chunk, so O(document))"""
+        return str(self._text)
+
+    def _move_cursor(self, position: int) -> None:
+        """
+        Move the cursor so exactly the matches starting before position are in _before
+
+        Args:
+            position: New cursor offset
+        """
+        length = len(self._text)
+        before, after = self._before, self._after
+
+        while before and before[-1][0] >= position:
+            start, end, term_index, match_id = before.pop()
+            after.append((length - start, length - end, term_index, match_id))
+
+        while after and length - after[-1][0] < position:
+            rel_start, rel_end, term_index, match_id = after.pop()
+            before.append((length - rel_start, length - rel_end, term_index, match_id))
+
+    def matches(self) -> List[Match]:
+        """
+        Get every current match
+
+        Returns:
+            List[Match]: (start, end, term_index, match_id) tuples ordered by start
+        """
+        length = len(self._text)
+        return self._before + [
+            (length - rel_start, length - rel_end, term_index, match_id)
+            for rel_start, rel_end, term_index, match_id in reversed(self._after)
+        ]
+
+    def apply_edit(self, offset: int, deleted: int, inserted: str) -> Tuple[List[Match], List[int]]:
+        """
+        Replace text[offset:offset + deleted] with inserted and update the index
+
+        Args:
+            offset: Edit position in the current text
+            deleted: Number of characters removed at offset
+            inserted: Text inserted at offset
+
+        Returns:
+            Tuple[List[Match], List[int]]: Added matches (new offsets) and the
+                ids of removed matches; matches in neither keep their id and
+                shift with the edit
+
+        Raises:
+            InvalidEditError: If the edit range lies outside the document
+        """
+        length = len(self._text)
+        if offset < 0 or deleted < 0 or offset + deleted > length:
+            raise InvalidEditError(
+                f"Edit range {offset}:{offset + deleted} is outside the document (length {length})"
+            )
+
+        delta = len(inserted) - deleted
+        window_start = max(0, offset - self._margin)
+        old_window_end = offset + deleted + self._margin
+
+        # Pull every match starting inside the window out of the index
+        self._move_cursor(window_start)
+        old_matches: List[Match] = []
+        while self._after and length - self._after[-1][0] < old_window_end:
+            rel_start, rel_end, term_index, match_id = self._after.pop()
+            old_matches.append((length - rel_start, length - rel_end, term_index, match_id))
+
+        self._text.replace(offset, deleted, inserted)
+        new_window_end = min(len(self._text), old_window_end + delta)
+
+        # Old matches untouched by the edit keep their id at the shifted position
+        surviving: Dict[Tuple[int, int, int], int] = {}
+        for start, end, term_index, match_id in old_matches:
+            if end <= offset:
+                surviving[(start, end, term_index)] = match_id
+            elif start >= offset + deleted:
+                surviving[(start + delta, end + delta, term_index)] = match_id
+
+        window_matches: List[Match] = []
+        added: List[Match] = []
+        # Scan a copy of the window plus enough context on both sides to
+        # decide word boundaries and matches that run past the window end
+        context_start = max(0, window_start - 1)
+        context = self._text.slice(context_start, new_window_end + self._margin + 1)
+        for term_index, start, end in self._dictionary.find_matches(
+            context, window_start - context_start, new_window_end - context_start
+        ):
+            start, end = start + context_start, end + context_start
+            match_id = surviving.pop((start, end, term_index), None)
+            if match_id is None:
+                match_id = next(self._ids)
+                added.append((start, end, term_index, match_id))
+            window_matches.append((start, end, term_index, match_id))
+
+        kept_ids = {match[3] for match in window_matches}
+        removed_ids = [match[3] for match in old_matches if match[3] not in kept_ids]
+
+        # Re-scanned matches go back in before the cursor, which now sits at the window end
+        window_matches.sort()
+        self._before.extend(window_matches)
+
+        added.sort()
+        return added, removed_ids
+
+    def describe(self, match: Match) -> Dict[str, Any]:
+        """
+        Build the client payload for a match
+
+        Args:
+            match: (start, end, term_index, match_id) tuple
+
+        Returns:
+            dict: Match id, matched text, term metadata, revenue and confidence
+        """
+        start, end, term_index, match_id = match
+        dictionary = self._dictionary
+        confidence_score = dictionary.base_confidence[term_index] + self._confidence_adjustment
+        return {
+            "id": match_id,
+            "term": self._text.slice(start, end),
+            "type": dictionary.term_type(term_index),
+            "reason": dictionary.reason(term_index),
+            "estimatedRevenue": round(dictionary.base_revenue[term_index] * self._revenue_multiplier, 2),
+            "confidenceScore": max(0, min(100, confidence_score)),
+            "startIndex": start,
+            "endIndex": end,
+        }
@@ -0,0 +1,476 @@
+"""
+Script analysis pipeline shared by the analyze endpoints and background jobs
+Detects commercial queries (cache first, then the detection executor) and stores them
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from ..config import settings
+from ..database import run_in_transaction
+from ..models.script import CreativeFlexibility, ScriptParams
+from .ai_detection import DetectedQuery, build_query_documents, extract_excerpt, get_term_dictionary
+from .analysis_cache import get_analysis_cache, make_analysis_key_for_hash
+from .budget_updates import refresh_budget_totals
+from .detection_executor import get_detection_executor
+from .script_storage import (
+    TEXT_FIELDS,
+    StreamedExcerpts,
+    fill_excerpts_streamed,
+    open_script_text,
+    script_text_hash,
+)
+
+
+class ScriptNotFoundError(LookupError):
+    """Raised when the script to analyze no longer exists"""
+
+
+def script_analysis_key(script: Dict[str, Any], flexibility: CreativeFlexibility) -> str:
+    """
+    Build the analysis key of a stored script, inline or in GridFS
+
+    Args:
+        script: Script document with TEXT_FIELDS
+        flexibility: Creative flexibility used for revenue and confidence
+
+    Returns:
+        str: Same key make_analysis_key gives for the script's text
+    """
+    return make_analysis_key_for_hash(script_text_hash(script), flexibility)
+
+
+def to_storage_document(query: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy a query document in the shape it is persisted
+
+    With compact query storage, script_excerpt is derived from the script
+    text on read instead of being stored with every query.
+
+    Args:
+        query: Query document including script_excerpt
+
+    Returns:
+        dict: New document to insert
+    """
+    if settings.compact_query_storage:
+        return {field: value for field, value in query.items() if field != "script_excerpt"}
+    return dict(query)
+
+
+def fill_excerpts(queries: List[Dict[str, Any]], script_text: str) -> None:
+    """
+    Derive script_excerpt in place for query documents stored without one
+
+    Args:
+        queries: Query documents of one script
+        script_text: Text the queries' offsets refer to
+    """
+    for query in queries:
+        if query.get("script_excerpt") is None:
+            query["script_excerpt"] = extract_excerpt(script_text, query["start_index"], query["end_index"])
+
+
+async def fill_missing_excerpts(
+    db: AsyncIOMotorDatabase,
+    script_texts: Dict[str, str | None],
+    queries: List[Dict[str, Any]]
+) -> None:
+    """
+    Derive missing excerpts, loading script text only for scripts that need it
+
+    Args:
+        db: Database handle
+        script_texts: script_id -> text for scripts whose text is already
+            loaded (None or absent if not); updated with fetched texts
+        queries: Query documents, possibly from several scripts
+    """
+    missing_ids = {
+        query["script_id"] for query in queries
+        if query.get("script_excerpt") is None and script_texts.get(query["script_id"]) is None
+    }
+    if missing_ids:
+        cursor = db["scripts"].find(
+            {"_id": {"$in": [ObjectId(script_id) for script_id in missing_ids]}},
+            {"text": 1, "text_file_id": 1}
+        )
+        async for script in cursor:
+            if script.get("text_file_id") is None:
+                script_texts[str(script["_id"])] = script["text"]
+            else:
+                # GridFS texts are streamed past the excerpts, never loaded whole
+                script_id = str(script["_id"])
+                await fill_excerpts_streamed(
+                    await open_script_text(db, script),
+                    [query for query in queries if query["script_id"] == script_id]
+                )
+
+    for query in queries:
+        if query.get("script_excerpt") is None:
+            script_text = script_texts.get(query["script_id"])
+            if script_text is not None:
+                query["script_excerpt"] = extract_excerpt(script_text, query["start_index"], query["end_index"])
+
+
+async def detect_script_queries(script_text: str, params: ScriptParams, analysis_key: str) -> List[Dict[str, Any]]:
+    """
+    Detect commercial queries for a script, reusing cached results when possible
+
+    Args:
+        script_text: The script text to analyze
+        params: Script parameters including creative flexibility
+        analysis_key: Key from make_analysis_key for this text and flexibility
+
+    Returns:
+        List[dict]: Detected query documents without id, script_id or timestamps
+            (read-only, they may be shared with the cache)
+
+    Raises:
+        DetectionQueueFullError: If the detection executor is saturated
+    """
+    # Reuse cached detection results for identical text, flexibility and dictionary
+    analysis_cache = get_analysis_cache()
+    detected_queries = await analysis_cache.get(analysis_key)
+
+    if detected_queries is None:
+        # Detect commercial queries off the event loop
+        detected = await get_detection_executor().detect(script_text, params)
+
+        # MongoDB generates _id and script_id is set per script, so neither is cached
+        detected_queries = build_query_documents(
+            script_text, detected, include_excerpts=not settings.compact_query_storage
+        )
+        await analysis_cache.put(analysis_key, detected_queries)
+
+    return detected_queries
+
+
+def _blocking_chunks(chunks: AsyncIterator[str], loop: asyncio.AbstractEventLoop) -> Iterator[str]:
+    """Iterate async chunks from a worker thread, fetching each on the event loop"""
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(chunks.__anext__(), loop).result()
+        except StopAsyncIteration:
+            return
+
+
+async def detect_script_document_queries(
+    db: AsyncIOMotorDatabase,
+    script: Dict[str, Any],
+    params: ScriptParams,
+    analysis_key: str
+) -> List[Dict[str, Any]]:
+    """
+    Detect commercial queries for a stored script, inline or in GridFS
+
+    GridFS texts are streamed from the database through stream_commercial_queries
+    without being loaded whole; their query documents never carry excerpts
+    (see fill_script_excerpts).
+
+    Args:
+        db: Database handle
+        script: Script document with TEXT_FIELDS
+        params: Script parameters including creative flexibility
+        analysis_key: Key from script_analysis_key
+
+    Returns:
+        List[dict]: As detect_script_queries
+
+    Raises:
+        DetectionQueueFullError: If the detection executor is saturated
+        NoFile: If the GridFS file is missing
+    """
+    if script.get("text_file_id") is None:
+        return await detect_script_queries(script["text"], params, analysis_key)
+
+    analysis_cache = get_analysis_cache()
+    detected_queries = await analysis_cache.get(analysis_key)
+
+    if detected_queries is None:
+        chunks = await open_script_text(db, script)
+        detected = await get_detection_executor().detect_chunks(
+            _blocking_chunks(chunks, asyncio.get_running_loop()), params
+        )
+        detected_queries = build_query_documents("", detected, include_excerpts=False)
+        await analysis_cache.put(analysis_key, detected_queries)
+
+    return detected_queries
+
+
+async def fill_script_excerpts(db: AsyncIOMotorDatabase, script: Dict[str, Any], queries: List[Dict[str, Any]]) -> None:
+    """
+    Derive missing excerpts in place from a stored script's text, inline or in GridFS
+
+    Args:
+        db: Database handle
+        script: Script document with TEXT_FIELDS
+        queries: Query documents of the script
+    """
+    if script.get("text_file_id") is None:
+        fill_excerpts(queries, script["text"])
+    elif any(query.get("script_excerpt") is None for query in queries):
+        await fill_excerpts_streamed(await open_script_text(db, script), queries)
+
+
+async def store_script_queries(
+    db: AsyncIOMotorDatabase,
+    script_object_id: ObjectId,
+    detected_queries: List[Dict[str, Any]],
+    analysis_key: str
+) -> List[Dict[str, Any]]:
+    """
+    Replace a script's stored queries and record the analysis key they reflect
+
+    The replacement and the recomputed budget totals are written in one
+    transaction where the server supports it. If storing fails after the old
+    queries were deleted, the analysis key is cleared so the next analysis
+    does not trust the partial result.
+
+    Args:
+        db: Database handle
+        script_object_id: Script ID
+        detected_queries: Query documents from detect_script_queries
+        analysis_key: Key the detected queries belong to
+
+    Returns:
+        List[dict]: Stored query documents including _id (without excerpts
+            under compact storage, see fill_excerpts)
+    """
+    scripts_collection = db["scripts"]
+    queries_collection = db["commercial_queries"]
+    script_id = str(script_object_id)
+
+    # Copies, so cached entries stay intact; insert_many adds each _id
+    now = datetime.utcnow()
+    query_docs = [
+        dict(to_storage_document(query), script_id=script_id, created_at=now, updated_at=now)
+        for query in detected_queries
+    ]
+
+    async def replace_queries(session):
+        # Delete existing queries for this script (to allow re-analysis)
+        await queries_collection.delete_many({"script_id": script_id}, session=session)
+        if query_docs:
+            await queries_collection.insert_many(query_docs, session=session)
+        # Accepted queries went with the old ones, so the budget totals are recomputed
+        await refresh_budget_totals(db, [script_id], session=session)
+
+    try:
+        await run_in_transaction(replace_queries)
+    except Exception:
+        await scripts_collection.update_one({"_id": script_object_id}, {"$unset": {"analysis_key": ""}})
+        raise
+
+    # Record which text/flexibility/dictionary the stored queries reflect
+    await scripts_collection.update_one(
+        {"_id": script_object_id},
+        {"$set": {"analysis_key": analysis_key}}
+    )
+    return query_docs
+
+
+def _text_chunks(text: str, chunk_chars: int) -> Iterator[str]:
+    for start in range(0, len(text), chunk_chars):
+        yield text[start:start + chunk_chars]
+
+
+async def analyze_script_progressively(
+    db: AsyncIOMotorDatabase,
+    script: Dict[str, Any],
+    params: ScriptParams,
+    analysis_key: str
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Analyze a stored script, reporting progress while detection and storage run
+
+    Detection streams the text in chunks (ANALYSIS_PROGRESS_CHUNK_CHARS, or
+    the GridFS chunks of uploaded texts) and queries are stored as soon as
+    their excerpt is known, so the first results are available long before
+    the whole script is scanned. Stored queries are only replaced once the
+    first new batch is written; until the last one is, the script has no
+    analysis key, as after a failed store_script_queries.
+
+    Args:
+        db: Database handle
+        script: Script document with _id, TEXT_FIELDS and text_bytes
+        params: Script parameters including creative flexibility
+        analysis_key: Key from script_analysis_key
+
+    Yields:
+        Tuple[str, dict]: Events in order:
+            ("progress", {"percent": float, "matches": int, "stored": int})
+            ("queries", {"queries": [stored query documents with _id and excerpt]})
+            ("done", {"query_count": int, "unchanged": bool})
+
+    Raises:
+        DetectionQueueFullError: If the detection executor is saturated
+        NoFile: If the GridFS file is missing
+    """
+    scripts_collection = db["scripts"]
+    queries_collection = db["commercial_queries"]
+    script_id = str(script["_id"])
+    batch_size = settings.batch_insert_chunk_size
+
+    # Nothing changed since the last analysis: replay the stored queries
+    if script.get("analysis_key") == analysis_key:
+        stored_queries = await queries_collection.find({"script_id": script_id}).to_list(length=None)
+        await fill_script_excerpts(db, script, stored_queries)
+        yield "progress", {"percent": 100.0, "matches": len(stored_queries), "stored": len(stored_queries)}
+        for start in range(0, len(stored_queries), batch_size):
+            yield "queries", {"queries": stored_queries[start:start + batch_size]}
+        yield "done", {"query_count": len(stored_queries), "unchanged": True}
+        return
+
+    now = datetime.utcnow()
+    cleared = False
+    stored = 0
+
+    async def store(batch: List[Dict[str, Any]]) -> None:
+        nonlocal cleared
+        if not cleared:
+            await scripts_collection.update_one({"_id": script["_id"]}, {"$unset": {"analysis_key": ""}})
+
+            async def clear_queries(session):
+                await queries_collection.delete_many({"script_id": script_id}, session=session)
+                await refresh_budget_totals(db, [script_id], session=session)
+
+            await run_in_transaction(clear_queries)
+            cleared = True
+        if batch:
+            storage_docs = [to_storage_document(query) for query in batch]
+            await queries_collection.insert_many(storage_docs)
+            for query, storage_doc in zip(batch, storage_docs):
+                query["_id"] = storage_doc["_id"]
+
+    analysis_cache = get_analysis_cache()
+    cached_queries = await analysis_cache.get(analysis_key)
+
+    if cached_queries is not None:
+        # Copies, so cached entries stay intact
+        query_docs = [dict(query, script_id=script_id, created_at=now, updated_at=now) for query in cached_queries]
+        await fill_script_excerpts(db, script, query_docs)
+        await store([])
+        for start in range(0, len(query_docs), batch_size):
+            batch = query_docs[start:start + batch_size]
+            await store(batch)
+            stored += len(batch)
+            yield "queries", {"queries": batch}
+            yield "progress", {"percent": 100.0, "matches": len(query_docs), "stored": stored}
+    else:
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        stopped = False
+
+        if script.get("text_file_id") is None:
+            source = _text_chunks(script["text"], settings.analysis_progress_chunk_chars)
+            total_size, measure = len(script["text"]), len
+        else:
+            source = _blocking_chunks(await open_script_text(db, script), loop)
+            total_size, measure = script["text_bytes"], lambda chunk: len(chunk.encode("utf-8"))
+
+        # Runs in the detection thread: hand each chunk and query to the event loop in order
+        def reported_chunks() -> Iterator[str]:
+            for chunk in source:
+                if stopped:
+                    return
+                loop.call_soon_threadsafe(events.put_nowait, ("text", chunk))
+                yield chunk
+
+        def on_query(query: DetectedQuery) -> None:
+            loop.call_soon_threadsafe(events.put_nowait, ("query", query))
+
+        detection = asyncio.ensure_future(
+            get_detection_executor().detect_chunks(reported_chunks(), params, on_query)
+        )
+        detection.add_done_callback(lambda _: events.put_nowait(None))
+
+        # Queries are yielded at most two longest terms before the latest chunk
+        excerpts = StreamedExcerpts(lookback_chars=2 * (get_term_dictionary().max_term_length + 2))
+        detected_queries = []
+        scanned = 0
+        chunk_size = 0
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                kind, value = event
+                if kind == "query":
+                    # MongoDB generates _id and script_id is set per script, so neither is cached
+                    document = build_query_documents("", [value], include_excerpts=False)[0]
+                    detected_queries.append(document)
+                    excerpts.add_query(dict(document, script_id=script_id, created_at=now, updated_at=now))
+                    continue
+
+                # The scanner asks for the next chunk once it is done with the previous one
+                scanned += chunk_size
+                chunk_size = measure(value)
+                completed = excerpts.add_text(value)
+                for start in range(0, len(completed), batch_size):
+                    batch = completed[start:start + batch_size]
+                    await store(batch)
+                    stored += len(batch)
+                    yield "queries", {"queries": batch}
+                yield "progress", {
+                    "percent": round(100.0 * scanned / total_size, 1) if total_size else 0.0,
+                    "matches": len(detected_queries),
+                    "stored": stored
+                }
+            await detection
+        finally:
+            # Ends detection early if the consumer went away or storing failed
+            stopped = True
+
+        completed = excerpts.finish()
+        await store([])
+        for start in range(0, len(completed), batch_size):
+            batch = completed[start:start + batch_size]
+            await store(batch)
+            stored += len(batch)
+            yield "queries", {"queries": batch}
+        yield "progress", {"percent": 100.0, "matches": len(detected_queries), "stored": stored}
+        await analysis_cache.put(analysis_key, detected_queries)
+
+    # Record which text/flexibility/dictionary the stored queries reflect
+    await scripts_collection.update_one(
+        {"_id": script["_id"]},
+        {"$set": {"analysis_key": analysis_key}}
+    )
+    yield "done", {"query_count": stored, "unchanged": False}
+
+
+async def analyze_stored_script(db: AsyncIOMotorDatabase, script_object_id: ObjectId) -> Dict[str, Any]:
+    """
+    Analyze a stored script end to end, skipping unchanged scripts
+
+    Args:
+        db: Database handle
+        script_object_id: Script ID
+
+    Returns:
+        dict: {"query_count": number, "unchanged": bool}
+
+    Raises:
+        ScriptNotFoundError: If the script does not exist
+        DetectionQueueFullError: If the detection executor is saturated
+    """
+    script = await db["scripts"].find_one(
+        {"_id": script_object_id},
+        {**dict.fromkeys(TEXT_FIELDS, 1), "params": 1, "analysis_key": 1}
+    )
+    if script is None:
+        raise ScriptNotFoundError(f"Script {script_object_id} not found")
+
+    params = ScriptParams(**script["params"])
+    analysis_key = script_analysis_key(script, params.creative_flexibility)
+
+    if script.get("analysis_key") == analysis_key:
+        query_count = await db["commercial_queries"].count_documents({"script_id": str(script_object_id)})
+        return {"query_count": query_count, "unchanged": True}
+
+    detected_queries = await detect_script_document_queries(db, script, params, analysis_key)
+    await store_script_queries(db, script_object_id, detected_queries, analysis_key)
+    return {"query_count": len(detected_queries), "unchanged": False}
@@ -0,0 +1,363 @@
+"""
+GridFS storage for script text
+Uploaded scripts are streamed into GridFS chunk by chunk; the scripts document
+keeps a reference (text_file_id) with the text's size and SHA-256 instead of
+the text, so large drafts are never buffered whole nor bound by the 16 MB
+document limit. Scripts created through JSON keep their text inline.
+"""
+import codecs
+import hashlib
+import logging
+from collections import deque
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, AsyncIterator, Deque, Dict, List
+
+from bson import ObjectId
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorGridFSBucket
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_TEXT_BUCKET = "script_texts"
+
+# Script fields needed to read the text of either kind of script
+TEXT_FIELDS = ("text", "text_file_id", "text_sha256")
+
+# Leading characters kept while uploading, enough to generate a title
+TITLE_SOURCE_CHARS = 64
+
+MIN_TEXT_CHARS = 10
+
+
+class ScriptTextError(ValueError):
+    """Raised when uploaded script text is rejected"""
+
+
+class ScriptTextTooLargeError(ScriptTextError):
+    """Raised when uploaded script text exceeds SCRIPT_UPLOAD_MAX_BYTES"""
+
+
+@dataclass
+class StoredScriptText:
+    """A script text written to GridFS"""
+    file_id: ObjectId
+    sha256: str
+    size_bytes: int
+    title_source: str  # Leading text (without leading whitespace) for title generation
+
+
+def get_script_text_bucket(db: AsyncIOMotorDatabase) -> AsyncIOMotorGridFSBucket:
+    """
+    Get the GridFS bucket holding uploaded script texts
+
+    Args:
+        db: Database handle
+
+    Returns:
+        AsyncIOMotorGridFSBucket: The script_texts bucket
+    """
+    return AsyncIOMotorGridFSBucket(db, bucket_name=SCRIPT_TEXT_BUCKET)
+
+
+async def store_script_text(
+    db: AsyncIOMotorDatabase,
+    byte_chunks: AsyncIterable[bytes],
+    filename: str,
+    metadata: Dict[str, Any]
+) -> StoredScriptText:
+    """
+    Stream UTF-8 text into GridFS as it arrives
+
+    The SHA-256 and size are computed on the fly and the text is validated
+    incrementally; on any error the partial file is removed.
+
+    Args:
+        db: Database handle
+        byte_chunks: Request body chunks
+        filename: GridFS filename
+        metadata: GridFS file metadata
+
+    Returns:
+        StoredScriptText: File id, hash, size and leading text
+
+    Raises:
+        ScriptTextTooLargeError: If the text exceeds SCRIPT_UPLOAD_MAX_BYTES
+        ScriptTextError: If the text is not UTF-8 or has fewer than 10
+            characters besides surrounding whitespace
+    """
+    grid_in = get_script_text_bucket(db).open_upload_stream(
+        filename,
+        chunk_size_bytes=settings.script_text_chunk_bytes,
+        metadata=dict(metadata, content_type="text/plain; charset=utf-8")
+    )
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    hasher = hashlib.sha256()
+    size_bytes = 0
+    title_source = ""
+    # Characters from the first non-whitespace character on, and the current
+    # run of trailing whitespace: their difference is the stripped length
+    content_chars = 0
+    trailing_whitespace = 0
+
+    try:
+        async for chunk in byte_chunks:
+            if not chunk:
+                continue
+            size_bytes += len(chunk)
+            if size_bytes > settings.script_upload_max_bytes:
+                raise ScriptTextTooLargeError(
+                    f"Script text exceeds {settings.script_upload_max_bytes} bytes"
+                )
+            try:
+                text = decoder.decode(chunk)
+            except UnicodeDecodeError:
+                raise ScriptTextError("Script text must be UTF-8")
+
+            if not content_chars:
+                text = text.lstrip()
+            if text:
+                content_chars += len(text)
+                content = text.rstrip()
+                trailing_whitespace = len(text) - len(content) if content else trailing_whitespace + len(text)
+                if len(title_source) < TITLE_SOURCE_CHARS:
+                    title_source += text[:TITLE_SOURCE_CHARS - len(title_source)]
+
+            hasher.update(chunk)
+            await grid_in.write(chunk)
+
+        try:
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            raise ScriptTextError("Script text must be UTF-8")
+        if content_chars - trailing_whitespace < MIN_TEXT_CHARS:
+            raise ScriptTextError(f"text must be at least {MIN_TEXT_CHARS} characters")
+        await grid_in.close()
+    except BaseException:
+        await grid_in.abort()
+        raise
+
+    return StoredScriptText(
+        file_id=grid_in._id,
+        sha256=hasher.hexdigest(),
+        size_bytes=size_bytes,
+        title_source=title_source
+    )
+
+
+def script_text_hash(script: Dict[str, Any]) -> str:
+    """
+    SHA-256 of a script's text, stored for GridFS scripts and computed for inline ones
+
+    Args:
+        script: Script document with TEXT_FIELDS
+
+    Returns:
+        str: Hex digest of the UTF-8 text
+    """
+    if script.get("text_sha256"):
+        return script["text_sha256"]
+    return hashlib.sha256(script["text"].encode("utf-8")).hexdigest()
+
+
+async def _decode_chunks(grid_out) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        while True:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+    finally:
+        grid_out.close()
+
+
+async def _inline_chunks(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def open_script_text(db: AsyncIOMotorDatabase, script: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    Open a script's text for reading in chunks
+
+    GridFS texts are read one stored chunk at a time; inline texts come as
+    one chunk. Opening fails early, before any chunk is consumed.
+
+    Args:
+        db: Database handle
+        script: Script document with TEXT_FIELDS
+
+    Returns:
+        AsyncIterator[str]: Text chunks in order
+
+    Raises:
+        NoFile: If the GridFS file is missing
+    """
+    if script.get("text_file_id") is None:
+        return _inline_chunks(script["text"])
+    grid_out = await get_script_text_bucket(db).open_download_stream(script["text_file_id"])
+    return _decode_chunks(grid_out)
+
+
+async def load_script_text(db: AsyncIOMotorDatabase, script: Dict[str, Any]) -> str:
+    """
+    Read a script's whole text, for callers that need it as one string
+
+    Args:
+        db: Database handle
+        script: Script document with TEXT_FIELDS
+
+    Returns:
+        str: Script text
+
+    Raises:
+        NoFile: If the GridFS file is missing
+    """
+    if script.get("text_file_id") is None:
+        return script["text"]
+    return "".join([chunk async for chunk in await open_script_text(db, script)])
+
+
+async def delete_script_text(db: AsyncIOMotorDatabase, file_id: ObjectId | None) -> None:
+    """
+    Remove a GridFS script text, if there is one
+
+    Failures are logged rather than raised: an orphaned file only costs
+    storage, while the script change that released it already succeeded.
+
+    Args:
+        db: Database handle
+        file_id: text_file_id of the script (None for inline scripts)
+    """
+    if file_id is None:
+        return
+    try:
+        await get_script_text_bucket(db).delete(file_id)
+    except NoFile:
+        pass
+    except Exception as e:
+        logger.error(f"Failed to delete script text {file_id}: {str(e)}")
+
+
+class StreamedExcerpts:
+    """
+    Derives script_excerpt for queries of a text that is read in chunks
+
+    Produces what extract_excerpt gives on the whole text while holding only
+    the text from the earliest pending query on (plus the latest chunk and
+    lookback_chars before it, for queries that are still to be added).
+    Queries must be added in start order and start no earlier than
+    lookback_chars before the latest chunk.
+    """
+
+    def __init__(self, context_chars: int = 50, lookback_chars: int = 0):
+        self.context_chars = context_chars
+        self.lookback_chars = lookback_chars
+
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._window = ""
+        self._window_offset = 0  # Offset of window[0] in the whole text
+        self._chunk_offset = 0  # Offset where the latest chunk starts
+
+    @property
+    def pending(self) -> int:
+        """Number of queries still waiting for their excerpt"""
+        return len(self._pending)
+
+    def add_query(self, query: Dict[str, Any]) -> None:
+        """
+        Queue a query document for its excerpt
+
+        Args:
+            query: Query document with start_index and end_index
+        """
+        self._pending.append(query)
+
+    def add_text(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Append the next chunk of text and complete the excerpts it allows
+
+        Args:
+            chunk: Next piece of the text
+
+        Returns:
+            List[dict]: Queries whose script_excerpt was just set, in start order
+        """
+        self._chunk_offset = self._window_offset + len(self._window)
+        self._window += chunk
+        received = self._chunk_offset + len(chunk)
+
+        # An excerpt is complete once text past its context (so it is truncated) has arrived
+        completed = []
+        while self._pending and self._pending[0]["end_index"] + self.context_chars < received:
+            query = self._pending.popleft()
+            query["script_excerpt"] = self._excerpt(query, received + 1)
+            completed.append(query)
+
+        keep_from = self._chunk_offset - self.lookback_chars
+        if self._pending:
+            keep_from = min(keep_from, self._pending[0]["start_index"])
+        drop = min(len(self._window), max(0, keep_from - self.context_chars - self._window_offset))
+        self._window = self._window[drop:]
+        self._window_offset += drop
+        return completed
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """
+        Complete the remaining excerpts once the whole text was added
+
+        Returns:
+            List[dict]: Queries whose script_excerpt was just set, in start order
+        """
+        text_length = self._window_offset + len(self._window)
+        completed = list(self._pending)
+        self._pending.clear()
+        for query in completed:
+            query["script_excerpt"] = self._excerpt(query, text_length)
+        return completed
+
+    def _excerpt(self, query: Dict[str, Any], text_length: int) -> str:
+        excerpt_start = max(0, query["start_index"] - self.context_chars)
+        excerpt_end = min(text_length, query["end_index"] + self.context_chars)
+        text = self._window[excerpt_start - self._window_offset:excerpt_end - self._window_offset]
+        if excerpt_start > 0:
+            text = "..." + text
+        if excerpt_end < text_length:
+            text = text + "..."
+        return text
+
+
+async def fill_excerpts_streamed(
+    chunks: AsyncIterator[str],
+    queries: List[Dict[str, Any]],
+    context_chars: int = 50
+) -> None:
+    """
+    Derive script_excerpt in place from text read in chunks
+
+    Args:
+        chunks: Text chunks from open_script_text; closed when done
+        queries: Query documents of one script; those without script_excerpt are filled
+        context_chars: Characters of context on each side, as in extract_excerpt
+    """
+    excerpts = StreamedExcerpts(context_chars)
+    for query in sorted(
+        (query for query in queries if query.get("script_excerpt") is None),
+        key=lambda query: query["start_index"]
+    ):
+        excerpts.add_query(query)
+
+    # Closing the generator releases the download stream when the loop stops early
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            if not excerpts.pending:
+                break
+            excerpts.add_text(chunk)
+    excerpts.finish()
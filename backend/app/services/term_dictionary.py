@@ -0,0 +1,605 @@
+"""
+Commercial term dictionary compiled into a memory-mappable binary artifact
+
+The catalogue is maintained as a versioned JSON file ({"version": ..., "terms":
+[...]}) and compiled offline. Workers mmap the artifact read-only, so every
+process on a host shares one copy through the page cache, and matching runs
+directly against its hash index instead of compiling a regex per worker:
+
+    python -m app.services.term_dictionary compile catalogue.json catalogue.termdict
+    python -m app.services.term_dictionary info catalogue.termdict
+
+Artifact layout (little-endian, sections 8-byte aligned): header, parallel
+columns indexed by term id (base revenue, base confidence, reason id, type
+code), fixed-width term string records, the interned reason table, a
+first-word hash table (open addressing on the CRC-32 of the lowercased first
+word), candidate lists of term ids per first word and a UTF-8 string pool in
+which every distinct string is stored once. The columns are read in place as
+typed memoryviews, so scoring a match touches a few bytes per column instead
+of a dict per term.
+"""
+import argparse
+from array import array
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from ..models.commercial_query import QueryType
+
+MAGIC = b"CQTD"
+FORMAT_VERSION = 2
+
+# magic, format, flags, terms, reasons, buckets, candidates, max term length,
+# body crc32, fingerprint, version (offset, length), then the offsets of the
+# revenue/confidence/reason id/type columns, term records, reason table,
+# buckets, candidates and pool, and the pool size
+_HEADER = struct.Struct("<4sHHIIIIII16sII10Q")
+# key (offset, bytes, chars), term (offset, bytes)
+_TERM = struct.Struct("<5I")
+# reason (offset, bytes)
+_REASON = struct.Struct("<2I")
+# first word (offset, bytes; 0 bytes = empty bucket), candidate list (start, count)
+_BUCKET = struct.Struct("<4I")
+_CANDIDATE = struct.Struct("<I")
+
+QUERY_TYPES = list(QueryType)
+
+BUNDLED_CATALOGUE_PATH = Path(__file__).resolve().parent.parent / "data" / "commercial_terms.json"
+
+# Maximal runs of word characters; a term always starts with one
+_WORD_RUN = re.compile(r"\w+")
+# Zero-width word boundary check used at both ends of a candidate match
+_WORD_BOUNDARY = re.compile(r"\b")
+_VALID_KEY = re.compile(r"\w(?:.*\w)?", re.DOTALL)
+
+
+class TermDictionaryError(ValueError):
+    """Raised when a catalogue or compiled artifact is invalid"""
+
+
+def _fingerprint(terms: List[Dict[str, Any]]) -> str:
+    """
+    Short fingerprint of the term data (every field, not just the terms)
+
+    Args:
+        terms: Normalized term entries
+
+    Returns:
+        str: 16 hex characters
+    """
+    serialized = json.dumps(terms, sort_keys=True)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:16]
+
+
+def load_catalogue(path: str | os.PathLike) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Read and validate a JSON term catalogue
+
+    Args:
+        path: Catalogue file
+
+    Returns:
+        Tuple[str, List[dict]]: Catalogue version and normalized term entries
+
+    Raises:
+        TermDictionaryError: If the catalogue is malformed
+    """
+    with open(path, encoding="utf-8") as catalogue_file:
+        catalogue = json.load(catalogue_file)
+
+    version = catalogue.get("version")
+    if not isinstance(version, str) or not version:
+        raise TermDictionaryError(f"{path}: catalogue needs a non-empty string 'version'")
+
+    type_values = {query_type.value for query_type in QUERY_TYPES}
+    terms = []
+    for position, entry in enumerate(catalogue.get("terms", [])):
+        try:
+            term = {
+                "term": str(entry["term"]),
+                "type": str(entry["type"]),
+                "reason": str(entry["reason"]),
+                "base_revenue": float(entry["base_revenue"]),
+                "base_confidence": int(entry["base_confidence"]),
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            raise TermDictionaryError(f"{path}: term {position} is invalid: {str(e)}")
+        if term["type"] not in type_values:
+            raise TermDictionaryError(f"{path}: term {position} has unknown type {term['type']!r}")
+        # Matching starts and ends on word boundaries, so terms must too
+        if not _VALID_KEY.fullmatch(term["term"].lower()):
+            raise TermDictionaryError(f"{path}: term {position} ({term['term']!r}) must start and end with a word character")
+        terms.append(term)
+    return version, terms
+
+
+def compile_terms(version: str, terms: List[Dict[str, Any]]) -> bytes:
+    """
+    Build the binary artifact for a term list
+
+    Args:
+        version: Catalogue version
+        terms: Normalized term entries in priority order; when a term
+            repeats (ignoring case) only its first occurrence produces matches
+
+    Returns:
+        bytes: Artifact contents
+    """
+    if sys.byteorder != "little":
+        raise TermDictionaryError("Term dictionary artifacts can only be built on little-endian hosts")
+
+    pool = bytearray()
+    pooled: Dict[str, Tuple[int, int]] = {}
+
+    def intern(value: str) -> Tuple[int, int]:
+        location = pooled.get(value)
+        if location is None:
+            encoded = value.encode("utf-8")
+            location = pooled[value] = (len(pool), len(encoded))
+            pool.extend(encoded)
+        return location
+
+    base_revenue = array("d")
+    base_confidence = array("i")
+    reason_ids = array("I")
+    type_codes = array("B")
+    reason_index: Dict[str, int] = {}
+    reasons = bytearray()
+    records = bytearray()
+    candidates_by_word: Dict[str, List[int]] = {}
+    seen_keys = set()
+    max_term_length = 0
+    for index, term in enumerate(terms):
+        key = term["term"].lower()
+        key_offset, key_bytes = intern(key)
+        term_offset, term_bytes = intern(term["term"])
+        records.extend(_TERM.pack(key_offset, key_bytes, len(key), term_offset, term_bytes))
+        reason_id = reason_index.get(term["reason"])
+        if reason_id is None:
+            reason_id = reason_index[term["reason"]] = len(reason_index)
+            reasons.extend(_REASON.pack(*intern(term["reason"])))
+        base_revenue.append(term["base_revenue"])
+        base_confidence.append(term["base_confidence"])
+        reason_ids.append(reason_id)
+        type_codes.append(QUERY_TYPES.index(QueryType(term["type"])))
+        if key not in seen_keys:
+            seen_keys.add(key)
+            candidates_by_word.setdefault(_WORD_RUN.match(key).group(), []).append(index)
+            max_term_length = max(max_term_length, len(key))
+
+    # Power-of-two table at most half full keeps linear probes short
+    bucket_count = 1
+    while bucket_count < 2 * len(candidates_by_word):
+        bucket_count *= 2
+    buckets: List[Tuple[int, int, int, int]] = [(0, 0, 0, 0)] * bucket_count
+    candidates = bytearray()
+    candidate_count = 0
+    for word, indexes in candidates_by_word.items():
+        word_offset, word_bytes = intern(word)
+        slot = zlib.crc32(word.encode("utf-8")) & (bucket_count - 1)
+        while buckets[slot][1]:
+            slot = (slot + 1) & (bucket_count - 1)
+        buckets[slot] = (word_offset, word_bytes, candidate_count, len(indexes))
+        for index in indexes:
+            candidates.extend(_CANDIDATE.pack(index))
+        candidate_count += len(indexes)
+    version_offset, version_bytes = intern(version)
+
+    sections = [
+        base_revenue.tobytes(),
+        base_confidence.tobytes(),
+        reason_ids.tobytes(),
+        type_codes.tobytes(),
+        bytes(records),
+        bytes(reasons),
+        b"".join(_BUCKET.pack(*bucket) for bucket in buckets),
+        bytes(candidates),
+        bytes(pool),
+    ]
+    # Align every section to 8 bytes so the typed columns start aligned
+    body = bytearray()
+    offsets = []
+    for section in sections:
+        body.extend(bytes(-(_HEADER.size + len(body)) % 8))
+        offsets.append(_HEADER.size + len(body))
+        body.extend(section)
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, 0, len(terms), len(reason_index), bucket_count, candidate_count, max_term_length,
+        zlib.crc32(body), _fingerprint(terms).encode("ascii"), version_offset, version_bytes,
+        *offsets, len(pool)
+    )
+    return header + bytes(body)
+
+
+def compile_catalogue(source_path: str | os.PathLike, artifact_path: str | os.PathLike) -> "TermDictionary":
+    """
+    Compile a JSON catalogue into an artifact file
+
+    The artifact is written next to the destination and renamed into place,
+    so workers watching the path never see a partial file.
+
+    Args:
+        source_path: JSON catalogue
+        artifact_path: Destination artifact
+
+    Returns:
+        TermDictionary: The compiled dictionary (in memory)
+
+    Raises:
+        TermDictionaryError: If the catalogue is malformed
+    """
+    version, terms = load_catalogue(source_path)
+    data = compile_terms(version, terms)
+
+    directory = os.path.dirname(os.path.abspath(artifact_path))
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as artifact_file:
+            artifact_file.write(data)
+            artifact_file.flush()
+            os.fsync(artifact_file.fileno())
+        os.replace(temporary_path, artifact_path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+    return TermDictionary(data)
+
+
+class TermDictionary(Sequence[Dict[str, Any]]):
+    """
+    Read-only term dictionary and matcher backed by a compiled artifact
+
+    Term data is stored column-wise and looked up by integer term id:
+    base_revenue, base_confidence, reason_ids and type_codes are typed
+    memoryviews over the artifact, and term_type/reason resolve the type
+    code and interned reason id (one shared string per distinct reason).
+    Indexing still returns the term's data as a dict ({"term", "type",
+    "reason", "base_revenue", "base_confidence"}), built on each call.
+    find_matches returns every whole-word, case-insensitive occurrence,
+    including overlapping terms, exactly as a \b<term>\b search per term
+    would (and as the regex baseline in benchmarks/term_matcher.py does).
+    """
+
+    def __init__(self, buffer: bytes | mmap.mmap, path: str | None = None):
+        """
+        Wrap artifact contents
+
+        Args:
+            buffer: Artifact bytes or a read-only mmap of the artifact file
+            path: File the buffer was mapped from, if any
+
+        Raises:
+            TermDictionaryError: If the buffer is not a valid artifact
+        """
+        if sys.byteorder != "little":
+            raise TermDictionaryError("Term dictionary artifacts can only be read on little-endian hosts")
+        if len(buffer) < _HEADER.size:
+            raise TermDictionaryError("Term dictionary artifact is truncated")
+        (
+            magic, format_version, _, term_count, reason_count, bucket_count, candidate_count, max_term_length,
+            body_crc, fingerprint, version_offset, version_bytes,
+            revenue_offset, confidence_offset, reason_ids_offset, types_offset,
+            records_offset, reasons_offset, buckets_offset, candidates_offset, pool_offset, pool_size
+        ) = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise TermDictionaryError("Not a term dictionary artifact of a supported format (recompile the catalogue)")
+        view = memoryview(buffer)
+        if len(buffer) != pool_offset + pool_size or zlib.crc32(view[_HEADER.size:]) != body_crc:
+            view.release()
+            raise TermDictionaryError("Term dictionary artifact is truncated or corrupt")
+
+        self._buffer = buffer
+        self.path = path
+        self.max_term_length = max_term_length
+        self.fingerprint = fingerprint.decode("ascii")
+        self._term_count = term_count
+        self._reason_count = reason_count
+        self._bucket_count = bucket_count
+        self._candidate_count = candidate_count
+        self._bucket_mask = bucket_count - 1
+        self._records_offset = records_offset
+        self._reasons_offset = reasons_offset
+        self._buckets_offset = buckets_offset
+        self._candidates_offset = candidates_offset
+        self._pool_offset = pool_offset
+        self._pool_size = pool_size
+        self.version = self._string(version_offset, version_bytes)
+
+        # Columns indexed by term id, read in place
+        self.base_revenue = view[revenue_offset:revenue_offset + 8 * term_count].cast("d")
+        self.base_confidence = view[confidence_offset:confidence_offset + 4 * term_count].cast("i")
+        self.reason_ids = view[reason_ids_offset:reason_ids_offset + 4 * term_count].cast("I")
+        self.type_codes = view[types_offset:types_offset + term_count]
+
+        # Decoded on first use: only terms that actually match pay for it
+        self._keys: Dict[int, Tuple[str, int]] = {}
+        self._reasons: Dict[int, str] = {}
+
+    @classmethod
+    def open(cls, path: str | os.PathLike) -> "TermDictionary":
+        """
+        Map an artifact file read-only
+
+        Args:
+            path: Artifact file
+
+        Returns:
+            TermDictionary: Dictionary sharing the file's pages with other processes
+        """
+        with open(path, "rb") as artifact_file:
+            buffer = mmap.mmap(artifact_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, str(path))
+
+    @classmethod
+    def from_catalogue(cls, path: str | os.PathLike) -> "TermDictionary":
+        """
+        Compile a JSON catalogue in memory (for small catalogues such as the bundled one)
+
+        Args:
+            path: JSON catalogue
+
+        Returns:
+            TermDictionary: Dictionary held in process memory
+        """
+        return cls(compile_terms(*load_catalogue(path)))
+
+    @property
+    def size_bytes(self) -> int:
+        """Size of the artifact"""
+        return len(self._buffer)
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._pool_offset + offset
+        return self._buffer[start:start + length].decode("utf-8")
+
+    def __len__(self) -> int:
+        return self._term_count
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        if index < 0:
+            index += self._term_count
+        if not 0 <= index < self._term_count:
+            raise IndexError("term index out of range")
+        return {
+            "term": self.term(index),
+            "type": self.term_type(index),
+            "reason": self.reason(index),
+            "base_revenue": self.base_revenue[index],
+            "base_confidence": self.base_confidence[index],
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self._term_count):
+            yield self[index]
+
+    def term(self, index: int) -> str:
+        """Catalogue spelling of a term"""
+        term_offset, term_bytes = _TERM.unpack_from(self._buffer, self._records_offset + index * _TERM.size)[3:]
+        return self._string(term_offset, term_bytes)
+
+    def term_type(self, index: int) -> QueryType:
+        """Query type of a term"""
+        return QUERY_TYPES[self.type_codes[index]]
+
+    def reason(self, index: int) -> str:
+        """Reason of a term; terms with the same reason share one string"""
+        reason_id = self.reason_ids[index]
+        reason = self._reasons.get(reason_id)
+        if reason is None:
+            reason_offset, reason_bytes = _REASON.unpack_from(
+                self._buffer, self._reasons_offset + reason_id * _REASON.size
+            )
+            reason = self._reasons[reason_id] = self._string(reason_offset, reason_bytes)
+        return reason
+
+    def term_index(self, text: str) -> int | None:
+        """
+        Find the term a matched text belongs to
+
+        Args:
+            text: Matched text, in any case (e.g. a stored query's term)
+
+        Returns:
+            int | None: Term index, or None if no term of this dictionary matches it
+        """
+        key = text.lower()
+        first_word = _WORD_RUN.match(key)
+        if first_word is None:
+            return None
+        for index in self._candidates(first_word.group()):
+            if self._key(index)[0] == key:
+                return index
+        return None
+
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        Bytes used by each part of the artifact
+
+        Returns:
+            dict: Term and distinct reason counts, bytes per section
+                (alignment padding and header are only in total_bytes) and
+                bytes_per_term
+        """
+        term_count = self._term_count
+        return {
+            "terms": term_count,
+            "distinct_reasons": self._reason_count,
+            "column_bytes": term_count * (8 + 4 + 4 + 1),
+            "term_record_bytes": term_count * _TERM.size,
+            "reason_table_bytes": self._reason_count * _REASON.size,
+            "hash_index_bytes": self._bucket_count * _BUCKET.size + self._candidate_count * _CANDIDATE.size,
+            "string_pool_bytes": self._pool_size,
+            "total_bytes": self.size_bytes,
+            "bytes_per_term": round(self.size_bytes / term_count, 1) if term_count else 0.0,
+        }
+
+    def _key(self, index: int) -> Tuple[str, int]:
+        key = self._keys.get(index)
+        if key is None:
+            key_offset, key_bytes, key_chars = _TERM.unpack_from(
+                self._buffer, self._records_offset + index * _TERM.size
+            )[:3]
+            key = self._keys[index] = (self._string(key_offset, key_bytes), key_chars)
+        return key
+
+    def _candidates(self, word: str) -> List[int]:
+        """
+        Term indexes whose lowercased key starts with the given first word
+
+        Args:
+            word: Lowercased maximal run of word characters
+
+        Returns:
+            List[int]: Candidate term indexes (empty if none)
+        """
+        encoded = word.encode("utf-8")
+        buffer = self._buffer
+        slot = zlib.crc32(encoded) & self._bucket_mask
+        while True:
+            word_offset, word_bytes, candidate_start, candidate_count = _BUCKET.unpack_from(
+                buffer, self._buckets_offset + slot * _BUCKET.size
+            )
+            if not word_bytes:
+                return []
+            if word_bytes == len(encoded):
+                start = self._pool_offset + word_offset
+                if buffer[start:start + word_bytes] == encoded:
+                    start = self._candidates_offset + candidate_start * _CANDIDATE.size
+                    return list(struct.unpack_from(f"<{candidate_count}I", buffer, start))
+            slot = (slot + 1) & self._bucket_mask
+
+    def find_matches(self, text: str, start: int = 0, end: int | None = None) -> List[Tuple[int, int, int]]:
+        """
+        Find all term occurrences in the text
+
+        Word boundaries are always evaluated against the full text, so
+        restricting the range never creates or hides matches at its edges.
+
+        Args:
+            text: Text to scan
+            start: Only report matches starting at or after this offset
+            end: Only report matches starting before this offset (default: end of text)
+
+        Returns:
+            List[Tuple[int, int, int]]: (term_index, start, end) tuples ordered
+                by term index, then by start position
+        """
+        text_length = len(text)
+        scan_end = text_length if end is None else min(end, text_length)
+        if start >= scan_end or not self._term_count:
+            return []
+
+        # Every match starts with a whole word equal to its term's first word:
+        # one pass over the words, looking each distinct word up once
+        boundary = _WORD_BOUNDARY.match
+        word_run = _WORD_RUN.match
+        candidates_by_word: Dict[str, List[Tuple[int, str, int]]] = {}
+        matches: List[Tuple[int, int, int]] = []
+        for run in _WORD_RUN.finditer(text, start, scan_end):
+            position = run.start()
+            if not boundary(text, position):
+                continue
+            word = run.group()
+            if run.end() == scan_end and scan_end < text_length:
+                word = word_run(text, position).group()  # The range cut the word short
+
+            candidates = candidates_by_word.get(word)
+            if candidates is None:
+                candidates = candidates_by_word[word] = [
+                    (index, *self._key(index)) for index in self._candidates(word.lower())
+                ]
+            for index, key, key_length in candidates:
+                match_end = position + key_length
+                if text[position:match_end].lower() == key and boundary(text, match_end):
+                    matches.append((index, position, match_end))
+
+        matches.sort()
+        return matches
+
+    def iter_matches(self, chunks: Iterable[str]) -> Iterator[Tuple[int, int, int]]:
+        """
+        Find all term occurrences in text that arrives in chunks
+
+        Only the unscanned tail of the text plus one longest term is held at
+        a time. Matches are reported as soon as the text after them is long
+        enough to decide them, so terms and word boundaries that straddle
+        chunk edges are handled and the result equals find_matches on the
+        joined text.
+
+        Args:
+            chunks: Consecutive pieces of the text (any sizes, may be empty)
+
+        Yields:
+            Tuple[int, int, int]: (term_index, start, end) tuples with offsets
+                into the whole text, ordered by start position, then term index
+        """
+        # A match is decided once the text runs one character past its longest possible end
+        lookahead = self.max_term_length + 1
+        window = ""
+        window_offset = 0  # Offset of window[0] in the whole text
+        scanned = 0  # Matches starting before window[scanned] were reported
+
+        for chunk in chunks:
+            window += chunk
+            decided = len(window) - lookahead
+            if decided <= scanned:
+                continue
+            matches = self.find_matches(window, scanned, decided)
+            matches.sort(key=lambda match: (match[1], match[0]))
+            for term_index, start, end in matches:
+                yield term_index, window_offset + start, window_offset + end
+            # Keep one character before the next start for its word boundary
+            window_offset += decided - 1
+            window = window[decided - 1:]
+            scanned = 1
+
+        matches = self.find_matches(window, scanned)
+        matches.sort(key=lambda match: (match[1], match[0]))
+        for term_index, start, end in matches:
+            yield term_index, window_offset + start, window_offset + end
+
+
+def _main() -> int:
+    parser = argparse.ArgumentParser(description="Compile and inspect commercial term dictionaries")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_command = commands.add_parser("compile", help="Compile a JSON catalogue into an artifact")
+    compile_command.add_argument("source", help="JSON catalogue")
+    compile_command.add_argument("artifact", help="Artifact to write (replaced atomically)")
+    info_command = commands.add_parser("info", help="Describe an artifact")
+    info_command.add_argument("artifact")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "compile":
+            dictionary = compile_catalogue(args.source, args.artifact)
+        else:
+            dictionary = TermDictionary.open(args.artifact)
+    except (OSError, TermDictionaryError) as e:
+        print(f"error: {str(e)}", file=sys.stderr)
+        return 1
+
+    report = dictionary.memory_report()
+    print(f"version:          {dictionary.version}")
+    print(f"fingerprint:      {dictionary.fingerprint}")
+    print(f"terms:            {report['terms']}")
+    print(f"distinct reasons: {report['distinct_reasons']}")
+    print(f"max term length:  {dictionary.max_term_length}")
+    print(f"columns:          {report['column_bytes']} bytes")
+    print(f"term records:     {report['term_record_bytes']} bytes")
+    print(f"reason table:     {report['reason_table_bytes']} bytes")
+    print(f"hash index:       {report['hash_index_bytes']} bytes")
+    print(f"string pool:      {report['string_pool_bytes']} bytes")
+    print(f"artifact bytes:   {report['total_bytes']} ({report['bytes_per_term']} per term)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_main())
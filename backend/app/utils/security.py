@@ -1,17 +1,47 @@
 """
 Security utilities for password hashing and JWT token management
 """
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, Any
 from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError
+from argon2.exceptions import VerifyMismatchError, InvalidHashError
 from jose import JWTError, jwt
 from fastapi import HTTPException, status
 
 from ..config import settings
 
 # Initialize Argon2 password hasher
-ph = PasswordHasher()
+ph = PasswordHasher(
+    time_cost=settings.argon2_time_cost,
+    memory_cost=settings.argon2_memory_cost,
+    parallelism=settings.argon2_parallelism
+)
+
+# Dedicated pool so hashing never runs on the event loop; argon2 releases
+# the GIL while hashing, so workers run truly in parallel. Created on first use
+_hash_executor: ThreadPoolExecutor | None = None
+
+
+def get_hash_executor() -> ThreadPoolExecutor:
+    """
+    Get the password hashing pool, creating it on first use
+    
+    A new pool is created after shutdown_hash_executor, so hashing keeps
+    working when the application is started again in the same process.
+    
+    Returns:
+        ThreadPoolExecutor: The shared hashing pool
+    """
+    global _hash_executor
+    
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=settings.password_hash_workers,
+            thread_name_prefix="argon2"
+        )
+    return _hash_executor
 
 
 def hash_password(password: str) -> str:
@@ -45,6 +75,64 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         return False
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    Check whether a hash was created with different Argon2 parameters
+    
+    Args:
+        hashed_password: Stored password hash
+        
+    Returns:
+        bool: True if the hash should be regenerated with the current parameters
+    """
+    try:
+        return ph.check_needs_rehash(hashed_password)
+    except InvalidHashError:
+        return False
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    Hash a password on the dedicated hashing pool
+    
+    Args:
+        password: Plain text password to hash
+        
+    Returns:
+        str: Hashed password
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_executor(), hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password on the dedicated hashing pool
+    
+    Args:
+        plain_password: Plain text password to verify
+        hashed_password: Hashed password to verify against
+        
+    Returns:
+        bool: True if password matches, False otherwise
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_executor(), verify_password, plain_password, hashed_password)
+
+
+def shutdown_hash_executor() -> None:
+    """
+    Shut down the password hashing pool if it was started
+    
+    This function should be called during application shutdown.
+    """
+    global _hash_executor
+    
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
 def create_access_token(data: Dict[str, Any]) -> str:
     """
     Create a JWT access token
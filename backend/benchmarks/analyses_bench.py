@@ -0,0 +1,188 @@
+"""
+Benchmark for GET /api/v1/scripts/analyses data loading
+
+Seeds a local MongoDB with analysed scripts and compares the previous
+per-script lookups (one budget find_one and one queries find per script)
+against the batched $in join used by build_script_analyses.
+
+Usage (from the backend directory, with a local mongod running):
+    python -m benchmarks.analyses_bench
+    python -m benchmarks.analyses_bench --uri mongodb://localhost:27017 --script-counts 10 100 1000
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import List
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+DEFAULT_URI = "mongodb://localhost:27017"
+DATABASE_NAME = "bench_analyses"
+BENCH_USER_ID = "bench-user"
+
+# Settings are read at import time; the benchmark only needs placeholders
+os.environ.setdefault("MONGODB_URI", DEFAULT_URI)
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+from app.routers.scripts import build_script_analyses  # noqa: E402
+
+
+async def seed(db, script_count: int, queries_per_script: int) -> None:
+    """
+    Replace the benchmark collections with freshly generated analyses
+
+    Args:
+        db: Benchmark database
+        script_count: Number of analysed scripts to create
+        queries_per_script: Commercial queries per script
+    """
+    for name in ("scripts", "budget_models", "commercial_queries"):
+        await db[name].drop()
+
+    await db["scripts"].create_index([("user_id", 1), ("created_at", -1)])
+    await db["budget_models"].create_index("script_id")
+    await db["commercial_queries"].create_index("script_id")
+
+    now = datetime.utcnow()
+    params = {
+        "target_production_budget": 100000.0,
+        "target_audience": "Young adults",
+        "creative_flexibility": "minor-dialogue-changes",
+        "creative_direction_notes": None,
+        "title": None,
+    }
+    scripts = [
+        {
+            "user_id": BENCH_USER_ID,
+            "title": f"Script {i}",
+            "text": "INT. COFFEE SHOP - DAY\n\nSARAH checks her phone. " * 20,
+            "params": params,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(script_count)
+    ]
+    result = await db["scripts"].insert_many(scripts)
+    script_ids = [str(inserted_id) for inserted_id in result.inserted_ids]
+
+    await db["budget_models"].insert_many([
+        {
+            "script_id": script_id,
+            "baseline_adsense_revenue": 60000.0,
+            "potential_sponsorship_revenue": 5000.0,
+            "total_projected_revenue": 65000.0,
+            "production_budget": 100000.0,
+            "net_impact": -35000.0,
+            "category_breakdown": {"Product": 5000.0},
+            "brand_safety_score": 95,
+            "monetization_tips": [],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for script_id in script_ids
+    ])
+
+    queries = [
+        {
+            "script_id": script_id,
+            "term": "coffee",
+            "type": "product",
+            "reason": "CPG category; high advertiser demand",
+            "estimated_revenue": 5000.0,
+            "status": "pending",
+            "script_excerpt": "INT. COFFEE SHOP - DAY...",
+            "start_index": 5,
+            "end_index": 11,
+            "confidence_score": 85,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for script_id in script_ids
+        for _ in range(queries_per_script)
+    ]
+    if queries:
+        await db["commercial_queries"].insert_many(queries)
+
+
+async def load_per_script(db, scripts: List[dict]) -> int:
+    """
+    Previous access pattern: two sequential round trips per script
+
+    Args:
+        db: Benchmark database
+        scripts: Script documents
+
+    Returns:
+        int: Number of analyses found
+    """
+    found = 0
+    for script in scripts:
+        script_id = str(script["_id"])
+        budget = await db["budget_models"].find_one({"script_id": script_id})
+        if not budget:
+            continue
+        await db["commercial_queries"].find({"script_id": script_id}).to_list(length=None)
+        found += 1
+    return found
+
+
+async def timed(coro_factory, repeats: int) -> float:
+    """
+    Run a coroutine factory several times and return the best wall time
+
+    Args:
+        coro_factory: Zero-argument callable returning a coroutine
+        repeats: Number of runs
+
+    Returns:
+        float: Best run time in seconds
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await coro_factory()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=DEFAULT_URI)
+    parser.add_argument("--script-counts", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--queries-per-script", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(args.uri, serverSelectionTimeoutMS=5000)
+    db = client[DATABASE_NAME]
+
+    print(f"{'scripts':>8} {'per-script':>12} {'batched':>10} {'speedup':>8}")
+    try:
+        for script_count in args.script_counts:
+            await seed(db, script_count, args.queries_per_script)
+
+            async def fetch_scripts():
+                cursor = db["scripts"].find({"user_id": BENCH_USER_ID}).sort("created_at", -1)
+                return await cursor.to_list(length=None)
+
+            async def run_per_script():
+                return await load_per_script(db, await fetch_scripts())
+
+            async def run_batched():
+                return await build_script_analyses(db, await fetch_scripts())
+
+            per_script_seconds = await timed(run_per_script, args.repeats)
+            batched_seconds = await timed(run_batched, args.repeats)
+            print(
+                f"{script_count:>8} {per_script_seconds * 1000:>10.1f}ms {batched_seconds * 1000:>8.1f}ms "
+                f"{per_script_seconds / batched_seconds:>7.1f}x"
+            )
+    finally:
+        await client.drop_database(DATABASE_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
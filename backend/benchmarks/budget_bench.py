@@ -0,0 +1,181 @@
+"""
+Benchmark for POST /api/v1/scripts/{script_id}/budget revenue totals
+
+Seeds a local MongoDB with one script's accepted queries and compares the
+previous approach (fetch every accepted query and sum in Python) against
+the $group aggregation used by sum_accepted_revenue. Transfer size is the
+BSON size of the documents each approach receives from the server.
+
+Usage (from the backend directory, with a local mongod running):
+    python -m benchmarks.budget_bench
+    python -m benchmarks.budget_bench --uri mongodb://localhost:27017 --query-counts 10000 100000
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import time
+from datetime import datetime
+from typing import Dict, Tuple
+
+import bson
+from motor.motor_asyncio import AsyncIOMotorClient
+
+DEFAULT_URI = "mongodb://localhost:27017"
+DATABASE_NAME = "bench_budget"
+BENCH_SCRIPT_ID = "bench-script"
+
+# Settings are read at import time; the benchmark only needs placeholders
+os.environ.setdefault("MONGODB_URI", DEFAULT_URI)
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+from app.services.budget_updates import sum_accepted_revenue  # noqa: E402
+from app.services.ai_detection import get_term_dictionary  # noqa: E402
+
+
+async def seed(db, query_count: int, rng: random.Random) -> None:
+    """
+    Replace the benchmark collection with one script's queries
+
+    Roughly one query in ten stays pending, so the $match has to filter.
+
+    Args:
+        db: Benchmark database
+        query_count: Number of accepted queries to create
+        rng: Random source
+    """
+    await db["commercial_queries"].drop()
+    await db["commercial_queries"].create_index([("script_id", 1), ("status", 1)])
+
+    now = datetime.utcnow()
+    dictionary = get_term_dictionary()
+    queries = []
+    for position in range(query_count + query_count // 10):
+        term_data = rng.choice(dictionary)
+        queries.append({
+            "script_id": BENCH_SCRIPT_ID,
+            "term": term_data["term"],
+            "type": term_data["type"],
+            "reason": term_data["reason"],
+            "estimated_revenue": round(term_data["base_revenue"] * rng.uniform(0.8, 1.2), 2),
+            "status": "accepted" if position < query_count else "pending",
+            "script_excerpt": f"...the scene where {term_data['term']} appears on screen...",
+            "start_index": position * 40,
+            "end_index": position * 40 + len(term_data["term"]),
+            "confidence_score": term_data["base_confidence"],
+            "created_at": now,
+            "updated_at": now,
+        })
+    for start in range(0, len(queries), 10000):
+        await db["commercial_queries"].insert_many(queries[start:start + 10000])
+
+
+async def sum_in_python(queries_collection) -> Tuple[float, Dict[str, float]]:
+    """
+    Previous access pattern: fetch every accepted query and total in Python
+
+    Args:
+        queries_collection: Benchmark commercial_queries collection
+
+    Returns:
+        Tuple[float, Dict[str, float]]: Sponsorship revenue and category breakdown
+    """
+    accepted_queries = await queries_collection.find(
+        {"script_id": BENCH_SCRIPT_ID, "status": "accepted"}
+    ).to_list(length=None)
+
+    sponsorship_revenue = 0
+    category_breakdown = {}
+    for query in accepted_queries:
+        revenue = query.get("estimated_revenue", 0)
+        sponsorship_revenue += revenue
+        category = str(query.get("type", "other")).capitalize()
+        category_breakdown[category] = category_breakdown.get(category, 0) + revenue
+
+    return sponsorship_revenue, category_breakdown
+
+
+async def transfer_sizes(queries_collection) -> Tuple[int, int]:
+    """
+    Bytes each approach receives for the benchmark script
+
+    Args:
+        queries_collection: Benchmark commercial_queries collection
+
+    Returns:
+        Tuple[int, int]: BSON size of the accepted queries and of the grouped documents
+    """
+    cursor = queries_collection.find({"script_id": BENCH_SCRIPT_ID, "status": "accepted"})
+    find_bytes = sum([len(bson.encode(query)) async for query in cursor])
+
+    cursor = queries_collection.aggregate([
+        {"$match": {"script_id": BENCH_SCRIPT_ID, "status": "accepted"}},
+        {"$group": {
+            "_id": "$type",
+            "revenue": {"$sum": {"$ifNull": ["$estimated_revenue", 0]}},
+        }},
+    ])
+    group_bytes = sum([len(bson.encode(group)) async for group in cursor])
+    return find_bytes, group_bytes
+
+
+async def timed(coro_factory, repeats: int) -> float:
+    """
+    Run a coroutine factory several times and return the best wall time
+
+    Args:
+        coro_factory: Zero-argument callable returning a coroutine
+        repeats: Number of runs
+
+    Returns:
+        float: Best run time in seconds
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await coro_factory()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=DEFAULT_URI)
+    parser.add_argument("--query-counts", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(args.uri, serverSelectionTimeoutMS=5000)
+    db = client[DATABASE_NAME]
+    queries_collection = db["commercial_queries"]
+    rng = random.Random(args.seed)
+
+    print(f"{'accepted':>9} {'python':>10} {'$group':>10} {'speedup':>8} {'python bytes':>13} {'$group bytes':>13}")
+    try:
+        for query_count in args.query_counts:
+            await seed(db, query_count, rng)
+
+            # Sanity check: both approaches produce the same totals
+            expected_revenue, expected_breakdown = await sum_in_python(queries_collection)
+            revenue, breakdown = await sum_accepted_revenue(queries_collection, BENCH_SCRIPT_ID)
+            assert math.isclose(revenue, expected_revenue, rel_tol=1e-9), "sponsorship revenue diverged"
+            assert breakdown.keys() == expected_breakdown.keys(), "categories diverged"
+            for category, category_revenue in breakdown.items():
+                assert math.isclose(category_revenue, expected_breakdown[category], rel_tol=1e-9), "category diverged"
+            python_bytes, group_bytes = await transfer_sizes(queries_collection)
+
+            python_seconds = await timed(lambda: sum_in_python(queries_collection), args.repeats)
+            group_seconds = await timed(lambda: sum_accepted_revenue(queries_collection, BENCH_SCRIPT_ID), args.repeats)
+            print(
+                f"{query_count:>9} {python_seconds * 1000:>8.1f}ms {group_seconds * 1000:>8.1f}ms "
+                f"{python_seconds / group_seconds:>7.1f}x {python_bytes / 1024:>11.0f}KB {group_bytes:>12}B"
+            )
+    finally:
+        await client.drop_database(DATABASE_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
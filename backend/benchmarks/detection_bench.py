@@ -0,0 +1,198 @@
+"""
+Benchmark for commercial term matching throughput
+
+Compares the legacy one-regex-per-term scan against the TermDictionary the
+API detects with (compiled artifact, one pass over the words) on
+feature-length scripts while the term list grows.
+
+Usage (from the backend directory):
+    python -m benchmarks.detection_bench
+    python -m benchmarks.detection_bench --sizes-kb 100 500 --term-counts 32 1000 50000
+"""
+import argparse
+import itertools
+import random
+import re
+import string
+import time
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+from app.services.term_dictionary import BUNDLED_CATALOGUE_PATH, TermDictionary, compile_terms, load_catalogue
+
+
+# Legacy scans above this many terms take minutes per script and are skipped
+LEGACY_TERM_LIMIT = 2000
+
+# Distinct words of the default script vocabulary (drawn with Zipf-like frequencies)
+VOCABULARY_SIZE = 20000
+
+SCREENPLAY_WORDS = [
+    "INT.", "EXT.", "DAY", "NIGHT", "CONTINUOUS", "the", "a", "and", "to", "of",
+    "she", "he", "they", "walks", "into", "looks", "at", "turns", "says", "beat",
+    "quietly", "door", "window", "table", "chair", "street", "room", "hands",
+    "(V.O.)", "(O.S.)", "CUT", "TO:", "SARAH", "MARCUS", "smiles", "pauses",
+]
+
+
+def generate_terms(count: int, rng: random.Random) -> List[str]:
+    """
+    Build a term list starting with the real dictionary and padded with synthetic terms
+
+    Args:
+        count: Number of terms to produce
+        rng: Random source
+
+    Returns:
+        List[str]: Term list
+    """
+    _, catalogue = load_catalogue(BUNDLED_CATALOGUE_PATH)
+    terms = [term_data["term"] for term_data in catalogue][:count]
+    seen = set(terms)
+    while len(terms) < count:
+        word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 11)))
+        if rng.random() < 0.2:
+            word += " " + "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 8)))
+        if word not in seen:
+            seen.add(word)
+            terms.append(word)
+    return terms
+
+
+@lru_cache(maxsize=1)
+def default_vocabulary() -> Tuple[str, ...]:
+    """
+    Build a screenplay vocabulary of VOCABULARY_SIZE distinct words
+
+    The screenplay words come first (most frequent), followed by synthetic
+    words, so scripts have as many distinct words as real prose does.
+
+    Returns:
+        Tuple[str, ...]: Words in decreasing frequency order
+    """
+    rng = random.Random(0)
+    words = list(SCREENPLAY_WORDS)
+    seen = set(words)
+    while len(words) < VOCABULARY_SIZE:
+        word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 12)))
+        if rng.random() < 0.1:
+            word = word.capitalize()
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return tuple(words)
+
+
+def build_dictionary(terms: List[str]) -> TermDictionary:
+    """
+    Compile a term list into an in-memory TermDictionary
+
+    Args:
+        terms: Term list in priority order
+
+    Returns:
+        TermDictionary: Dictionary whose term ids are the list positions
+    """
+    return TermDictionary(compile_terms("bench", [
+        {"term": term, "type": "product", "reason": "Benchmark term", "base_revenue": 1000.0, "base_confidence": 80}
+        for term in terms
+    ]))
+
+
+def generate_script(
+    size_bytes: int,
+    terms: List[str],
+    rng: random.Random,
+    vocabulary: Sequence[str] | None = None
+) -> str:
+    """
+    Build a screenplay-like text sprinkled with terms
+
+    Args:
+        size_bytes: Approximate size of the script
+        terms: Terms to sprinkle into the text
+        rng: Random source
+        vocabulary: Words in decreasing frequency order (default: default_vocabulary())
+
+    Returns:
+        str: Script text
+    """
+    vocabulary = default_vocabulary() if vocabulary is None else vocabulary
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+    parts: List[str] = []
+    length = 0
+    while length < size_bytes:
+        if rng.random() < 0.03:
+            word = rng.choice(terms)
+        else:
+            word = rng.choices(vocabulary, cum_weights=cum_weights)[0]
+        separator = "\n" if rng.random() < 0.08 else " "
+        parts.append(word + separator)
+        length += len(word) + 1
+    return "".join(parts)
+
+
+def legacy_find(terms: List[str], text: str) -> List[Tuple[int, int, int]]:
+    """
+    Reference implementation: one regex scan per term
+
+    Args:
+        terms: Term list
+        text: Script text
+
+    Returns:
+        List[Tuple[int, int, int]]: (term_index, start, end) tuples
+    """
+    matches = []
+    seen = set()
+    for index, term in enumerate(terms):
+        for match in re.finditer(r"\b" + re.escape(term) + r"\b", text, re.IGNORECASE):
+            key = (term.lower(), match.start())
+            if key not in seen:
+                seen.add(key)
+                matches.append((index, match.start(), match.end()))
+    return matches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[100, 250, 500])
+    parser.add_argument("--term-counts", type=int, nargs="+", default=[32, 256, 2000, 10000, 50000])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    print(f"{'terms':>7} {'script':>7} {'compile':>9} {'matches':>8} {'compiled':>10} {'MB/s':>8} {'legacy':>10} {'MB/s':>8}")
+    for term_count in args.term_counts:
+        terms = generate_terms(term_count, rng)
+
+        started = time.perf_counter()
+        matcher = build_dictionary(terms)
+        compile_seconds = time.perf_counter() - started
+
+        for size_kb in args.sizes_kb:
+            text = generate_script(size_kb * 1024, terms, rng)
+            megabytes = len(text) / (1024 * 1024)
+
+            started = time.perf_counter()
+            matches = matcher.find_matches(text)
+            compiled_seconds = time.perf_counter() - started
+
+            if term_count <= LEGACY_TERM_LIMIT:
+                started = time.perf_counter()
+                legacy_matches = legacy_find(terms, text)
+                legacy_seconds = time.perf_counter() - started
+                assert sorted(legacy_matches) == matches, "term dictionary diverged from legacy scan"
+                legacy_columns = f"{legacy_seconds * 1000:>8.1f}ms {megabytes / legacy_seconds:>8.2f}"
+            else:
+                legacy_columns = f"{'skipped':>10} {'-':>8}"
+
+            print(
+                f"{term_count:>7} {size_kb:>5}KB {compile_seconds * 1000:>7.1f}ms {len(matches):>8} "
+                f"{compiled_seconds * 1000:>8.1f}ms {megabytes / compiled_seconds:>8.2f} {legacy_columns}"
+            )
+
+
+if __name__ == "__main__":
+    main()
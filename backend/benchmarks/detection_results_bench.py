@@ -0,0 +1,180 @@
+"""
+Benchmark for materializing detection results
+
+Compares building a validated CommercialQueryInDB per match (with a uuid4 and
+timestamp each, then model_dump as the analyze endpoint did) against the
+__slots__ DetectedQuery records turned into storage documents once per
+analysis. Also reports the pickled size, which is what large scripts send
+back from the detection process pool.
+
+Usage (from the backend directory):
+    python -m benchmarks.detection_results_bench
+    python -m benchmarks.detection_results_bench --matches 10000 100000 --repeat 5
+"""
+import argparse
+import os
+import pickle
+import random
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+# Settings are read at import time; the benchmark only needs placeholders
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+from app.models.commercial_query import CommercialQueryInDB, QueryStatus  # noqa: E402
+from app.models.script import CreativeFlexibility, ScriptParams  # noqa: E402
+from app.services.ai_detection import (  # noqa: E402
+    build_query_documents,
+    calculate_confidence_adjustment,
+    calculate_revenue_multiplier,
+    extract_excerpt,
+    find_commercial_queries,
+    get_term_dictionary,
+)
+from benchmarks.detection_bench import SCREENPLAY_WORDS  # noqa: E402
+
+PARAMS = ScriptParams(
+    target_production_budget=100000,
+    target_audience="Young adults",
+    creative_flexibility=CreativeFlexibility.MINOR_DIALOGUE_CHANGES,
+)
+
+
+def generate_script(match_count: int, rng: random.Random) -> str:
+    """
+    Build a screenplay-like text with roughly the requested number of term matches
+
+    Args:
+        match_count: Target number of matches
+        rng: Random source
+
+    Returns:
+        str: Script text
+    """
+    terms = [term_data["term"] for term_data in get_term_dictionary()]
+    parts: List[str] = []
+    for _ in range(match_count):
+        parts.append(rng.choice(terms))
+        parts.extend(rng.choice(SCREENPLAY_WORDS) for _ in range(rng.randint(3, 9)))
+    return " ".join(parts)
+
+
+def legacy_detect(script_text: str, params: ScriptParams) -> List[Dict[str, Any]]:
+    """
+    Reference implementation: one validated model per match, then model_dump
+
+    Args:
+        script_text: The script text to analyze
+        params: Script parameters
+
+    Returns:
+        List[dict]: Query documents as the analyze endpoint produced them
+    """
+    queries = []
+    detected_positions = set()
+    revenue_multiplier = calculate_revenue_multiplier(params.creative_flexibility)
+    confidence_adjustment = calculate_confidence_adjustment(params.creative_flexibility)
+
+    dictionary = get_term_dictionary()
+    for term_index, start_index, end_index in dictionary.find_matches(script_text):
+        term_data = dictionary[term_index]
+        position_key = (term_data["term"].lower(), start_index)
+        if position_key in detected_positions:
+            continue
+        detected_positions.add(position_key)
+
+        now = datetime.utcnow()
+        queries.append(CommercialQueryInDB(
+            id=str(uuid.uuid4()),
+            script_id="",
+            term=script_text[start_index:end_index],
+            type=term_data["type"],
+            reason=term_data["reason"],
+            estimated_revenue=round(term_data["base_revenue"] * revenue_multiplier, 2),
+            status=QueryStatus.PENDING,
+            script_excerpt=extract_excerpt(script_text, start_index, end_index),
+            start_index=start_index,
+            end_index=end_index,
+            confidence_score=max(0, min(100, term_data["base_confidence"] + confidence_adjustment)),
+            created_at=now,
+            updated_at=now,
+        ))
+    return [query.model_dump(exclude={"id", "script_id"}) for query in queries]
+
+
+def best_of(repeat: int, func: Callable[[], Any]) -> float:
+    """
+    Time a function, keeping the fastest run
+
+    Args:
+        repeat: Number of runs
+        func: Function to time
+
+    Returns:
+        float: Fastest duration in seconds
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--matches", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    matcher = get_term_dictionary()
+
+    print(
+        f"{'matches':>8} {'scan':>9} {'legacy':>9} {'us/match':>9} {'records':>9} {'+excerpt':>9} "
+        f"{'us/match':>9} {'pickle legacy':>14} {'pickle records':>15}"
+    )
+    for match_count in args.matches:
+        text = generate_script(match_count, rng)
+        matches = len(matcher.find_matches(text))
+
+        # Sanity check: both paths produce the same documents apart from timestamps
+        legacy_documents = legacy_detect(text, PARAMS)
+        records = find_commercial_queries(text, PARAMS)
+        documents = build_query_documents(text, records)
+        for document in legacy_documents:
+            del document["created_at"], document["updated_at"]
+        assert legacy_documents == documents, "record path diverged from legacy detection"
+
+        scan_seconds = best_of(args.repeat, lambda: matcher.find_matches(text))
+        legacy_seconds = best_of(args.repeat, lambda: legacy_detect(text, PARAMS))
+        records_seconds = best_of(args.repeat, lambda: build_query_documents(
+            text, find_commercial_queries(text, PARAMS), include_excerpts=False
+        ))
+        excerpt_seconds = best_of(args.repeat, lambda: build_query_documents(
+            text, find_commercial_queries(text, PARAMS)
+        ))
+
+        legacy_models = [
+            CommercialQueryInDB(id=str(uuid.uuid4()), script_id="", created_at=datetime.utcnow(),
+                                updated_at=datetime.utcnow(), **document)
+            for document in documents
+        ]
+        legacy_pickle = len(pickle.dumps(legacy_models, protocol=pickle.HIGHEST_PROTOCOL))
+        records_pickle = len(pickle.dumps(records, protocol=pickle.HIGHEST_PROTOCOL))
+
+        print(
+            f"{matches:>8} {scan_seconds * 1000:>7.1f}ms {legacy_seconds * 1000:>7.1f}ms "
+            f"{(legacy_seconds - scan_seconds) / matches * 1e6:>9.2f} "
+            f"{records_seconds * 1000:>7.1f}ms {excerpt_seconds * 1000:>7.1f}ms "
+            f"{(records_seconds - scan_seconds) / matches * 1e6:>9.2f} "
+            f"{legacy_pickle / 1024:>12.0f}KB {records_pickle / 1024:>13.0f}KB"
+        )
+
+
+if __name__ == "__main__":
+    main()
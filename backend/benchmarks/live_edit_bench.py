@@ -0,0 +1,213 @@
+"""
+Benchmark for live edit-stream detection
+
+Replays an editing session (typing, backspacing, cursor jumps, pastes and
+selection deletes) against LiveMatchIndex and compares per-edit latency with
+re-scanning the whole document after every edit. Sessions are JSONL files:
+the first line is {"text": initial document}, every other line is
+{"offset": int, "deleted": int, "inserted": str}.
+
+Usage (from the backend directory):
+    python -m benchmarks.live_edit_bench
+    python -m benchmarks.live_edit_bench --sizes-kb 50 1000 --edits 20000
+    python -m benchmarks.live_edit_bench --record session.jsonl --sizes-kb 250
+    python -m benchmarks.live_edit_bench --session session.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import time
+from typing import Dict, List, Tuple
+
+# Settings are read at import time; the benchmark only needs placeholders
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+from app.services.ai_detection import get_term_dictionary  # noqa: E402
+from app.services.live_detection import LiveMatchIndex  # noqa: E402
+from benchmarks.detection_bench import SCREENPLAY_WORDS, generate_script  # noqa: E402
+
+# Full re-scans are slow on large documents, so only every Nth edit is timed
+FULL_SCAN_SAMPLE_EVERY = 25
+
+Edit = Tuple[int, int, str]
+
+
+def synthesize_session(text: str, edit_count: int, rng: random.Random) -> List[Edit]:
+    """
+    Simulate a writer editing a document
+
+    Args:
+        text: Initial document
+        edit_count: Number of edits to produce
+        rng: Random source
+
+    Returns:
+        List[Edit]: (offset, deleted, inserted) edits in order
+    """
+    words = SCREENPLAY_WORDS + [term_data["term"] for term_data in get_term_dictionary()]
+    length = len(text)
+    cursor = rng.randrange(length + 1)
+    pending = ""
+    edits: List[Edit] = []
+
+    while len(edits) < edit_count:
+        roll = rng.random()
+        if roll < 0.01:
+            # Jump somewhere else in the document
+            cursor = rng.randrange(length + 1)
+            pending = ""
+            continue
+        if roll < 0.015:
+            # Paste a paragraph
+            paste = " ".join(rng.choice(words) for _ in range(rng.randint(20, 80))) + "\n"
+            edits.append((cursor, 0, paste))
+            cursor += len(paste)
+            length += len(paste)
+            continue
+        if roll < 0.02 and length - cursor > 0:
+            # Delete a selection
+            deleted = min(length - cursor, rng.randint(5, 200))
+            edits.append((cursor, deleted, ""))
+            length -= deleted
+            continue
+        if roll < 0.1 and cursor > 0:
+            # Backspace
+            cursor -= 1
+            edits.append((cursor, 1, ""))
+            length -= 1
+            continue
+
+        # Type the next character of the current word
+        if not pending:
+            pending = rng.choice(words) + " "
+        edits.append((cursor, 0, pending[0]))
+        pending = pending[1:]
+        cursor += 1
+        length += 1
+
+    return edits
+
+
+def load_session(path: str) -> Tuple[str, List[Edit]]:
+    """
+    Read a recorded session
+
+    Args:
+        path: JSONL session file
+
+    Returns:
+        Tuple[str, List[Edit]]: Initial document and edits
+    """
+    with open(path, encoding="utf-8") as session_file:
+        text = json.loads(session_file.readline())["text"]
+        edits = []
+        for line in session_file:
+            edit = json.loads(line)
+            edits.append((edit["offset"], edit.get("deleted", 0), edit.get("inserted", "")))
+    return text, edits
+
+
+def save_session(path: str, text: str, edits: List[Edit]) -> None:
+    """
+    Write a session in the replay format
+
+    Args:
+        path: Destination JSONL file
+        text: Initial document
+        edits: Edits in order
+    """
+    with open(path, "w", encoding="utf-8") as session_file:
+        session_file.write(json.dumps({"text": text}) + "\n")
+        for offset, deleted, inserted in edits:
+            session_file.write(json.dumps({"offset": offset, "deleted": deleted, "inserted": inserted}) + "\n")
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """
+    Summarize latencies in microseconds
+
+    Args:
+        samples: Latencies in seconds
+
+    Returns:
+        dict: p50, p99 and max in microseconds
+    """
+    ordered = sorted(samples)
+    return {
+        "p50": ordered[len(ordered) // 2] * 1e6,
+        "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e6,
+        "max": ordered[-1] * 1e6,
+    }
+
+
+def replay(text: str, edits: List[Edit], verify: bool) -> None:
+    """
+    Replay a session and print latency for the live index and full re-scans
+
+    Args:
+        text: Initial document
+        edits: Edits in order
+        verify: Check the live index against a full scan at the end
+    """
+    matcher = get_term_dictionary()
+    index = LiveMatchIndex(text)
+    live_samples: List[float] = []
+    full_samples: List[float] = []
+    match_changes = 0
+
+    for position, (offset, deleted, inserted) in enumerate(edits):
+        started = time.perf_counter()
+        added, removed = index.apply_edit(offset, deleted, inserted)
+        live_samples.append(time.perf_counter() - started)
+        match_changes += len(added) + len(removed)
+
+        if position % FULL_SCAN_SAMPLE_EVERY == 0:
+            started = time.perf_counter()
+            matcher.find_matches(index.text)
+            full_samples.append(time.perf_counter() - started)
+
+    if verify:
+        expected = sorted((start, end, term_index) for term_index, start, end in matcher.find_matches(index.text))
+        actual = [match[:3] for match in index.matches()]
+        assert actual == expected, "live index diverged from a full scan"
+
+    live = percentiles(live_samples)
+    full = percentiles(full_samples)
+    print(
+        f"{len(text) // 1024:>6}KB {len(edits):>7} {match_changes:>8} "
+        f"{live['p50']:>9.1f} {live['p99']:>9.1f} {live['max']:>9.1f} "
+        f"{full['p50']:>10.1f} {full['p99']:>10.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--edits", type=int, default=10000)
+    parser.add_argument("--session", help="Replay this recorded session instead of synthesizing one")
+    parser.add_argument("--record", help="Write the synthesized session (first size only) to this file")
+    parser.add_argument("--no-verify", action="store_true", help="Skip the final full-scan consistency check")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'doc':>8} {'edits':>7} {'changes':>8} {'live p50':>9} {'live p99':>9} {'live max':>9} {'full p50':>10} {'full p99':>10}  (us)")
+
+    if args.session:
+        text, edits = load_session(args.session)
+        replay(text, edits, not args.no_verify)
+        return
+
+    rng = random.Random(args.seed)
+    terms = [term_data["term"] for term_data in get_term_dictionary()]
+    for position, size_kb in enumerate(args.sizes_kb):
+        text = generate_script(size_kb * 1024, terms, rng)
+        edits = synthesize_session(text, args.edits, rng)
+        if args.record and position == 0:
+            save_session(args.record, text, edits)
+        replay(text, edits, not args.no_verify)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Load test: latency of an unrelated endpoint during a login storm
+
+Measures GET / latency while idle, then again while many concurrent logins
+run Argon2 verification. With hashing on the event loop the probe latency
+tracks the hash time; with the dedicated hashing pool it should stay flat.
+
+Requires a running server and httpx (pip install httpx).
+
+Usage (from the backend directory):
+    python -m benchmarks.login_storm_bench
+    python -m benchmarks.login_storm_bench --base-url http://localhost:8000 --concurrency 32 --duration 10
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+
+BENCH_EMAIL = "login-storm-bench@example.com"
+BENCH_PASSWORD = "login-storm-password"
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile
+
+    Args:
+        samples: Latency samples in seconds
+        fraction: Percentile as a fraction (e.g. 0.99)
+
+    Returns:
+        float: Percentile value in seconds
+    """
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def probe(client: httpx.AsyncClient, stop_at: float, interval: float) -> List[float]:
+    """
+    Repeatedly time GET / until the deadline
+
+    Args:
+        client: HTTP client
+        stop_at: perf_counter deadline
+        interval: Pause between probes in seconds
+
+    Returns:
+        List[float]: Latencies in seconds
+    """
+    samples = []
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        response = await client.get("/")
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return samples
+
+
+async def login_loop(client: httpx.AsyncClient, stop_at: float) -> int:
+    """
+    Log in repeatedly until the deadline
+
+    Args:
+        client: HTTP client
+        stop_at: perf_counter deadline
+
+    Returns:
+        int: Number of completed logins
+    """
+    completed = 0
+    while time.perf_counter() < stop_at:
+        response = await client.post(
+            "/api/v1/auth/login",
+            data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD}
+        )
+        response.raise_for_status()
+        completed += 1
+    return completed
+
+
+def report(label: str, samples: List[float]) -> None:
+    print(
+        f"{label:<12} n={len(samples):<6} p50={statistics.median(samples) * 1000:>7.1f}ms "
+        f"p95={percentile(samples, 0.95) * 1000:>7.1f}ms p99={percentile(samples, 0.99) * 1000:>7.1f}ms "
+        f"max={max(samples) * 1000:>7.1f}ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent login loops")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per phase")
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60.0) as client:
+        # Create the benchmark user; 400 means it already exists
+        response = await client.post("/api/v1/auth/signup", json={"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+        if response.status_code not in (201, 400):
+            response.raise_for_status()
+
+        idle_samples = await probe(client, time.perf_counter() + args.duration, args.probe_interval)
+
+        stop_at = time.perf_counter() + args.duration
+        storm = [login_loop(client, stop_at) for _ in range(args.concurrency)]
+        results = await asyncio.gather(probe(client, stop_at, args.probe_interval), *storm)
+        storm_samples, logins = results[0], sum(results[1:])
+
+    report("idle", idle_samples)
+    report("login storm", storm_samples)
+    print(f"logins completed: {logins} ({logins / args.duration:.1f}/s at concurrency {args.concurrency})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
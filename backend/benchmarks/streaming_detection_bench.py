@@ -0,0 +1,101 @@
+"""
+Benchmark for streamed detection of very large scripts
+
+Writes a synthetic script to disk and compares reading it whole and running
+find_commercial_queries against read_text_chunks + stream_commercial_queries.
+Reports time to the first query, total time and peak Python memory
+(tracemalloc) while queries are counted, not kept.
+
+Usage (from the backend directory):
+    python -m benchmarks.streaming_detection_bench
+    python -m benchmarks.streaming_detection_bench --sizes-mb 5 50 --chunk-kb 256
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable
+
+# Settings are read at import time; the benchmark only needs placeholders
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+from app.models.script import CreativeFlexibility, ScriptParams  # noqa: E402
+from app.services.ai_detection import (  # noqa: E402
+    find_commercial_queries,
+    get_term_dictionary,
+    read_text_chunks,
+    stream_commercial_queries,
+)
+from benchmarks.detection_bench import generate_script  # noqa: E402
+
+PARAMS = ScriptParams(
+    target_production_budget=100000,
+    target_audience="Young adults",
+    creative_flexibility=CreativeFlexibility.MINOR_DIALOGUE_CHANGES,
+)
+
+
+def measure(run: Callable[[], Iterable]) -> Dict[str, float]:
+    """
+    Consume a detection run and measure it
+
+    Args:
+        run: Zero-argument callable returning the detected queries
+
+    Returns:
+        Dict[str, float]: first_ms, total_ms, peak_mb and queries
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+    first = None
+    queries = 0
+    for _ in run():
+        if first is None:
+            first = time.perf_counter() - started
+        queries += 1
+    total = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"first_ms": (first or total) * 1000, "total_ms": total * 1000, "peak_mb": peak / (1024 * 1024), "queries": queries}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[5, 20])
+    parser.add_argument("--chunk-kb", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    terms = [term_data["term"] for term_data in get_term_dictionary()]
+    chunk_chars = args.chunk_kb * 1024
+
+    print(f"{'script':>7} {'mode':>7} {'queries':>8} {'first':>10} {'total':>10} {'peak mem':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size_mb in args.sizes_mb:
+            path = os.path.join(directory, f"script-{size_mb}.txt")
+            with open(path, "w", encoding="utf-8") as script_file:
+                script_file.write(generate_script(size_mb * 1024 * 1024, terms, rng))
+
+            def whole():
+                with open(path, encoding="utf-8") as script_file:
+                    return find_commercial_queries(script_file.read(), PARAMS)
+
+            def streamed():
+                with open(path, encoding="utf-8") as script_file:
+                    yield from stream_commercial_queries(read_text_chunks(script_file, chunk_chars), PARAMS)
+
+            results = {"whole": measure(whole), "stream": measure(streamed)}
+            assert results["whole"]["queries"] == results["stream"]["queries"], "streamed detection diverged"
+            for mode, result in results.items():
+                print(
+                    f"{size_mb:>5}MB {mode:>7} {result['queries']:>8} {result['first_ms']:>8.1f}ms "
+                    f"{result['total_ms']:>8.1f}ms {result['peak_mb']:>7.1f}MB"
+                )
+
+
+if __name__ == "__main__":
+    main()
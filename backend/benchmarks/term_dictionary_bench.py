@@ -0,0 +1,201 @@
+"""
+Benchmark for loading large commercial term dictionaries per worker
+
+Compiles a synthetic catalogue of N terms and compares what each uvicorn
+worker pays at startup: mapping the compiled artifact (TermDictionary.open)
+against loading the JSON catalogue and compiling a TermMatcher regex in
+process, as every worker did before. Each worker times its cold load (until
+the matcher is usable) and then one scan of a screenplay-like script with a
+realistic vocabulary, reported as throughput. Memory is read from
+/proc/<pid>/smaps_rollup (Linux) of K idle workers after their first scan:
+RSS counts shared artifact pages in every worker, PSS splits them between
+the workers that map them. Both are reported above an idle interpreter that
+imported the same modules.
+
+Usage (from the backend directory):
+    python -m benchmarks.term_dictionary_bench
+    python -m benchmarks.term_dictionary_bench --term-counts 1000 50000 --workers 8
+"""
+import argparse
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from app.models.commercial_query import QueryType
+from app.services.term_dictionary import TermDictionary, compile_catalogue, load_catalogue
+from benchmarks.term_matcher import TermMatcher
+from benchmarks.detection_bench import generate_script, generate_terms
+
+# Size of the script each worker scans once after loading
+SAMPLE_SCRIPT_BYTES = 500 * 1024
+
+WORKER_MODES = ("idle", "mmap", "regex")
+
+
+def write_catalogue(path: Path, term_count: int, rng: random.Random) -> List[str]:
+    """
+    Write a synthetic JSON catalogue
+
+    Args:
+        path: Catalogue file to write
+        term_count: Number of terms
+        rng: Random source
+
+    Returns:
+        List[str]: The catalogue's terms
+    """
+    terms = generate_terms(term_count, rng)
+    query_types = [query_type.value for query_type in QueryType]
+    catalogue = {
+        "version": f"bench-{term_count}",
+        "terms": [
+            {
+                "term": term,
+                "type": rng.choice(query_types),
+                "reason": f"Synthetic sponsorship opportunity for {term}",
+                "base_revenue": rng.randrange(500, 20000, 250),
+                "base_confidence": rng.randint(60, 95),
+            }
+            for term in terms
+        ],
+    }
+    path.write_text(json.dumps(catalogue), encoding="utf-8")
+    return terms
+
+
+def run_worker(mode: str, path: str, script_path: str) -> None:
+    """
+    Worker process: load the dictionary, scan once, report and wait
+
+    Prints the load and scan times in milliseconds and the match count,
+    then blocks until stdin closes so the parent can read its memory.
+
+    Args:
+        mode: "idle" (imports only), "mmap" (artifact) or "regex" (catalogue + TermMatcher)
+        path: Artifact (mmap) or JSON catalogue (regex)
+        script_path: Text to scan once after loading
+    """
+    text = Path(script_path).read_text(encoding="utf-8")
+    started = time.perf_counter()
+    if mode == "mmap":
+        matcher = TermDictionary.open(path)
+    elif mode == "regex":
+        _, terms = load_catalogue(path)
+        matcher = TermMatcher([term_data["term"] for term_data in terms])
+    else:
+        matcher = None
+    loaded = time.perf_counter()
+    matches = matcher.find_matches(text) if matcher is not None else []
+    scanned = time.perf_counter()
+    print(f"{(loaded - started) * 1000:.1f} {(scanned - loaded) * 1000:.1f} {len(matches)}", flush=True)
+    sys.stdin.read()
+
+
+def memory_kb(pid: int) -> Dict[str, int]:
+    """
+    Read a process's resident and proportional set size
+
+    Args:
+        pid: Process id
+
+    Returns:
+        Dict[str, int]: {"Rss": kB, "Pss": kB}
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as rollup:
+        for line in rollup:
+            field, _, rest = line.partition(":")
+            if field in ("Rss", "Pss"):
+                values[field] = int(rest.split()[0])
+    return values
+
+
+def start_workers(mode: str, path: Path, script_path: Path, count: int) -> Dict[str, float]:
+    """
+    Start workers of one mode, wait until all have loaded and measure them
+
+    Args:
+        mode: Worker mode
+        path: Artifact or catalogue for the mode
+        script_path: Text each worker scans once
+        count: Number of concurrent workers
+
+    Returns:
+        Dict[str, float]: Mean load and scan ms, match count and mean RSS/PSS kB per worker
+    """
+    command = [sys.executable, "-m", "benchmarks.term_dictionary_bench", "--worker", mode, str(path), str(script_path)]
+    workers = [
+        subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(count)
+    ]
+    try:
+        reports = [worker.stdout.readline().split() for worker in workers]
+        memory = [memory_kb(worker.pid) for worker in workers]
+    finally:
+        for worker in workers:
+            worker.stdin.close()
+            worker.wait()
+    return {
+        "load_ms": sum(float(report[0]) for report in reports) / count,
+        "scan_ms": sum(float(report[1]) for report in reports) / count,
+        "matches": int(reports[0][2]),
+        "rss_kb": sum(sample["Rss"] for sample in memory) / count,
+        "pss_kb": sum(sample["Pss"] for sample in memory) / count,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--term-counts", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent workers per measurement")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--worker", nargs=3, metavar=("MODE", "PATH", "SCRIPT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker)
+        return
+
+    rng = random.Random(args.seed)
+    print(
+        f"{'terms':>7} {'artifact':>9} {'compile':>9} {'mode':>6} {'cold load':>10} {'scan':>9} {'MB/s':>6} "
+        f"{'matches':>8} {'RSS/worker':>11} {'PSS/worker':>11}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        for term_count in args.term_counts:
+            catalogue_path = directory / f"terms-{term_count}.json"
+            artifact_path = directory / f"terms-{term_count}.termdict"
+            script_path = directory / f"script-{term_count}.txt"
+            terms = write_catalogue(catalogue_path, term_count, rng)
+            script = generate_script(SAMPLE_SCRIPT_BYTES, terms, rng)
+            script_path.write_text(script, encoding="utf-8")
+            megabytes = len(script) / (1024 * 1024)
+
+            started = time.perf_counter()
+            dictionary = compile_catalogue(catalogue_path, artifact_path)
+            compile_seconds = time.perf_counter() - started
+
+            idle = start_workers("idle", artifact_path, script_path, args.workers)
+            results = {
+                "mmap": start_workers("mmap", artifact_path, script_path, args.workers),
+                "regex": start_workers("regex", catalogue_path, script_path, args.workers),
+            }
+            assert results["regex"]["matches"] == results["mmap"]["matches"], "artifact matcher diverged from regex"
+
+            for mode, result in results.items():
+                print(
+                    f"{term_count:>7} {dictionary.size_bytes / 1024:>7.0f}KB {compile_seconds * 1000:>7.1f}ms {mode:>6} "
+                    f"{result['load_ms']:>8.1f}ms {result['scan_ms']:>7.1f}ms {megabytes * 1000 / result['scan_ms']:>6.2f} "
+                    f"{result['matches']:>8} "
+                    f"{(result['rss_kb'] - idle['rss_kb']) / 1024:>9.1f}MB {(result['pss_kb'] - idle['pss_kb']) / 1024:>9.1f}MB"
+                )
+
+
+if __name__ == "__main__":
+    main()
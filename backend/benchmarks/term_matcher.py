@@ -0,0 +1,153 @@
+"""
+Regex term matcher kept as a benchmark baseline
+Finds every whole-word, case-insensitive occurrence of a term list in a single pass
+with one trie-factored regex compiled in process. The API detects terms with
+app.services.term_dictionary.TermDictionary; this matcher is only used by the
+benchmarks to compare against it.
+"""
+import re
+from typing import Dict, List, Sequence, Tuple
+
+
+# Zero-width word boundary check used to verify the end of a candidate match
+_WORD_BOUNDARY = re.compile(r"\b")
+
+
+def _build_trie(terms: Sequence[str]) -> Dict[str, dict]:
+    """
+    Build a character trie from lowercased terms
+
+    Args:
+        terms: Lowercased terms to insert
+
+    Returns:
+        dict: Nested trie where the empty-string key marks the end of a term
+    """
+    trie: Dict[str, dict] = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return trie
+
+
+def _trie_to_pattern(node: Dict[str, dict]) -> str:
+    """
+    Convert a trie into a factored regex alternation
+
+    Sharing prefixes keeps the regex engine from trying every term
+    alternative at each position, so large term lists stay cheap to scan.
+
+    Args:
+        node: Trie node produced by _build_trie
+
+    Returns:
+        str: Regex source matching any term in the trie
+    """
+    optional = "" in node
+    branches = [
+        re.escape(char) + _trie_to_pattern(child)
+        for char, child in sorted(node.items())
+        if char != ""
+    ]
+
+    if not branches:
+        return ""
+
+    if len(branches) == 1:
+        body = branches[0]
+        if optional:
+            return f"(?:{body})?"
+        return body
+
+    body = "(?:" + "|".join(branches) + ")"
+    if optional:
+        body += "?"
+    return body
+
+
+class TermMatcher:
+    """
+    Single-pass matcher over a list of commercial terms
+
+    Compiles one trie-factored regex for the whole term list. Each scan
+    locates every position where at least one term starts on a word
+    boundary, then resolves which terms end there on a word boundary.
+    The result is identical to running a separate \\b<term>\\b search
+    per term, including overlapping matches.
+    """
+
+    def __init__(self, terms: Sequence[str]):
+        """
+        Compile the matcher for the given terms
+
+        Args:
+            terms: Terms in priority order; when a term repeats (ignoring
+                case) only its first occurrence produces matches
+        """
+        self.terms: List[str] = list(terms)
+
+        # Map lowercased term -> index of its first occurrence
+        self._term_index: Dict[str, int] = {}
+        for index, term in enumerate(self.terms):
+            if term:
+                self._term_index.setdefault(term.lower(), index)
+
+        # Candidate term lengths grouped by lowercased first character
+        lengths: Dict[str, set] = {}
+        for key in self._term_index:
+            lengths.setdefault(key[0], set()).add(len(key))
+        self._lengths_by_initial: Dict[str, Tuple[int, ...]] = {
+            initial: tuple(sorted(values)) for initial, values in lengths.items()
+        }
+        self.max_term_length = max((len(key) for key in self._term_index), default=0)
+
+        if self._term_index:
+            alternation = _trie_to_pattern(_build_trie(self._term_index))
+            self._pattern = re.compile(r"\b(?=" + alternation + r"\b)", re.IGNORECASE)
+        else:
+            self._pattern = None
+
+    def find_matches(self, text: str, start: int = 0, end: int | None = None) -> List[Tuple[int, int, int]]:
+        """
+        Find all term occurrences in the text
+
+        Word boundaries are always evaluated against the full text, so
+        restricting the range never creates or hides matches at its edges.
+
+        Args:
+            text: Text to scan
+            start: Only report matches starting at or after this offset
+            end: Only report matches starting before this offset (default: end of text)
+
+        Returns:
+            List[Tuple[int, int, int]]: (term_index, start, end) tuples ordered
+                by term index, then by start position
+        """
+        if self._pattern is None:
+            return []
+
+        term_index = self._term_index
+        lengths_by_initial = self._lengths_by_initial
+        boundary = _WORD_BOUNDARY.match
+        text_length = len(text)
+        scan_end = text_length if end is None else min(end, text_length)
+        matches: List[Tuple[int, int, int]] = []
+
+        # endpos is left unset so the trailing \b still sees the real text end
+        for candidate in self._pattern.finditer(text, start):
+            match_start = candidate.start()
+            if match_start >= scan_end:
+                break
+            lengths = lengths_by_initial.get(text[match_start].lower(), ())
+            for length in lengths:
+                match_end = match_start + length
+                if match_end > text_length:
+                    break
+                index = term_index.get(text[match_start:match_end].lower())
+                if index is not None and boundary(text, match_end):
+                    matches.append((index, match_start, match_end))
+
+        matches.sort()
+        return matches
@@ -0,0 +1,105 @@
+"""
+Benchmark for the memory and scoring cost of the term table layout
+
+Compares the previous dict-per-term list (each entry holding its own term,
+reason, type and numbers) against the compiled TermDictionary, whose term
+data lives in typed columns with an interned reason pool. Dict memory is
+measured with tracemalloc while the catalogue is loaded; the table is the
+artifact size. Scoring looks up type, reason, revenue and confidence for a
+stream of matched term ids, as find_commercial_queries does.
+
+Usage (from the backend directory):
+    python -m benchmarks.term_table_bench
+    python -m benchmarks.term_table_bench --term-counts 10000 100000 --distinct-reasons 200
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from app.models.commercial_query import QueryType
+from app.services.term_dictionary import TermDictionary, compile_terms, load_catalogue
+from benchmarks.detection_bench import generate_terms
+
+# Matched term ids scored per timing run
+LOOKUPS = 200000
+
+
+def write_catalogue(path: Path, term_count: int, distinct_reasons: int, rng: random.Random) -> None:
+    """
+    Write a synthetic JSON catalogue whose reasons repeat like the real one
+
+    Args:
+        path: Catalogue file to write
+        term_count: Number of terms
+        distinct_reasons: Number of different reason strings
+        rng: Random source
+    """
+    reasons = [f"Sponsorship category {position}; brand partners in this space" for position in range(distinct_reasons)]
+    query_types = [query_type.value for query_type in QueryType]
+    catalogue = {
+        "version": f"bench-{term_count}",
+        "terms": [
+            {
+                "term": term,
+                "type": rng.choice(query_types),
+                "reason": rng.choice(reasons),
+                "base_revenue": rng.randrange(500, 20000, 250),
+                "base_confidence": rng.randint(60, 95),
+            }
+            for term in generate_terms(term_count, rng)
+        ],
+    }
+    path.write_text(json.dumps(catalogue), encoding="utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--term-counts", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--distinct-reasons", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'terms':>7} {'dicts B/term':>13} {'table B/term':>13} {'dict lookups':>13} {'table lookups':>14}")
+    with tempfile.TemporaryDirectory() as directory:
+        for term_count in args.term_counts:
+            catalogue_path = Path(directory) / f"terms-{term_count}.json"
+            write_catalogue(catalogue_path, term_count, args.distinct_reasons, rng)
+
+            # Previous layout: a dict per term, types converted to the enum
+            tracemalloc.start()
+            version, terms = load_catalogue(catalogue_path)
+            for term in terms:
+                term["type"] = QueryType(term["type"])
+            dict_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            dictionary = TermDictionary(compile_terms(version, terms))
+            term_ids = [rng.randrange(term_count) for _ in range(LOOKUPS)]
+
+            started = time.perf_counter()
+            for term_id in term_ids:
+                term = terms[term_id]
+                (term["type"], term["reason"], term["base_revenue"], term["base_confidence"])
+            dict_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for term_id in term_ids:
+                (
+                    dictionary.term_type(term_id), dictionary.reason(term_id),
+                    dictionary.base_revenue[term_id], dictionary.base_confidence[term_id]
+                )
+            table_seconds = time.perf_counter() - started
+
+            print(
+                f"{term_count:>7} {dict_bytes / term_count:>13.1f} {dictionary.memory_report()['bytes_per_term']:>13.1f} "
+                f"{dict_seconds * 1e9 / LOOKUPS:>10.0f} ns {table_seconds * 1e9 / LOOKUPS:>11.0f} ns"
+            )
+
+
+if __name__ == "__main__":
+    main()
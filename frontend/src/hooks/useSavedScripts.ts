@@ -29,7 +29,7 @@ export const useSavedScripts = (): UseSavedScriptsReturn => {
     setLoading(true);
     try {
       console.log("Fetching script analyses from backend...");
-      const response = await api.get('/api/v1/scripts/analyses');
+      const response = await api.get('/api/v1/scripts/analyses', { params: { include: 'text' } });
       console.log("Fetched analyses:", response.data);
       
       if (Array.isArray(response.data)) {